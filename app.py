@@ -1,17 +1,36 @@
 import os
+import json
 import logging
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, Response, g, render_template, request, jsonify, send_from_directory
 from pymongo import MongoClient, errors
-from config import MONGODB_URI, DB_NAME, COLLECTION_NAME, GCP_PROJECT, GCP_REGION, FLASK_ENV, FLASK_SECRET_KEY
+from config import (MONGODB_URI, DB_NAME, COLLECTION_NAME, GCP_PROJECT, GCP_REGION, FLASK_ENV, FLASK_SECRET_KEY,
+                    LOCAL_VECTOR_SEARCH, EMBEDDING_CONCURRENCY, MAX_BATCH_QUERIES,
+                    RESULT_CACHE_SIZE, RESULT_CACHE_TTL_SECONDS,
+                    REDIS_URL, META_COLLECTION_NAME, GENERATION_REFRESH_SECONDS, SEARCH_HTTP_MAX_AGE,
+                    SEARCH_DEADLINE_SECONDS, EMBEDDING_HEDGE_QUANTILE, EMBEDDING_BREAKER_FAILURES,
+                    EMBEDDING_BREAKER_SLOW_SECONDS, EMBEDDING_BREAKER_RESET_SECONDS, SEARCH_MAX_CONCURRENT,
+                    SEARCH_MAX_QUEUE, SEARCH_QUEUE_TIMEOUT_SECONDS)
 from bson import ObjectId
+from bson.errors import InvalidId
 import vertexai
 from vertexai.vision_models import Image, MultiModalEmbeddingModel
 from PIL import Image as PILImage
 import requests
 from io import BytesIO
-import tempfile
-import base64
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from flask_cors import CORS
+from serving.admission import AdmissionController, Overloaded
+from serving.catalogue import active_collection_name, build_memory_indexes
+from serving.images import InvalidImageError, decode_data_url
+from serving.ranking import (VECTOR_INDEXES, PartialResults, batch_vector_search, build_search_filter,
+                             filters_from_params, lexical_search, more_like_this, normalize_query, normalize_weights,
+                             search_signature, vector_search, vector_search_stream)
+from serving.resilience import (CircuitBreaker, CircuitOpenError, EmbeddingUnavailableError, LatencyTracker,
+                                hedged_map)
+from serving.result_cache import ResultCache
+from serving.single_flight import SingleFlight
 
 # Configure logging based on environment
 if FLASK_ENV == "development":
@@ -40,6 +59,9 @@ except Exception as e:
     logging.error(f"❌ Vertex AI initialization failed: {str(e)}")
     model = None
 
+# Bounded fan-out for embedding calls; the multimodal model embeds one query per call
+embedding_pool = ThreadPoolExecutor(max_workers=EMBEDDING_CONCURRENCY, thread_name_prefix="embedding")
+
 # MongoDB Connection with error handling
 try:
     client = MongoClient(
@@ -51,13 +73,19 @@ try:
     )
     client.admin.command('ping')  # Test connection
     db = client[DB_NAME]
-    recipes_collection = db[COLLECTION_NAME]
-    print(f"✅ MongoDB connected successfully to {DB_NAME}.{COLLECTION_NAME}")
+    meta_collection = db[META_COLLECTION_NAME]
+    # The pipeline loads each catalogue into a staging collection and then points the alias at it
+    recipes_collection = db[active_collection_name(meta_collection.find_one({'_id': COLLECTION_NAME}), COLLECTION_NAME)]
+    print(f"✅ MongoDB connected successfully to {DB_NAME}.{recipes_collection.name}")
 except errors.ConnectionFailure as e:
     logging.critical(f"❌ MongoDB connection failed: {str(e)}")
     print("Please check your MONGODB_URI in the .env file")
     raise
 
+# In-memory ingredient index for "cook with what I have" searches, and (optionally) an
+# in-memory copy of the embeddings for searches without an Atlas round trip
+ingredient_index, local_vectors = build_memory_indexes(recipes_collection, LOCAL_VECTOR_SEARCH)
+
 def download_image(url):
     """Download image from URL with timeout and error handling"""
     try:
@@ -68,30 +96,15 @@ def download_image(url):
         logging.error(f"Image download failed: {str(e)}")
         return None
 
-def get_embeddings(image=None, text=None):
-    """Generate embeddings with Vertex AI"""
+def embed_query(image=None, text=None):
+    """Generate embeddings with Vertex AI; image is the decoded bytes from serving.images.decode_data_url"""
     if not model:
         logging.error("Vertex AI model not available")
         return None
         
-    vertex_image = None
-    
-    if image and isinstance(image, str) and image.startswith('data:image'):
-        try:
-            header, encoded = image.split(",", 1)
-            binary_data = base64.b64decode(encoded)
-            
-            with tempfile.NamedTemporaryFile(suffix=".jpg") as temp_img:
-                temp_img.write(binary_data)
-                temp_img.flush()
-                vertex_image = Image.load_from_file(temp_img.name)
-        except Exception as e:
-            logging.error(f"Image processing error: {str(e)}")
-            return None
-    
     try:
         embeddings = model.get_embeddings(
-            image=vertex_image,
+            image=Image(image_bytes=image) if image else None,
             contextual_text=text,
             dimension=512
         )
@@ -103,130 +116,199 @@ def get_embeddings(image=None, text=None):
         logging.error(f"Vertex AI error: {str(e)}")
         return None
 
-def is_valid_result(result, image_weight, text_weight):
-    """Determine if a search result meets quality thresholds"""
-    MIN_COMBINED_SCORE = 0.25
-    MIN_COMPONENT_SCORE = 0.15
-    
-    if result.get('combined_score', 0) < MIN_COMBINED_SCORE:
-        return False
-    
-    if image_weight > 0 and 'img_score' in result and result['img_score'] < MIN_COMPONENT_SCORE:
-        return False
-        
-    if text_weight > 0 and 'text_score' in result and result['text_score'] < MIN_COMPONENT_SCORE:
-        return False
-        
-    return True
-
-def hybrid_search(image=None, text=None, k=5, image_weight=0.5, text_weight=0.5):
-    """Perform proper hybrid search combining image and text results"""
-    # Validate weights
-    total_weight = image_weight + text_weight
-    if total_weight <= 0:
-        raise ValueError("Weights must sum to a positive value")
-    
-    # Normalize weights
-    image_weight /= total_weight
-    text_weight /= total_weight
-    
-    # Get embeddings
-    embeddings = get_embeddings(image, text)
+# Recent embedding latencies set the hedging delay; repeated failures or slow calls open the breaker
+embedding_latency = LatencyTracker()
+embedding_breaker = CircuitBreaker(failure_threshold=EMBEDDING_BREAKER_FAILURES,
+                                   slow_call_seconds=EMBEDDING_BREAKER_SLOW_SECONDS,
+                                   reset_seconds=EMBEDDING_BREAKER_RESET_SECONDS)
+
+def hedge_delay():
+    """Seconds before a slow embedding call gets a second attempt: the recent p95, within sane bounds"""
+    return min(max(embedding_latency.percentile(EMBEDDING_HEDGE_QUANTILE, default=1.0), 0.25), 2.0)
+
+def record_embedding(result, seconds):
+    if result is not None:
+        embedding_latency.record(seconds)
+    embedding_breaker.record(result is not None, seconds)
+
+def embed_batch(keys, timeout=SEARCH_DEADLINE_SECONDS):
+    """Embed unique (image, text) queries concurrently, hedging slow calls; the multimodal model has no list call"""
+    return hedged_map(embedding_pool, embed_query, keys, hedge_delay(), timeout, on_result=record_embedding)
+
+def get_embeddings(image=None, text=None, timeout=SEARCH_DEADLINE_SECONDS):
+    """Embeddings for one query.
+
+    Raises InvalidImageError for an unreadable upload (before the breaker sees anything),
+    CircuitOpenError while the embedding breaker is open, TimeoutError when no result
+    arrives within timeout seconds and EmbeddingUnavailableError when the call failed or
+    returned no embedding.
+    """
+    image = decode_data_url(image)
+    if not embedding_breaker.allow():
+        raise CircuitOpenError("Embedding service unavailable")
+    start = time.monotonic()
+    embeddings = embed_batch([(image, text)], timeout)[0]
     if not embeddings or (not embeddings["image_embedding"] and not embeddings["text_embedding"]):
-        raise ValueError("Failed to get valid embeddings")
-    
-    # Connect to MongoDB
-    client = MongoClient(MONGODB_URI)
-    collection = client[DB_NAME][COLLECTION_NAME]
-    results = []
-    
-    # Perform image vector search if image embedding exists
-    if embeddings["image_embedding"]:
-        try:
-            img_results = collection.aggregate([
-                {
-                    "$vectorSearch": {
-                        "index": "recipe_img_vector_index",
-                        "path": "image_embedding",
-                        "queryVector": embeddings["image_embedding"],
-                        "numCandidates": 100,
-                        "limit": k * 3  # Get extra candidates for filtering
-                    }
-                },
-                {
-                    "$project": {
-                        "_id": 1,
-                        "name": 1,
-                        "category": 1,
-                        "area": 1,
-                        "img_url": 1,
-                        "health_score": 1,
-                        "img_score": {"$meta": "vectorSearchScore"}
-                    }
-                }
-            ])
-            results.extend(list(img_results))
-        except Exception as e:
-            print(f"Image vector search failed: {str(e)}")
-    
-    # Perform text vector search if text embedding exists
-    if embeddings["text_embedding"]:
+        # hedged_map yields None both for failed calls and for calls still running at the timeout
+        if time.monotonic() - start >= timeout:
+            raise TimeoutError("Embedding request timed out")
+        raise EmbeddingUnavailableError("Failed to get valid embeddings")
+    return embeddings
+
+def get_embeddings_many(queries):
+    """Embeddings for a list of (image, text) queries with already validated images, in order (None where
+    embedding failed)"""
+    if not embedding_breaker.allow():
+        return [None] * len(queries)
+    return embed_batch([(decode_data_url(image), text) for image, text in queries])
+
+# Identical searches that arrive while one is running wait for and share its result
+search_flight = SingleFlight()
+
+# Embedding-bound work is capped per worker so searches can't take every thread from cheap pages
+search_admission = AdmissionController(max_concurrent=SEARCH_MAX_CONCURRENT, max_queue=SEARCH_MAX_QUEUE,
+                                       queue_timeout=SEARCH_QUEUE_TIMEOUT_SECONDS)
+
+# Finished searches are cached per process and, with REDIS_URL, across all workers and instances
+result_cache = ResultCache.from_url(REDIS_URL, max_entries=RESULT_CACHE_SIZE, ttl_seconds=RESULT_CACHE_TTL_SECONDS)
+_generation = {"value": 0, "checked_at": 0.0}
+_catalogue_switch = threading.Lock()
+
+def collection_generation():
+    """Catalogue generation bumped by the pipeline on every upload, re-read every few seconds"""
+    now = time.monotonic()
+    if now - _generation["checked_at"] >= GENERATION_REFRESH_SECONDS:
         try:
-            text_results = collection.aggregate([
-                {
-                    "$vectorSearch": {
-                        "index": "recipe_text_vector_index",
-                        "path": "text_embedding",
-                        "queryVector": embeddings["text_embedding"],
-                        "numCandidates": 100,
-                        "limit": k * 3  # Get extra candidates for filtering
-                    }
-                },
-                {
-                    "$project": {
-                        "_id": 1,
-                        "name": 1,
-                        "category": 1,
-                        "area": 1,
-                        "img_url": 1,
-                        "health_score": 1,
-                        "text_score": {"$meta": "vectorSearchScore"}
-                    }
-                }
-            ])
-            results.extend(list(text_results))
+            doc = meta_collection.find_one({'_id': COLLECTION_NAME}, {'generation': 1, 'active_collection': 1})
+            active = active_collection_name(doc, COLLECTION_NAME)
+            if active != recipes_collection.name:
+                # Keep serving the previous catalogue, and its generation, until the new one is loaded
+                if _catalogue_switch.acquire(blocking=False):
+                    threading.Thread(target=switch_catalogue, args=(active, doc.get('generation', 0)),
+                                     name="catalogue-switch", daemon=True).start()
+            else:
+                _generation["value"] = doc.get('generation', 0) if doc else 0
         except Exception as e:
-            print(f"Text vector search failed: {str(e)}")
-    
-    # Combine and deduplicate results
-    ranked_results = []
-    seen_ids = set()
-    
-    for doc in results:
-        doc_id = str(doc["_id"])
-        if doc_id in seen_ids:
-            # Merge scores for documents found in both searches
-            existing = next(d for d in ranked_results if str(d["_id"]) == doc_id)
-            if "img_score" in doc:
-                existing["img_score"] = doc["img_score"]
-            if "text_score" in doc:
-                existing["text_score"] = doc["text_score"]
-        else:
-            seen_ids.add(doc_id)
-            ranked_results.append(doc)
-    
-    # Calculate combined weighted score
-    for doc in ranked_results:
-        img_score = doc.get("img_score", 0)
-        text_score = doc.get("text_score", 0)
-        doc["combined_score"] = (image_weight * img_score) + (text_weight * text_score)
+            logging.warning(f"Could not read catalogue generation: {str(e)}")
+        _generation["checked_at"] = now
+    return _generation["value"]
+
+def switch_catalogue(name, generation):
+    """Build the in-memory indexes for a newly promoted collection, then serve from it"""
+    global recipes_collection, ingredient_index, local_vectors
+    try:
+        collection = meta_collection.database[name]
+        new_ingredient_index, new_local_vectors = build_memory_indexes(collection, LOCAL_VECTOR_SEARCH)
+        recipes_collection, ingredient_index, local_vectors = collection, new_ingredient_index, new_local_vectors
+        _generation["value"] = generation
+        print(f"🔗 Now serving {DB_NAME}.{name} (generation {generation})")
+    finally:
+        _catalogue_switch.release()
+
+def refresh_catalogue():
+    """Follow the catalogue alias on a timer, so every route switches even on workers that see no searches"""
+    while True:
+        time.sleep(GENERATION_REFRESH_SECONDS)
+        collection_generation()
+
+threading.Thread(target=refresh_catalogue, name="catalogue-refresh", daemon=True).start()
+
+def search_key(image, text, k, image_weight, text_weight, search_filter=None):
+    """Result cache key plus the query text (stripped) and normalized weights to search with"""
+    # Validate weights before paying for embeddings; equivalent weightings share one cache entry
+    image_weight, text_weight = normalize_weights(image_weight, text_weight)
     
-    # Sort by combined score
-    ranked_results.sort(key=lambda x: x["combined_score"], reverse=True)
+    # Searches that differ only in case or spacing share a signature; the text as typed is what gets embedded
+    text = text.strip() if text and normalize_query(text) else None
+    signature = search_signature(text, image, image_weight, text_weight, k, search_filter)
+    return f"{collection_generation()}:{signature}", text, image_weight, text_weight
+
+def hybrid_search(image=None, text=None, k=5, image_weight=0.5, text_weight=0.5, search_filter=None):
+    """Perform proper hybrid search combining image and text results.
+
+    search_filter (from build_search_filter) is pushed into $vectorSearch. Must finish
+    within SEARCH_DEADLINE_SECONDS. When embeddings are unavailable (breaker open, call
+    failed or deadline passed) text searches get a lexical answer and g.search_degraded is
+    set; image-only searches raise CircuitOpenError / TimeoutError / EmbeddingUnavailableError.
+    """
+    deadline = time.monotonic() + SEARCH_DEADLINE_SECONDS
+    key, text, image_weight, text_weight = search_key(image, text, k, image_weight, text_weight, search_filter)
+    results = result_cache.get(key)
+    if results is not None:
+        return results
+    try:
+        # Only the single-flight leader takes an admission slot; followers just wait for its result
+        return search_flight.do(
+            key, lambda: _cached_hybrid_search(key, image, text, k, image_weight, text_weight, search_filter,
+                                               deadline),
+            timeout=max(0.0, deadline - time.monotonic())
+        )
+    except (CircuitOpenError, TimeoutError, EmbeddingUnavailableError) as e:
+        if not text:
+            raise
+        # Degraded answer (never cached) instead of holding the worker thread
+        logging.warning(f"Embeddings unavailable ({type(e).__name__}), falling back to lexical search")
+        g.search_degraded = True
+        return lexical_search(recipes_collection, text, k=k, max_time_ms=remaining_ms(deadline, floor=500),
+                              search_filter=search_filter)
+
+def overloaded_response(e):
+    return jsonify({"error": "Search is busy, please try again shortly"}), 503, {'Retry-After': str(e.retry_after)}
+
+def remaining_ms(deadline, floor=50):
+    return max(floor, int((deadline - time.monotonic()) * 1000))
+
+def _cached_hybrid_search(key, image, text, k, image_weight, text_weight, search_filter, deadline):
+    with search_admission.slot():
+        results = _hybrid_search(image, text, k, image_weight, text_weight, search_filter, deadline)
+    # A leg that failed or ran out of time must not leave its gap in the cache for everyone
+    if not isinstance(results, PartialResults):
+        result_cache.set(key, results)
+    return results
+
+def _hybrid_search(image, text, k, image_weight, text_weight, search_filter, deadline):
+    # Get embeddings
+    embeddings = get_embeddings(image, text, timeout=max(0.0, deadline - time.monotonic()))
     
-    # Apply score validation and return top k valid results
-    valid_results = [r for r in ranked_results if is_valid_result(r, image_weight, text_weight)]
-    return valid_results[:k]
+    return vector_search(recipes_collection, embeddings, k=k, image_weight=image_weight, text_weight=text_weight,
+                         local_store=local_vectors, max_time_ms=remaining_ms(deadline), search_filter=search_filter)
+
+def search_events(key, image, text, k, image_weight, text_weight, search_filter=None):
+    """NDJSON lines for /search/stream: provisional results from the first vector leg, then the final ranking"""
+    def line(stage, results=None, **extra):
+        if results is not None:
+            extra["results"] = [{**r, '_id': str(r['_id'])} for r in results]
+        return json.dumps({"stage": stage, **extra}) + "\n"
+
+    deadline = time.monotonic() + SEARCH_DEADLINE_SECONDS
+    try:
+        embeddings = get_embeddings(image, text, timeout=max(0.0, deadline - time.monotonic()))
+        for stage, results in vector_search_stream(recipes_collection, embeddings, k=k, image_weight=image_weight,
+                                                   text_weight=text_weight, local_store=local_vectors,
+                                                   max_time_ms=remaining_ms(deadline), search_filter=search_filter):
+            if stage == "final" and not isinstance(results, PartialResults):
+                result_cache.set(key, results)
+            yield line(stage, results)
+    except (CircuitOpenError, TimeoutError, EmbeddingUnavailableError):
+        if not text:
+            yield line("error", error="Image search is temporarily unavailable")
+            return
+        yield line("final", lexical_search(recipes_collection, text, k=k, max_time_ms=remaining_ms(deadline, floor=500),
+                                           search_filter=search_filter), degraded="lexical")
+    except Exception as e:
+        logging.error(f"Streaming search error: {str(e)}")
+        yield line("error", error="Search failed")
+
+def stored_embeddings(recipe_id):
+    """A recipe's own image/text embeddings, from the local store or one database read"""
+    if local_vectors is not None:
+        vectors = local_vectors.vectors(recipe_id)
+        if vectors is not None:
+            return vectors
+    doc = recipes_collection.find_one({'_id': ObjectId(recipe_id)}, {field: 1 for field in VECTOR_INDEXES})
+    if not doc:
+        return None
+    return {field: doc.get(field) for field in VECTOR_INDEXES}
 
 @app.route('/static/<path:filename>')
 def serve_static(filename):
@@ -265,21 +347,290 @@ def search():
         
         if not query and not image:
             return jsonify({"error": "Please provide either text or image"}), 400
+        try:
+            search_filter = build_search_filter(data.get('filters'))
+        except (TypeError, ValueError) as e:
+            return jsonify({"error": "Invalid filters", "details": str(e)}), 400
+        try:
+            decode_data_url(image)
+        except InvalidImageError as e:
+            return jsonify({"error": "Invalid image", "details": str(e)}), 400
             
         results = hybrid_search(
             image=image,
             text=query,
             k=10,
             image_weight=0.7 if image else 0,
-            text_weight=0.3 if query else 0
+            text_weight=0.3 if query else 0,
+            search_filter=search_filter
         )
         
-        return jsonify([{**r, '_id': str(r['_id'])} for r in results])
+        response = jsonify([{**r, '_id': str(r['_id'])} for r in results])
+        if g.get('search_degraded'):
+            response.headers['X-Search-Degraded'] = 'lexical'
+        return response
+        
+    except Overloaded as e:
+        return overloaded_response(e)
+    except (CircuitOpenError, TimeoutError, EmbeddingUnavailableError):
+        return (jsonify({"error": "Image search is temporarily unavailable"}), 503,
+                {'Retry-After': str(int(EMBEDDING_BREAKER_RESET_SECONDS))})
+    except Exception as e:
+        logging.error(f"Search error: {str(e)}")
+        return jsonify({"error": "Search failed", "details": str(e)}), 500
         
+@app.route('/search/stream', methods=['POST'])
+def search_stream():
+    """/search as NDJSON, so results show as soon as the faster vector leg is back"""
+    try:
+        if not request.is_json:
+            return jsonify({"error": "Request must be JSON"}), 400
+            
+        data = request.get_json()
+        query = data.get('query', '').strip()
+        image = data.get('image')
+        
+        if not query and not image:
+            return jsonify({"error": "Please provide either text or image"}), 400
+        try:
+            search_filter = build_search_filter(data.get('filters'))
+        except (TypeError, ValueError) as e:
+            return jsonify({"error": "Invalid filters", "details": str(e)}), 400
+        try:
+            decode_data_url(image)
+        except InvalidImageError as e:
+            return jsonify({"error": "Invalid image", "details": str(e)}), 400
+            
+        k = 10
+        key, text, image_weight, text_weight = search_key(image, query, k, 0.7 if image else 0, 0.3 if query else 0,
+                                                          search_filter)
+        headers = {'Cache-Control': 'no-store', 'X-Accel-Buffering': 'no'}
+        results = result_cache.get(key)
+        if results is not None:
+            body = json.dumps({"stage": "final", "results": [{**r, '_id': str(r['_id'])} for r in results]}) + "\n"
+            return Response(body, mimetype='application/x-ndjson', headers=headers)
+            
+        # The slot is held until the stream is closed, not just until this view returns
+        search_admission.acquire()
+        response = Response(search_events(key, image, text, k, image_weight, text_weight, search_filter),
+                            mimetype='application/x-ndjson', headers=headers)
+        response.call_on_close(search_admission.release)
+        return response
+        
+    except Overloaded as e:
+        return overloaded_response(e)
     except Exception as e:
         logging.error(f"Search error: {str(e)}")
         return jsonify({"error": "Search failed", "details": str(e)}), 500
         
+@app.route('/api/search')
+def search_get():
+    """Text search over GET, cacheable by browsers and CDNs and revalidated against the catalogue generation"""
+    try:
+        query = (request.args.get('q') or '').strip()
+        if not query:
+            return jsonify({"error": "Please provide a query"}), 400
+        # Only input errors are 400s; failures while searching go to the degraded or 5xx paths
+        try:
+            k = min(int(request.args.get('k', 10)), 50)
+            if k < 1:
+                raise ValueError("k must be positive")
+            search_filter = build_search_filter(filters_from_params(request.args))
+        except ValueError as e:
+            return jsonify({"error": "Invalid request", "details": str(e)}), 400
+            
+        # Results only change when the catalogue does, so the ETag is known before searching
+        etag = f"{collection_generation()}-{search_signature(query, None, 0.0, 1.0, k, search_filter)[:16]}"
+        if request.if_none_match.contains_weak(etag):
+            response = app.response_class(status=304)
+        else:
+            results = hybrid_search(text=query, k=k, image_weight=0, text_weight=1, search_filter=search_filter)
+            response = jsonify([{**r, '_id': str(r['_id'])} for r in results])
+            if isinstance(results, PartialResults):
+                # A vector leg failed or timed out; the next request should try again
+                response.headers['Cache-Control'] = 'no-store'
+                return response
+        if g.get('search_degraded'):
+            # Lexical fallback: don't let caches keep it once embeddings recover
+            response.headers['X-Search-Degraded'] = 'lexical'
+            response.headers['Cache-Control'] = 'no-store'
+            return response
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = (f"public, max-age={SEARCH_HTTP_MAX_AGE}, "
+                                             f"stale-while-revalidate={SEARCH_HTTP_MAX_AGE * 5}")
+        return response
+        
+    except Overloaded as e:
+        return overloaded_response(e)
+    except Exception as e:
+        logging.error(f"Search error: {str(e)}")
+        return jsonify({"error": "Search failed", "details": str(e)}), 500
+        
+@app.route('/search/ingredients', methods=['POST'])
+def search_by_ingredients():
+    """Recipes you can make with the ingredients on hand, ranked by how much of each is covered"""
+    try:
+        if not request.is_json:
+            return jsonify({"error": "Request must be JSON"}), 400
+            
+        data = request.get_json()
+        ingredients = data.get('ingredients') or []
+        if isinstance(ingredients, str):
+            ingredients = ingredients.split(',')
+        ingredients = [i.strip() for i in ingredients if isinstance(i, str) and i.strip()]
+        
+        if not ingredients:
+            return jsonify({"error": "Please provide at least one ingredient"}), 400
+        if ingredient_index is None:
+            return jsonify({"error": "Ingredient search is unavailable"}), 503
+            
+        # JSON booleans, or the strings "true"/"false"; bool("false") would be True
+        assume_staples = data.get('assume_staples', True)
+        if isinstance(assume_staples, str) and assume_staples.lower() in ('true', 'false'):
+            assume_staples = assume_staples.lower() == 'true'
+        if not isinstance(assume_staples, bool):
+            raise ValueError("assume_staples must be true or false")
+        max_missing = data.get('max_missing')
+        result = ingredient_index.search(
+            ingredients,
+            k=min(int(data.get('k', 10)), 50),
+            max_missing=int(max_missing) if max_missing is not None else None,
+            assume_staples=assume_staples
+        )
+        return jsonify(result)
+        
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": "Invalid request", "details": str(e)}), 400
+    except Exception as e:
+        logging.error(f"Ingredient search error: {str(e)}")
+        return jsonify({"error": "Search failed", "details": str(e)}), 500
+        
+@app.route('/search/batch', methods=['POST'])
+def search_batch():
+    """Run many text/image searches in one request, embedding and searching them concurrently"""
+    try:
+        if not request.is_json:
+            return jsonify({"error": "Request must be JSON"}), 400
+            
+        data = request.get_json()
+        queries = data.get('queries')
+        if not isinstance(queries, list) or not queries:
+            return jsonify({"error": "Please provide a non-empty list of queries"}), 400
+        if len(queries) > MAX_BATCH_QUERIES:
+            return jsonify({"error": f"At most {MAX_BATCH_QUERIES} queries per batch"}), 400
+        k = min(int(data.get('k', 10)), 50)
+        if k < 1:
+            raise ValueError("k must be positive")
+        
+        parsed = []
+        invalid = {}
+        for position, item in enumerate(queries):
+            item = {"query": item} if isinstance(item, str) else (item if isinstance(item, dict) else {})
+            text, image = item.get('query'), item.get('image')
+            if not isinstance(text, (str, type(None))) or not isinstance(image, (str, type(None))):
+                invalid[position] = {"query": text, "error": "query and image must be strings"}
+                text, image = None, None
+            try:
+                decode_data_url(image)
+            except InvalidImageError as e:
+                invalid[position] = {"query": text, "error": f"Invalid image: {str(e)}"}
+                text, image = None, None
+            parsed.append(((text or '').strip(), image))
+        
+        # Identical queries are embedded once
+        unique = list(dict.fromkeys(q for q in parsed if q[0] or q[1]))
+        with search_admission.slot():
+            embedded = dict(zip(unique, get_embeddings_many([(image, text or None) for text, image in unique])))
+        
+        output = []
+        searches = []
+        positions = []
+        for position, (text, image) in enumerate(parsed):
+            embeddings = embedded.get((text, image))
+            if position in invalid:
+                output.append(invalid[position])
+            elif not text and not image:
+                output.append({"query": text, "error": "Please provide either text or image"})
+            elif not embeddings or (not embeddings["image_embedding"] and not embeddings["text_embedding"]):
+                output.append({"query": text, "error": "Failed to get valid embeddings"})
+            else:
+                output.append(None)
+                positions.append(position)
+                searches.append({
+                    **embeddings,
+                    "image_weight": 0.7 if image else 0,
+                    "text_weight": 0.3 if text else 0
+                })
+        
+        batch_results = batch_vector_search(recipes_collection, searches, k=k, local_store=local_vectors)
+        for position, results in zip(positions, batch_results):
+            output[position] = {
+                "query": parsed[position][0],
+                "results": [{**r, '_id': str(r['_id'])} for r in results]
+            }
+        return jsonify({"results": output})
+        
+    except Overloaded as e:
+        return overloaded_response(e)
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": "Invalid request", "details": str(e)}), 400
+    except Exception as e:
+        logging.error(f"Batch search error: {str(e)}")
+        return jsonify({"error": "Search failed", "details": str(e)}), 500
+        
+@app.route('/search/similar/<recipe_id>')
+def search_similar(recipe_id):
+    """Search by example: rank recipes against this recipe's stored vectors, without calling Vertex AI"""
+    try:
+        k = min(int(request.args.get('k', 10)), 50)
+        if k < 1:
+            raise ValueError("k must be positive")
+        image_weight = float(request.args.get('w_img', 0.5))
+        if not 0 <= image_weight <= 1:
+            raise ValueError("w_img must be between 0 and 1")
+            
+        embeddings = stored_embeddings(recipe_id)
+        if embeddings is None:
+            return jsonify({"error": "Recipe not found"}), 404
+        if embeddings["image_embedding"] is None and embeddings["text_embedding"] is None:
+            return jsonify({"error": "Recipe has no stored embeddings"}), 404
+        # A recipe missing one vector is ranked on the other alone, whatever w_img asked for
+        if embeddings["image_embedding"] is None:
+            image_weight = 0.0
+        elif embeddings["text_embedding"] is None:
+            image_weight = 1.0
+            
+        results = vector_search(
+            recipes_collection,
+            embeddings,
+            k=k,
+            image_weight=image_weight,
+            text_weight=1 - image_weight,
+            exclude_id=recipe_id,
+            local_store=local_vectors
+        )
+        return jsonify([{**r, '_id': str(r['_id'])} for r in results])
+        
+    except (ValueError, InvalidId) as e:
+        return jsonify({"error": "Invalid request", "details": str(e)}), 400
+    except Exception as e:
+        logging.error(f"Similar search error: {str(e)}")
+        return jsonify({"error": "Search failed", "details": str(e)}), 500
+        
+@app.route('/metrics')
+def metrics():
+    """Per-worker search metrics in the Prometheus text format"""
+    gauges = {
+        **{f"search_admission_{name}": value for name, value in search_admission.stats().items()},
+        **{f"search_result_cache_{name}": int(value) for name, value in result_cache.stats().items()},
+        **{f"search_single_flight_{name}": value for name, value in search_flight.stats().items()},
+        "embedding_breaker_open": int(embedding_breaker.state != CircuitBreaker.CLOSED),
+        "embedding_breaker_rejected": embedding_breaker.rejected,
+    }
+    pid = os.getpid()
+    lines = [f'{name}{{pid="{pid}"}} {value}' for name, value in gauges.items()]
+    return Response("\n".join(lines) + "\n", mimetype='text/plain')
+
 @app.route('/recipe/<recipe_id>')
 def recipe_detail(recipe_id):
     try:
@@ -289,12 +640,29 @@ def recipe_detail(recipe_id):
             
         recipe['_id'] = str(recipe['_id'])
         recipe.setdefault('audio_steps', [])
+        
+        # Both lists are precomputed by the pipeline, so this is a single indexed $in lookup
+        similar_ids = recipe.get('similar_recipe_ids') or []
+        more_like_this_ids = more_like_this(recipe)
+        similar_recipes = []
+        more_like_this_recipes = []
+        if similar_ids or more_like_this_ids:
+            similar_by_id = {
+                doc['meal_id']: {**doc, '_id': str(doc['_id'])}
+                for doc in recipes_collection.find(
+                    {'meal_id': {'$in': list(set(similar_ids) | set(more_like_this_ids))}},
+                    {'_id': 1, 'meal_id': 1, 'name': 1, 'category': 1, 'area': 1, 'img_url': 1}
+                )
+            }
+            similar_recipes = [similar_by_id[i] for i in similar_ids if i in similar_by_id]
+            more_like_this_recipes = [similar_by_id[i] for i in more_like_this_ids if i in similar_by_id]
         recipe.setdefault('time_analysis', {
             'total_estimated_time_minutes': 0,
             'recipe_difficulty': 'Unknown'
         })
         
-        return render_template('recipe.html', recipe=recipe)
+        return render_template('recipe.html', recipe=recipe, similar_recipes=similar_recipes,
+                               more_like_this=more_like_this_recipes)
     except Exception as e:
         logging.error(f"Recipe detail error: {str(e)}")
         return render_template('error.html'), 400
@@ -0,0 +1,655 @@
+import os
+import asyncio
+import contextlib
+import json
+import logging
+import time
+from bson import ObjectId
+from bson.errors import InvalidId
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from motor.motor_asyncio import AsyncIOMotorClient
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.background import BackgroundTask
+from starlette.responses import HTMLResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+from starlette.staticfiles import StaticFiles
+from config import (MONGODB_URI, DB_NAME, COLLECTION_NAME, GCP_PROJECT, GCP_REGION, FLASK_ENV,
+                    LOCAL_VECTOR_SEARCH, MAX_BATCH_QUERIES, RESULT_CACHE_SIZE, RESULT_CACHE_TTL_SECONDS, REDIS_URL,
+                    META_COLLECTION_NAME, GENERATION_REFRESH_SECONDS, SEARCH_HTTP_MAX_AGE, SEARCH_DEADLINE_SECONDS,
+                    EMBEDDING_HEDGE_QUANTILE, EMBEDDING_BREAKER_FAILURES, EMBEDDING_BREAKER_SLOW_SECONDS,
+                    EMBEDDING_BREAKER_RESET_SECONDS, ASYNC_SEARCH_MAX_CONCURRENT, ASYNC_SEARCH_MAX_QUEUE,
+                    SEARCH_QUEUE_TIMEOUT_SECONDS)
+from serving.admission import Overloaded
+from serving.aio import AsyncAdmissionController, AsyncSingleFlight, hedged
+from serving.catalogue import active_collection_name, build_memory_indexes
+from serving.images import InvalidImageError, decode_data_url
+from serving.ranking import (RESULT_PROJECTION, VECTOR_INDEXES, PartialResults, build_search_filter,
+                             filters_from_params, fuse_results, leg_weights, more_like_this, normalize_query,
+                             normalize_weights, search_signature, vector_search_pipeline)
+from serving.resilience import CircuitBreaker, CircuitOpenError, EmbeddingUnavailableError, LatencyTracker
+from serving.result_cache import ResultCache
+from serving.vertex_rest import AsyncMultimodalEmbedder
+
+# Async serving mode: the same routes and templates as app.py on Starlette, with Motor for
+# MongoDB and non-blocking Vertex AI calls, so one worker keeps hundreds of searches in flight.
+#   gunicorn -k uvicorn.workers.UvicornWorker -w 2 asgi_app:app
+
+logging.basicConfig(level=logging.DEBUG if FLASK_ENV == "development" else logging.INFO)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Flask-style url_for so the templates are shared with app.py unchanged
+URL_RULES = {
+    "index": "/",
+    "recipe_detail": "/recipe/{recipe_id}",
+    "static": "/static/{filename}",
+}
+
+def url_for(endpoint, **values):
+    return URL_RULES[endpoint].format(**values)
+
+templates = Environment(loader=FileSystemLoader(os.path.join(BASE_DIR, "templates")),
+                        autoescape=select_autoescape(["html"]))
+templates.globals["url_for"] = url_for
+
+def render(template, status_code=200, **context):
+    return HTMLResponse(templates.get_template(template).render(**context), status_code=status_code)
+
+# Set up in lifespan(), once the event loop is running
+recipes_collection = None
+meta_collection = None
+embedder = None
+ingredient_index = None
+local_vectors = None
+
+search_flight = AsyncSingleFlight()
+search_admission = AsyncAdmissionController(max_concurrent=ASYNC_SEARCH_MAX_CONCURRENT,
+                                            max_queue=ASYNC_SEARCH_MAX_QUEUE,
+                                            queue_timeout=SEARCH_QUEUE_TIMEOUT_SECONDS)
+result_cache = ResultCache.from_url(REDIS_URL, max_entries=RESULT_CACHE_SIZE, ttl_seconds=RESULT_CACHE_TTL_SECONDS)
+embedding_latency = LatencyTracker()
+embedding_breaker = CircuitBreaker(failure_threshold=EMBEDDING_BREAKER_FAILURES,
+                                   slow_call_seconds=EMBEDDING_BREAKER_SLOW_SECONDS,
+                                   reset_seconds=EMBEDDING_BREAKER_RESET_SECONDS)
+_generation = {"value": 0, "checked_at": 0.0}
+_catalogue_switch = {"task": None}
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    global recipes_collection, meta_collection, embedder, ingredient_index, local_vectors
+    client = AsyncIOMotorClient(MONGODB_URI, maxPoolSize=200, connectTimeoutMS=30000, socketTimeoutMS=30000,
+                                serverSelectionTimeoutMS=30000)
+    await client.admin.command('ping')
+    db = client[DB_NAME]
+    meta_collection = db[META_COLLECTION_NAME]
+    # The pipeline loads each catalogue into a staging collection and then points the alias at it
+    recipes_collection = db[active_collection_name(await meta_collection.find_one({'_id': COLLECTION_NAME}),
+                                                   COLLECTION_NAME)]
+    print(f"✅ MongoDB (Motor) connected successfully to {DB_NAME}.{recipes_collection.name}")
+
+    try:
+        embedder = AsyncMultimodalEmbedder(GCP_PROJECT, GCP_REGION)
+        print("✅ Vertex AI embedding client ready")
+    except Exception as e:
+        logging.error(f"❌ Vertex AI initialization failed: {str(e)}")
+
+    # Built with the synchronous driver Motor wraps, off the event loop
+    ingredient_index, local_vectors = await asyncio.to_thread(
+        build_memory_indexes, recipes_collection.delegate, LOCAL_VECTOR_SEARCH
+    )
+
+    refresher = asyncio.create_task(refresh_catalogue())
+
+    yield
+
+    refresher.cancel()
+    if embedder is not None:
+        await embedder.close()
+    client.close()
+
+async def cache_get(key):
+    # The shared tier is a network call; keep it off the event loop
+    if result_cache.shared is not None:
+        return await asyncio.to_thread(result_cache.get, key)
+    return result_cache.get(key)
+
+async def cache_set(key, value):
+    if result_cache.shared is not None:
+        await asyncio.to_thread(result_cache.set, key, value)
+    else:
+        result_cache.set(key, value)
+
+async def collection_generation():
+    """Catalogue generation bumped by the pipeline on every upload, re-read every few seconds"""
+    now = time.monotonic()
+    if now - _generation["checked_at"] >= GENERATION_REFRESH_SECONDS:
+        _generation["checked_at"] = now
+        try:
+            doc = await meta_collection.find_one({'_id': COLLECTION_NAME}, {'generation': 1, 'active_collection': 1})
+            active = active_collection_name(doc, COLLECTION_NAME)
+            if active != recipes_collection.name:
+                # Keep serving the previous catalogue, and its generation, until the new one is loaded
+                if _catalogue_switch["task"] is None or _catalogue_switch["task"].done():
+                    _catalogue_switch["task"] = asyncio.create_task(
+                        switch_catalogue(active, doc.get('generation', 0))
+                    )
+            else:
+                _generation["value"] = doc.get('generation', 0) if doc else 0
+        except Exception as e:
+            logging.warning(f"Could not read catalogue generation: {str(e)}")
+    return _generation["value"]
+
+async def switch_catalogue(name, generation):
+    """app.switch_catalogue: build the in-memory indexes for a newly promoted collection, then serve from it"""
+    global recipes_collection, ingredient_index, local_vectors
+    collection = meta_collection.database[name]
+    new_ingredient_index, new_local_vectors = await asyncio.to_thread(
+        build_memory_indexes, collection.delegate, LOCAL_VECTOR_SEARCH
+    )
+    recipes_collection, ingredient_index, local_vectors = collection, new_ingredient_index, new_local_vectors
+    _generation["value"] = generation
+    print(f"🔗 Now serving {DB_NAME}.{name} (generation {generation})")
+
+async def refresh_catalogue():
+    """Follow the catalogue alias on a timer, so every route switches even on workers that see no searches"""
+    while True:
+        await asyncio.sleep(GENERATION_REFRESH_SECONDS)
+        await collection_generation()
+
+def hedge_delay():
+    return min(max(embedding_latency.percentile(EMBEDDING_HEDGE_QUANTILE, default=1.0), 0.25), 2.0)
+
+def record_embedding(result, seconds):
+    if result is not None:
+        embedding_latency.record(seconds)
+    embedding_breaker.record(result is not None, seconds)
+
+async def get_embeddings(image=None, text=None, timeout=SEARCH_DEADLINE_SECONDS):
+    """Embeddings for one query, hedged; raises CircuitOpenError / asyncio.TimeoutError /
+    EmbeddingUnavailableError / InvalidImageError like app.get_embeddings"""
+    image = decode_data_url(image)
+    if embedder is None:
+        raise EmbeddingUnavailableError("Vertex AI model not available")
+    if not embedding_breaker.allow():
+        raise CircuitOpenError("Embedding service unavailable")
+    try:
+        embeddings = await hedged(lambda: embedder.embed(image, text), hedge_delay(), timeout,
+                                  on_result=record_embedding)
+    except asyncio.TimeoutError:
+        raise
+    except Exception as e:
+        logging.error(f"Vertex AI error: {str(e)}")
+        raise EmbeddingUnavailableError("Failed to get valid embeddings") from e
+    if not embeddings or (not embeddings["image_embedding"] and not embeddings["text_embedding"]):
+        raise EmbeddingUnavailableError("Failed to get valid embeddings")
+    return embeddings
+
+async def atlas_vector_search(field, query_vector, limit, max_time_ms=None, search_filter=None):
+    try:
+        options = {"maxTimeMS": max_time_ms} if max_time_ms else {}
+        pipeline = vector_search_pipeline(field, query_vector, limit, search_filter=search_filter)
+        cursor = recipes_collection.aggregate(pipeline, **options)
+        return await cursor.to_list(length=None)
+    except Exception as e:
+        logging.error(f"{field} vector search failed: {str(e)}")
+        return PartialResults()
+
+async def vector_search(embeddings, k=5, image_weight=0.5, text_weight=0.5, exclude_id=None, max_time_ms=None,
+                        search_filter=None):
+    """serving.ranking.vector_search with the Atlas legs awaited concurrently"""
+    image_weight, text_weight = normalize_weights(image_weight, text_weight)
+    limit = k * 3 + (1 if exclude_id else 0)
+    legs = [(field, embeddings[field]) for field in VECTOR_INDEXES
+            if embeddings.get(field) is not None and len(embeddings[field])]
+    if local_vectors is not None:
+        result_lists = await asyncio.to_thread(
+            lambda: [local_vectors.search(field, vector, limit, search_filter) for field, vector in legs]
+        )
+    else:
+        result_lists = await asyncio.gather(*(atlas_vector_search(field, vector, limit, max_time_ms, search_filter)
+                                              for field, vector in legs))
+    return fuse_results(result_lists, image_weight, text_weight, k, exclude_id=exclude_id)
+
+async def lexical_search(text, k=5, max_time_ms=None, search_filter=None):
+    cursor = recipes_collection.find(
+        {"$text": {"$search": text}, **(search_filter or {})},
+        {**RESULT_PROJECTION, "lexical_score": {"$meta": "textScore"}}
+    ).sort([("lexical_score", {"$meta": "textScore"})]).limit(k)
+    if max_time_ms:
+        cursor = cursor.max_time_ms(max_time_ms)
+    return await cursor.to_list(length=k)
+
+def remaining_ms(deadline, floor=50):
+    return max(floor, int((deadline - time.monotonic()) * 1000))
+
+async def search_key(image, text, k, image_weight, text_weight, search_filter=None):
+    image_weight, text_weight = normalize_weights(image_weight, text_weight)
+    text = text.strip() if text and normalize_query(text) else None
+    signature = search_signature(text, image, image_weight, text_weight, k, search_filter)
+    return f"{await collection_generation()}:{signature}", text, image_weight, text_weight
+
+async def hybrid_search(image=None, text=None, k=5, image_weight=0.5, text_weight=0.5, search_filter=None):
+    """app.hybrid_search for the event loop; returns (results, degraded)"""
+    deadline = time.monotonic() + SEARCH_DEADLINE_SECONDS
+    key, text, image_weight, text_weight = await search_key(image, text, k, image_weight, text_weight,
+                                                            search_filter)
+    results = await cache_get(key)
+    if results is not None:
+        return results, False
+
+    async def search_and_cache():
+        # Only the single-flight leader takes an admission slot; followers just wait for its result
+        async with search_admission:
+            embeddings = await get_embeddings(image, text, timeout=max(0.0, deadline - time.monotonic()))
+            found = await vector_search(embeddings, k=k, image_weight=image_weight, text_weight=text_weight,
+                                        max_time_ms=remaining_ms(deadline), search_filter=search_filter)
+        if not isinstance(found, PartialResults):
+            await cache_set(key, found)
+        return found
+
+    try:
+        return await search_flight.do(key, search_and_cache, timeout=max(0.0, deadline - time.monotonic())), False
+    except (CircuitOpenError, asyncio.TimeoutError, EmbeddingUnavailableError) as e:
+        if not text:
+            raise
+        logging.warning(f"Embeddings unavailable ({type(e).__name__}), falling back to lexical search")
+        return await lexical_search(text, k=k, max_time_ms=remaining_ms(deadline, floor=500),
+                                    search_filter=search_filter), True
+
+async def vector_search_stream(embeddings, k=5, image_weight=0.5, text_weight=0.5, max_time_ms=None,
+                               search_filter=None):
+    """serving.ranking.vector_search_stream for the event loop"""
+    image_weight, text_weight = normalize_weights(image_weight, text_weight)
+    limit = k * 3
+    legs = [(field, embeddings[field]) for field in VECTOR_INDEXES
+            if embeddings.get(field) is not None and len(embeddings[field])]
+
+    async def run_leg(field, vector):
+        if local_vectors is not None:
+            return field, await asyncio.to_thread(local_vectors.search, field, vector, limit, search_filter)
+        return field, await atlas_vector_search(field, vector, limit, max_time_ms, search_filter)
+
+    result_lists = []
+    for finished in asyncio.as_completed([run_leg(field, vector) for field, vector in legs]):
+        field, results = await finished
+        result_lists.append(results)
+        if len(result_lists) == 1 and len(legs) > 1:
+            yield "provisional", fuse_results(result_lists, *leg_weights(field), k)
+    yield "final", fuse_results(result_lists, image_weight, text_weight, k)
+
+async def search_events(key, image, text, k, image_weight, text_weight, search_filter=None):
+    """NDJSON lines for /search/stream: provisional results from the first vector leg, then the final ranking"""
+    def line(stage, results=None, **extra):
+        if results is not None:
+            extra["results"] = serialize(results)
+        return json.dumps({"stage": stage, **extra}) + "\n"
+
+    deadline = time.monotonic() + SEARCH_DEADLINE_SECONDS
+    try:
+        embeddings = await get_embeddings(image, text, timeout=max(0.0, deadline - time.monotonic()))
+        async for stage, results in vector_search_stream(embeddings, k=k, image_weight=image_weight,
+                                                         text_weight=text_weight, max_time_ms=remaining_ms(deadline),
+                                                         search_filter=search_filter):
+            if stage == "final" and not isinstance(results, PartialResults):
+                await cache_set(key, results)
+            yield line(stage, results)
+    except (CircuitOpenError, asyncio.TimeoutError, EmbeddingUnavailableError):
+        if not text:
+            yield line("error", error="Image search is temporarily unavailable")
+            return
+        results = await lexical_search(text, k=k, max_time_ms=remaining_ms(deadline, floor=500),
+                                       search_filter=search_filter)
+        yield line("final", results, degraded="lexical")
+    except Exception as e:
+        logging.error(f"Streaming search error: {str(e)}")
+        yield line("error", error="Search failed")
+
+def serialize(results):
+    return [{**r, '_id': str(r['_id'])} for r in results]
+
+def overloaded_response(e):
+    return JSONResponse({"error": "Search is busy, please try again shortly"}, status_code=503,
+                        headers={'Retry-After': str(e.retry_after)})
+
+async def index(request):
+    """Homepage with recipe carousel"""
+    try:
+        cursor = recipes_collection.aggregate([{'$sample': {'size': 10}}, {'$project': RESULT_PROJECTION}])
+        return render('index.html', recipes=await cursor.to_list(length=10))
+    except Exception as e:
+        logging.error(f"Homepage error: {str(e)}")
+        return render('500.html', status_code=500)
+
+async def search(request):
+    try:
+        try:
+            data = await request.json()
+        except ValueError:
+            return JSONResponse({"error": "Request must be JSON"}, status_code=400)
+        query = (data.get('query') or '').strip()
+        image = data.get('image')
+        if not query and not image:
+            return JSONResponse({"error": "Please provide either text or image"}, status_code=400)
+        try:
+            search_filter = build_search_filter(data.get('filters'))
+        except (TypeError, ValueError) as e:
+            return JSONResponse({"error": "Invalid filters", "details": str(e)}, status_code=400)
+        try:
+            decode_data_url(image)
+        except InvalidImageError as e:
+            return JSONResponse({"error": "Invalid image", "details": str(e)}, status_code=400)
+
+        results, degraded = await hybrid_search(image=image, text=query, k=10, image_weight=0.7 if image else 0,
+                                                text_weight=0.3 if query else 0, search_filter=search_filter)
+        return JSONResponse(serialize(results), headers={'X-Search-Degraded': 'lexical'} if degraded else None)
+
+    except Overloaded as e:
+        return overloaded_response(e)
+    except (CircuitOpenError, asyncio.TimeoutError, EmbeddingUnavailableError):
+        return JSONResponse({"error": "Image search is temporarily unavailable"}, status_code=503,
+                            headers={'Retry-After': str(int(EMBEDDING_BREAKER_RESET_SECONDS))})
+    except Exception as e:
+        logging.error(f"Search error: {str(e)}")
+        return JSONResponse({"error": "Search failed", "details": str(e)}, status_code=500)
+
+async def search_stream(request):
+    """/search as NDJSON, so results show as soon as the faster vector leg is back"""
+    try:
+        try:
+            data = await request.json()
+        except ValueError:
+            return JSONResponse({"error": "Request must be JSON"}, status_code=400)
+        query = (data.get('query') or '').strip()
+        image = data.get('image')
+        if not query and not image:
+            return JSONResponse({"error": "Please provide either text or image"}, status_code=400)
+        try:
+            search_filter = build_search_filter(data.get('filters'))
+        except (TypeError, ValueError) as e:
+            return JSONResponse({"error": "Invalid filters", "details": str(e)}, status_code=400)
+        try:
+            decode_data_url(image)
+        except InvalidImageError as e:
+            return JSONResponse({"error": "Invalid image", "details": str(e)}, status_code=400)
+
+        k = 10
+        key, text, image_weight, text_weight = await search_key(image, query, k, 0.7 if image else 0,
+                                                                0.3 if query else 0, search_filter)
+        headers = {'Cache-Control': 'no-store', 'X-Accel-Buffering': 'no'}
+        results = await cache_get(key)
+        if results is not None:
+            return Response(json.dumps({"stage": "final", "results": serialize(results)}) + "\n",
+                            media_type='application/x-ndjson', headers=headers)
+
+        # The slot is held until the stream has been sent, not just until this handler returns
+        await search_admission.__aenter__()
+        return StreamingResponse(search_events(key, image, text, k, image_weight, text_weight, search_filter),
+                                 media_type='application/x-ndjson', headers=headers,
+                                 background=BackgroundTask(search_admission.__aexit__))
+
+    except Overloaded as e:
+        return overloaded_response(e)
+    except Exception as e:
+        logging.error(f"Search error: {str(e)}")
+        return JSONResponse({"error": "Search failed", "details": str(e)}, status_code=500)
+
+async def search_get(request):
+    """Text search over GET, cacheable by browsers and CDNs and revalidated against the catalogue generation"""
+    try:
+        query = (request.query_params.get('q') or '').strip()
+        if not query:
+            return JSONResponse({"error": "Please provide a query"}, status_code=400)
+        # Only input errors are 400s; failures while searching go to the degraded or 5xx paths
+        try:
+            k = min(int(request.query_params.get('k', 10)), 50)
+            if k < 1:
+                raise ValueError("k must be positive")
+            search_filter = build_search_filter(filters_from_params(request.query_params))
+        except ValueError as e:
+            return JSONResponse({"error": "Invalid request", "details": str(e)}, status_code=400)
+
+        signature = search_signature(query, None, 0.0, 1.0, k, search_filter)
+        etag = f'W/"{await collection_generation()}-{signature[:16]}"'
+        cache_control = f"public, max-age={SEARCH_HTTP_MAX_AGE}, stale-while-revalidate={SEARCH_HTTP_MAX_AGE * 5}"
+        if_none_match = request.headers.get('if-none-match', '')
+        if etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*':
+            return Response(status_code=304, headers={'ETag': etag, 'Cache-Control': cache_control})
+
+        results, degraded = await hybrid_search(text=query, k=k, image_weight=0, text_weight=1,
+                                                search_filter=search_filter)
+        if degraded:
+            return JSONResponse(serialize(results), headers={'X-Search-Degraded': 'lexical',
+                                                             'Cache-Control': 'no-store'})
+        if isinstance(results, PartialResults):
+            return JSONResponse(serialize(results), headers={'Cache-Control': 'no-store'})
+        return JSONResponse(serialize(results), headers={'ETag': etag, 'Cache-Control': cache_control})
+
+    except Overloaded as e:
+        return overloaded_response(e)
+    except Exception as e:
+        logging.error(f"Search error: {str(e)}")
+        return JSONResponse({"error": "Search failed", "details": str(e)}, status_code=500)
+
+async def search_by_ingredients(request):
+    """Recipes you can make with the ingredients on hand, ranked by how much of each is covered"""
+    try:
+        try:
+            data = await request.json()
+        except ValueError:
+            return JSONResponse({"error": "Request must be JSON"}, status_code=400)
+        ingredients = data.get('ingredients') or []
+        if isinstance(ingredients, str):
+            ingredients = ingredients.split(',')
+        ingredients = [i.strip() for i in ingredients if isinstance(i, str) and i.strip()]
+
+        if not ingredients:
+            return JSONResponse({"error": "Please provide at least one ingredient"}, status_code=400)
+        if ingredient_index is None:
+            return JSONResponse({"error": "Ingredient search is unavailable"}, status_code=503)
+
+        # JSON booleans, or the strings "true"/"false"; bool("false") would be True
+        assume_staples = data.get('assume_staples', True)
+        if isinstance(assume_staples, str) and assume_staples.lower() in ('true', 'false'):
+            assume_staples = assume_staples.lower() == 'true'
+        if not isinstance(assume_staples, bool):
+            raise ValueError("assume_staples must be true or false")
+        max_missing = data.get('max_missing')
+        return JSONResponse(ingredient_index.search(
+            ingredients,
+            k=min(int(data.get('k', 10)), 50),
+            max_missing=int(max_missing) if max_missing is not None else None,
+            assume_staples=assume_staples
+        ))
+
+    except (TypeError, ValueError) as e:
+        return JSONResponse({"error": "Invalid request", "details": str(e)}, status_code=400)
+    except Exception as e:
+        logging.error(f"Ingredient search error: {str(e)}")
+        return JSONResponse({"error": "Search failed", "details": str(e)}, status_code=500)
+
+async def search_batch(request):
+    """Run many text/image searches in one request, embedding and searching them concurrently"""
+    try:
+        try:
+            data = await request.json()
+        except ValueError:
+            return JSONResponse({"error": "Request must be JSON"}, status_code=400)
+        queries = data.get('queries')
+        if not isinstance(queries, list) or not queries:
+            return JSONResponse({"error": "Please provide a non-empty list of queries"}, status_code=400)
+        if len(queries) > MAX_BATCH_QUERIES:
+            return JSONResponse({"error": f"At most {MAX_BATCH_QUERIES} queries per batch"}, status_code=400)
+        k = min(int(data.get('k', 10)), 50)
+        if k < 1:
+            raise ValueError("k must be positive")
+
+        parsed = []
+        invalid = {}
+        for position, item in enumerate(queries):
+            item = {"query": item} if isinstance(item, str) else (item if isinstance(item, dict) else {})
+            text, image = item.get('query'), item.get('image')
+            if not isinstance(text, (str, type(None))) or not isinstance(image, (str, type(None))):
+                invalid[position] = {"query": text, "error": "query and image must be strings"}
+                text, image = None, None
+            try:
+                decode_data_url(image)
+            except InvalidImageError as e:
+                invalid[position] = {"query": text, "error": f"Invalid image: {str(e)}"}
+                text, image = None, None
+            parsed.append(((text or '').strip(), image))
+
+        async def embed_or_none(text, image):
+            try:
+                return await get_embeddings(image, text or None)
+            except (CircuitOpenError, asyncio.TimeoutError, EmbeddingUnavailableError):
+                return None
+
+        # Identical queries are embedded once
+        unique = list(dict.fromkeys(q for q in parsed if q[0] or q[1]))
+        async with search_admission:
+            embedded = dict(zip(unique, await asyncio.gather(*(embed_or_none(text, image)
+                                                               for text, image in unique))))
+
+        async def run(position, text, image):
+            embeddings = embedded.get((text, image))
+            if position in invalid:
+                return invalid[position]
+            if not text and not image:
+                return {"query": text, "error": "Please provide either text or image"}
+            if not embeddings or (not embeddings["image_embedding"] and not embeddings["text_embedding"]):
+                return {"query": text, "error": "Failed to get valid embeddings"}
+            results = await vector_search(embeddings, k=k, image_weight=0.7 if image else 0,
+                                          text_weight=0.3 if text else 0)
+            return {"query": text, "results": serialize(results)}
+
+        return JSONResponse({"results": await asyncio.gather(*(run(position, text, image)
+                                                                   for position, (text, image) in enumerate(parsed)))})
+
+    except Overloaded as e:
+        return overloaded_response(e)
+    except (TypeError, ValueError) as e:
+        return JSONResponse({"error": "Invalid request", "details": str(e)}, status_code=400)
+    except Exception as e:
+        logging.error(f"Batch search error: {str(e)}")
+        return JSONResponse({"error": "Search failed", "details": str(e)}, status_code=500)
+
+async def stored_embeddings(recipe_id):
+    if local_vectors is not None:
+        vectors = local_vectors.vectors(recipe_id)
+        if vectors is not None:
+            return vectors
+    doc = await recipes_collection.find_one({'_id': ObjectId(recipe_id)}, {field: 1 for field in VECTOR_INDEXES})
+    if not doc:
+        return None
+    return {field: doc.get(field) for field in VECTOR_INDEXES}
+
+async def search_similar(request):
+    """Search by example: rank recipes against this recipe's stored vectors, without calling Vertex AI"""
+    recipe_id = request.path_params['recipe_id']
+    try:
+        k = min(int(request.query_params.get('k', 10)), 50)
+        if k < 1:
+            raise ValueError("k must be positive")
+        image_weight = float(request.query_params.get('w_img', 0.5))
+        if not 0 <= image_weight <= 1:
+            raise ValueError("w_img must be between 0 and 1")
+
+        embeddings = await stored_embeddings(recipe_id)
+        if embeddings is None:
+            return JSONResponse({"error": "Recipe not found"}, status_code=404)
+        if embeddings["image_embedding"] is None and embeddings["text_embedding"] is None:
+            return JSONResponse({"error": "Recipe has no stored embeddings"}, status_code=404)
+        # A recipe missing one vector is ranked on the other alone, whatever w_img asked for
+        if embeddings["image_embedding"] is None:
+            image_weight = 0.0
+        elif embeddings["text_embedding"] is None:
+            image_weight = 1.0
+
+        results = await vector_search(
+            embeddings,
+            k=k,
+            image_weight=image_weight,
+            text_weight=1 - image_weight,
+            exclude_id=recipe_id
+        )
+        return JSONResponse(serialize(results))
+
+    except (ValueError, InvalidId) as e:
+        return JSONResponse({"error": "Invalid request", "details": str(e)}, status_code=400)
+    except Exception as e:
+        logging.error(f"Similar search error: {str(e)}")
+        return JSONResponse({"error": "Search failed", "details": str(e)}, status_code=500)
+
+async def metrics(request):
+    """Per-worker search metrics in the Prometheus text format"""
+    gauges = {
+        **{f"search_admission_{name}": value for name, value in search_admission.stats().items()},
+        **{f"search_result_cache_{name}": int(value) for name, value in result_cache.stats().items()},
+        **{f"search_single_flight_{name}": value for name, value in search_flight.stats().items()},
+        "embedding_breaker_open": int(embedding_breaker.state != CircuitBreaker.CLOSED),
+        "embedding_breaker_rejected": embedding_breaker.rejected,
+    }
+    pid = os.getpid()
+    return PlainTextResponse("".join(f'{name}{{pid="{pid}"}} {value}\n' for name, value in gauges.items()))
+
+async def recipe_detail(request):
+    recipe_id = request.path_params['recipe_id']
+    try:
+        recipe = await recipes_collection.find_one({'_id': ObjectId(recipe_id)})
+        if not recipe:
+            return render('404.html', status_code=404)
+
+        recipe['_id'] = str(recipe['_id'])
+        recipe.setdefault('audio_steps', [])
+
+        similar_ids = recipe.get('similar_recipe_ids') or []
+        more_like_this_ids = more_like_this(recipe)
+        similar_recipes = []
+        more_like_this_recipes = []
+        if similar_ids or more_like_this_ids:
+            cursor = recipes_collection.find(
+                {'meal_id': {'$in': list(set(similar_ids) | set(more_like_this_ids))}},
+                {'_id': 1, 'meal_id': 1, 'name': 1, 'category': 1, 'area': 1, 'img_url': 1}
+            )
+            similar_by_id = {doc['meal_id']: {**doc, '_id': str(doc['_id'])}
+                             for doc in await cursor.to_list(length=None)}
+            similar_recipes = [similar_by_id[i] for i in similar_ids if i in similar_by_id]
+            more_like_this_recipes = [similar_by_id[i] for i in more_like_this_ids if i in similar_by_id]
+        recipe.setdefault('time_analysis', {
+            'total_estimated_time_minutes': 0,
+            'recipe_difficulty': 'Unknown'
+        })
+
+        return render('recipe.html', recipe=recipe, similar_recipes=similar_recipes,
+                      more_like_this=more_like_this_recipes)
+    except Exception as e:
+        logging.error(f"Recipe detail error: {str(e)}")
+        return render('500.html', status_code=400)
+
+async def not_found(request, exc):
+    return render('404.html', status_code=404)
+
+async def server_error(request, exc):
+    logging.critical(f"Server error: {str(exc)}")
+    return render('500.html', status_code=500)
+
+app = Starlette(
+    debug=FLASK_ENV == "development",
+    routes=[
+        Route('/', index),
+        Route('/search', search, methods=['POST']),
+        Route('/search/stream', search_stream, methods=['POST']),
+        Route('/api/search', search_get),
+        Route('/search/ingredients', search_by_ingredients, methods=['POST']),
+        Route('/search/batch', search_batch, methods=['POST']),
+        Route('/search/similar/{recipe_id}', search_similar),
+        Route('/metrics', metrics),
+        Route('/recipe/{recipe_id}', recipe_detail),
+        Mount('/static', StaticFiles(directory=os.path.join(BASE_DIR, 'static')), name='static'),
+    ],
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])],
+    exception_handlers={404: not_found, 500: server_error},
+    lifespan=lifespan
+)
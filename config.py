@@ -23,6 +23,61 @@ GCP_PROJECT = get_required_env("GCP_PROJECT")
 GCP_REGION = os.getenv("GCP_REGION", "us-central1")
 GEMINI_API_KEY = get_required_env("GEMINI_API_KEY")
 
+# Gemini quota (per model) and retry settings
+GEMINI_RPM = float(os.getenv("GEMINI_RPM", "60"))
+GEMINI_TPM = float(os.getenv("GEMINI_TPM", "1000000"))
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "5"))
+GEMINI_CONCURRENCY = int(os.getenv("GEMINI_CONCURRENCY", "8"))
+
+# Local time estimates below this confidence are escalated to Gemini
+TIME_ESTIMATE_MIN_CONFIDENCE = float(os.getenv("TIME_ESTIMATE_MIN_CONFIDENCE", "0.6"))
+
+# Health scoring: "local" computes the score from the food composition table, "gemini" asks the model
+HEALTH_SCORING = os.getenv("HEALTH_SCORING", "local")
+NUTRITION_TABLE_PATH = os.getenv(
+    "NUTRITION_TABLE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "food_composition.csv")
+)
+# Recipes with fewer recognised ingredients than this fall back to Gemini
+HEALTH_MIN_COVERAGE = float(os.getenv("HEALTH_MIN_COVERAGE", "0.6"))
+HEALTH_DESCRIBE_WITH_GEMINI = os.getenv("HEALTH_DESCRIBE_WITH_GEMINI", "false").lower() == "true"
+
+# Serve vector searches from an in-process copy of the embeddings instead of Atlas
+LOCAL_VECTOR_SEARCH = os.getenv("LOCAL_VECTOR_SEARCH", "false").lower() == "true"
+
+# Vector index quantization (none | scalar | binary) and how long uploads wait for search indexes to build
+VECTOR_INDEX_QUANTIZATION = os.getenv("VECTOR_INDEX_QUANTIZATION", "none")
+SEARCH_INDEX_TIMEOUT_SECONDS = float(os.getenv("SEARCH_INDEX_TIMEOUT_SECONDS", "600"))
+
+# Concurrent Vertex AI embedding calls per app instance (batch search fan-out)
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "8"))
+# Latency budget for one search; past it (or with the embedding breaker open) text searches fall back to lexical
+SEARCH_DEADLINE_SECONDS = float(os.getenv("SEARCH_DEADLINE_SECONDS", "8"))
+# Embedding calls slower than this quantile of recent latencies get a hedged second attempt
+EMBEDDING_HEDGE_QUANTILE = float(os.getenv("EMBEDDING_HEDGE_QUANTILE", "0.95"))
+# Consecutive failed (or slower than EMBEDDING_BREAKER_SLOW_SECONDS) calls that open the embedding breaker
+EMBEDDING_BREAKER_FAILURES = int(os.getenv("EMBEDDING_BREAKER_FAILURES", "5"))
+EMBEDDING_BREAKER_SLOW_SECONDS = float(os.getenv("EMBEDDING_BREAKER_SLOW_SECONDS", "5"))
+EMBEDDING_BREAKER_RESET_SECONDS = float(os.getenv("EMBEDDING_BREAKER_RESET_SECONDS", "30"))
+# Admission control per worker: searches running at once, searches allowed to wait, and how long they wait
+SEARCH_MAX_CONCURRENT = int(os.getenv("SEARCH_MAX_CONCURRENT", "3"))
+SEARCH_MAX_QUEUE = int(os.getenv("SEARCH_MAX_QUEUE", "3"))
+SEARCH_QUEUE_TIMEOUT_SECONDS = float(os.getenv("SEARCH_QUEUE_TIMEOUT_SECONDS", "2"))
+# The same for asgi_app.py, where a waiting search costs a coroutine rather than a thread
+ASYNC_SEARCH_MAX_CONCURRENT = int(os.getenv("ASYNC_SEARCH_MAX_CONCURRENT", "64"))
+ASYNC_SEARCH_MAX_QUEUE = int(os.getenv("ASYNC_SEARCH_MAX_QUEUE", "256"))
+# Most queries accepted by one /search/batch request
+MAX_BATCH_QUERIES = int(os.getenv("MAX_BATCH_QUERIES", "100"))
+
+# Search result cache: per-process LRU plus an optional shared Redis-protocol tier
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "2048"))
+RESULT_CACHE_TTL_SECONDS = float(os.getenv("RESULT_CACHE_TTL_SECONDS", "300"))
+REDIS_URL = os.getenv("REDIS_URL")
+# Holds the catalogue generation the pipeline bumps on every upload (part of every cache key)
+META_COLLECTION_NAME = os.getenv("META_COLLECTION_NAME", "search_meta")
+GENERATION_REFRESH_SECONDS = float(os.getenv("GENERATION_REFRESH_SECONDS", "5"))
+# Browser/CDN freshness for GET /api/search responses (revalidated by ETag afterwards)
+SEARCH_HTTP_MAX_AGE = int(os.getenv("SEARCH_HTTP_MAX_AGE", "60"))
+
 # Flask Configuration
 FLASK_ENV = os.getenv("FLASK_ENV", "development")
 FLASK_SECRET_KEY = os.getenv("FLASK_SECRET_KEY", "dev-secret-key-change-in-production")
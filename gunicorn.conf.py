@@ -1,5 +1,5 @@
 bind = "0.0.0.0:8080"
 workers = 2
-threads = 4
+threads = 8  # searches use at most SEARCH_MAX_CONCURRENT + SEARCH_MAX_QUEUE of these
 timeout = 120
 keepalive = 65
\ No newline at end of file
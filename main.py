@@ -1,10 +1,17 @@
-from pipeline.extract import fetch_mealdb
-from pipeline.load import save_to_csv
+import sys
+from pipeline.extract import fetch_mealdb, iter_mealdb
+from pipeline.load import save_to_csv, stream_to_csv
 from pipeline.analyze_health import HealthAnalyzer
 from pipeline.analyze_time import TimeAnalyzer
 from pipeline.audio_generator import AudioGenerator
 from pipeline.embedding_generator import EmbeddingGenerator
-from pipeline.mongodb_upload import MongoDBUploader  
+from pipeline.mongodb_upload import MongoDBUploader
+from pipeline.stream import map_stage, queued_stage
+from pipeline.scheduler import DagScheduler, Stage
+from pipeline.enrich import RecipeEnricher
+from pipeline.canonicalize import IngredientCanonicalizer
+from pipeline.similar_recipes import store_similar_recipes
+from pipeline.embedding_neighbors import store_embedding_neighbors
 
 def main():
     try:
@@ -13,26 +20,30 @@ def main():
         # 1. Fetch recipes
         recipes = fetch_mealdb(limit=400)
         
-        # 2. Analyze health
+        # 2. Canonicalize ingredients
+        canonicalizer = IngredientCanonicalizer.from_catalogue()
+        recipes = canonicalizer.canonicalize_recipes(recipes)
+        
+        # 3. Analyze health
         health_analyzer = HealthAnalyzer()
         recipes = health_analyzer.analyze_recipes(recipes)
         
-        # 3. Analyze time
+        # 4. Analyze time
         time_analyzer = TimeAnalyzer()
         recipes = time_analyzer.analyze_recipes(recipes)
         
-        # 4. Generate audio instructions
+        # 5. Generate audio instructions
         audio_generator = AudioGenerator()
         recipes = audio_generator.process_recipes(recipes)
         
-        # 5. Generate embeddings
+        # 6. Generate embeddings
         embedding_generator = EmbeddingGenerator()
         recipes = embedding_generator.generate_embeddings(recipes)
         
-        # 6. Save to CSV
+        # 7. Save to CSV
         save_to_csv(recipes)
         
-        # 7. Upload to MongoDB (NEW STEP)
+        # 8. Upload to MongoDB (NEW STEP)
         print("\n📦 Uploading to MongoDB...")
         mongo_uploader = MongoDBUploader()
         upload_result = mongo_uploader.upload_recipes(recipes)
@@ -43,9 +54,125 @@ def main():
             print(f"❌ MongoDB upload failed: {upload_result['error']}")
             raise Exception(f"MongoDB upload failed: {upload_result['error']}")
         
+        # 9. Precompute similar recipes (by ingredients and by embeddings)
+        store_similar_recipes(mongo_uploader)
+        store_embedding_neighbors(mongo_uploader)
+        generation = mongo_uploader.promote()
+        print(f"🔗 Searches now read {mongo_uploader.collection.name}")
+        print(f"🔁 Catalogue generation is now {generation}")
+        
+        print("Pipeline completed successfully!")
+    except Exception as e:
+        print(f"Pipeline failed: {str(e)}")
+
+def main_streaming(queue_size: int = 8):
+    """Run the same stages as main() but pass recipes through one at a time.
+
+    Each stage runs in its own thread(s) behind a bounded queue, so memory stays flat
+    regardless of catalogue size and uploads start as soon as the first recipe is ready.
+    """
+    try:
+        print("Starting streaming recipe pipeline...")
+
+        canonicalizer = IngredientCanonicalizer.from_catalogue()
+        health_analyzer = HealthAnalyzer()
+        time_analyzer = TimeAnalyzer()
+        audio_generator = AudioGenerator()
+        embedding_generator = EmbeddingGenerator()
+        mongo_uploader = MongoDBUploader()
+
+        recipes = iter_mealdb(limit=400)
+        # Canonicalizing is cheap local work, so it runs inline rather than behind a queue
+        recipes = map_stage(recipes, canonicalizer.canonicalize_recipe)
+        recipes = queued_stage(recipes, health_analyzer.analyze_recipe, maxsize=queue_size, name="health")
+        recipes = queued_stage(recipes, time_analyzer.analyze_recipe, maxsize=queue_size, name="time")
+        # Audio is the slowest stage (one TTS call per step), so give it a few workers
+        recipes = queued_stage(recipes, audio_generator.process_recipe, maxsize=queue_size, workers=4, name="audio")
+        recipes = queued_stage(recipes, embedding_generator.embed_recipe, maxsize=queue_size, name="embeddings")
+        recipes = stream_to_csv(recipes)
+
+        upload_result = mongo_uploader.upload_stream(recipes)
+
+        if upload_result["success"]:
+            print(f"✅ Successfully uploaded {upload_result['inserted_count']} recipes to MongoDB")
+        else:
+            print(f"❌ MongoDB upload failed: {upload_result['error']}")
+            raise Exception(f"MongoDB upload failed: {upload_result['error']}")
+
+        # Needs the whole catalogue, so it runs once everything is uploaded
+        store_similar_recipes(mongo_uploader)
+        store_embedding_neighbors(mongo_uploader)
+        generation = mongo_uploader.promote()
+        print(f"🔗 Searches now read {mongo_uploader.collection.name}")
+        print(f"🔁 Catalogue generation is now {generation}")
+
+        print("Pipeline completed successfully!")
+    except Exception as e:
+        print(f"Pipeline failed: {str(e)}")
+
+def main_parallel(recipe_concurrency: int = 8, unified: bool = False):
+    """Run the enrichment stages concurrently per recipe via the DAG scheduler.
+
+    Health, time, audio and embeddings only read the fetched recipe, so they have no
+    edges between them and run side by side; each keeps its own concurrency limit.
+    With unified=True, health, time and narration come from one Gemini call and the
+    audio stage waits for that narration.
+    """
+    try:
+        print("Starting parallel recipe pipeline...")
+
+        canonicalizer = IngredientCanonicalizer.from_catalogue()
+        audio_generator = AudioGenerator()
+        embedding_generator = EmbeddingGenerator()
+        mongo_uploader = MongoDBUploader()
+
+        if unified:
+            enricher = RecipeEnricher()
+            stages = [
+                Stage("enrich", enricher.enrich_fields, concurrency=4, required=True),
+                Stage("audio", audio_generator.audio_fields, depends_on=["enrich"], concurrency=10, required=True),
+            ]
+        else:
+            health_analyzer = HealthAnalyzer()
+            time_analyzer = TimeAnalyzer()
+            stages = [
+                Stage("health", health_analyzer.health_fields, concurrency=4, required=True),
+                Stage("time", time_analyzer.time_fields, concurrency=4, required=True),
+                Stage("audio", audio_generator.audio_fields, concurrency=10, required=True),
+            ]
+        stages.append(Stage("ingredients", canonicalizer.canonical_fields, concurrency=2, required=True))
+        stages.append(Stage("embeddings", embedding_generator.embedding_fields, concurrency=4))
+        scheduler = DagScheduler(stages, recipe_concurrency=recipe_concurrency)
+
+        recipes = scheduler.iter_run(iter_mealdb(limit=400))
+        recipes = stream_to_csv(recipes)
+
+        upload_result = mongo_uploader.upload_stream(recipes)
+
+        if upload_result["success"]:
+            print(f"✅ Successfully uploaded {upload_result['inserted_count']} recipes to MongoDB")
+        else:
+            print(f"❌ MongoDB upload failed: {upload_result['error']}")
+            raise Exception(f"MongoDB upload failed: {upload_result['error']}")
+
+        # Needs the whole catalogue, so it runs once everything is uploaded
+        store_similar_recipes(mongo_uploader)
+        store_embedding_neighbors(mongo_uploader)
+        generation = mongo_uploader.promote()
+        print(f"🔗 Searches now read {mongo_uploader.collection.name}")
+        print(f"🔁 Catalogue generation is now {generation}")
+
         print("Pipeline completed successfully!")
     except Exception as e:
         print(f"Pipeline failed: {str(e)}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if "--parallel" in sys.argv:
+        main_parallel(unified="--unified" in sys.argv)
+    elif "--stream" in sys.argv:
+        main_streaming()
+    elif "--sync-indexes" in sys.argv:
+        # Create or update the vector search indexes without reloading the catalogue
+        MongoDBUploader().ensure_search_indexes()
+    else:
+        main()
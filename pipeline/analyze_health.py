@@ -1,18 +1,90 @@
 import json
-import re
-from typing import Dict, List
-import google.generativeai as genai
-from config import GEMINI_API_KEY
+from typing import Dict, List, Optional
+from config import GEMINI_CONCURRENCY, HEALTH_SCORING, HEALTH_MIN_COVERAGE, HEALTH_DESCRIBE_WITH_GEMINI
+from pipeline.gemini_client import GeminiClient
+from pipeline.gemini_utils import parse_json_response
+from pipeline.llm_cache import CacheMiss
+from pipeline.nutrition import NutritionEngine, describe_nutrition
+
+# Bump when the prompt wording changes so cached responses are not reused
+HEALTH_PROMPT_VERSION = "health-v1"
+HEALTH_BATCH_PROMPT_VERSION = "health-batch-v1"
+HEALTH_DESCRIPTION_PROMPT_VERSION = "health-description-v1"
+
+HEALTH_PROMPT = """You are a certified nutritionist and dietitian. Analyze these ingredients and provide:
+1. A health score (1-5)
+2. A professional health description (3-4 sentences)
+
+Respond ONLY in this exact JSON format with no other text:
+{
+  "health_score": [1-5],
+  "health_description": "Your analysis here"
+}
+
+Ingredients:\n"""
+
+# Same instructions as HEALTH_PROMPT, applied to several recipes keyed by meal_id
+HEALTH_BATCH_PROMPT = """You are a certified nutritionist and dietitian. For EACH recipe below, analyze its ingredients and provide:
+1. A health score (1-5)
+2. A professional health description (3-4 sentences)
+
+Analyze every recipe independently. Respond ONLY with a JSON array containing one object per recipe, in this exact format with no other text:
+[
+  {
+    "meal_id": "the recipe's meal_id",
+    "health_score": [1-5],
+    "health_description": "Your analysis here"
+  }
+]
+
+Recipes:\n"""
+
+# Prose only: the score and nutrients are computed locally and passed in
+HEALTH_DESCRIPTION_PROMPT = """You are a certified nutritionist and dietitian. A recipe has been scored from its ingredients
+using the Nutri-Score method. Write a professional health description (3-4 sentences) that explains the score
+below. Do not change or contradict the numbers.
+
+Respond ONLY with the description text, with no other text.
+
+"""
+
+def format_ingredients(ingredients: List[str]) -> str:
+    return "\n".join([f"- {ingredient}" for ingredient in ingredients])
+
+def validate_health_data(health_data) -> Optional[Dict]:
+    """Return a normalized health entry, or None if it is missing fields or out of range"""
+    if not isinstance(health_data, dict):
+        return None
+    try:
+        score = int(health_data["health_score"])
+        description = health_data["health_description"]
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not 1 <= score <= 5 or not isinstance(description, str) or not description.strip():
+        return None
+    return {"health_score": score, "health_description": description}
 
 class HealthAnalyzer:
-    def __init__(self):
+    """Scores recipe healthiness.
+
+    With scoring="local" the score comes from NutritionEngine and Gemini is only used for
+    recipes whose ingredients are mostly unknown to the food table (and, optionally, to
+    write the description). scoring="gemini" asks Gemini for every recipe.
+    """
+    def __init__(self, scoring: str = HEALTH_SCORING, min_coverage: float = HEALTH_MIN_COVERAGE,
+                 describe_with_gemini: bool = HEALTH_DESCRIBE_WITH_GEMINI):
         print("\n" + "="*50)
         print("🚀 Initializing HealthAnalyzer...")
+        if scoring not in ("local", "gemini"):
+            raise ValueError(f"Unknown health scoring '{scoring}', expected 'local' or 'gemini'")
         
         # Initialize Gemini client
-        genai.configure(api_key=GEMINI_API_KEY)
-        self.gemini_model = genai.GenerativeModel('gemini-1.5-flash')
-        print("✅ HealthAnalyzer initialized with Gemini client")
+        self.gemini = GeminiClient('gemini-1.5-flash')
+        self.scoring = scoring
+        self.min_coverage = min_coverage
+        self.describe_with_gemini = describe_with_gemini
+        self.nutrition = NutritionEngine() if scoring == "local" else None
+        print(f"✅ HealthAnalyzer initialized ({scoring} scoring)")
 
     def analyze_ingredients(self, ingredients: List[str]) -> Dict:
         """Analyze recipe ingredients and return health score and feedback"""
@@ -25,35 +97,16 @@ class HealthAnalyzer:
             }
             
         try:
-            prompt = """You are a certified nutritionist and dietitian. Analyze these ingredients and provide:
-1. A health score (1-5)
-2. A professional health description (3-4 sentences)
-
-Respond ONLY in this exact JSON format with no other text:
-{
-  "health_score": [1-5],
-  "health_description": "Your analysis here"
-}
-
-Ingredients:\n""" + "\n".join([f"- {ingredient}" for ingredient in ingredients])
+            prompt = HEALTH_PROMPT + format_ingredients(ingredients)
             
             print("  Sending to Gemini for analysis...")
-            response = self.gemini_model.generate_content(prompt)
-            
-            # Handle different response formats
-            if hasattr(response, 'text'):
-                response_text = response.text
-            elif hasattr(response, 'candidates') and response.candidates:
-                response_text = response.candidates[0].content.parts[0].text
-            else:
-                raise ValueError("Unexpected response format from Gemini")
+            response_text = self.gemini.generate(prompt, HEALTH_PROMPT_VERSION)
             
             print("  Raw response:", response_text[:200] + ("..." if len(response_text) > 200 else ""))
             
             # Parse the JSON response
             try:
-                cleaned_text = re.sub(r'^```json|```$', '', response_text, flags=re.IGNORECASE).strip()
-                health_data = json.loads(cleaned_text)
+                health_data = parse_json_response(response_text)
                 
                 if not all(key in health_data for key in ['health_score', 'health_description']):
                     raise ValueError("Response missing required fields")
@@ -64,13 +117,16 @@ Ingredients:\n""" + "\n".join([f"- {ingredient}" for ingredient in ingredients])
                 
                 return health_data
                 
-            except (json.JSONDecodeError, KeyError) as e:
+            except (json.JSONDecodeError, KeyError, ValueError) as e:
                 print(f"❌ Error parsing response: {str(e)}")
+                self.gemini.invalidate(prompt, HEALTH_PROMPT_VERSION)
                 return {
                     "health_score": 0,
                     "health_description": f"Analysis failed - {str(e)}"
                 }
                 
+        except CacheMiss:
+            raise
         except Exception as e:
             print(f"❌ Ingredients analysis failed: {str(e)}")
             return {
@@ -78,21 +134,204 @@ Ingredients:\n""" + "\n".join([f"- {ingredient}" for ingredient in ingredients])
                 "health_description": f"Analysis failed - {str(e)}"
             }
 
-    def analyze_recipes(self, recipes: List[Dict]) -> List[Dict]:
-        """Analyze a list of recipes and add health data"""
+    def analyze_ingredient_batch(self, recipes: List[Dict]) -> Dict[str, Dict]:
+        """Analyze several recipes in one Gemini call, returning health data keyed by meal_id.
+
+        Entries that come back missing or malformed are retried in smaller batches;
+        a batch of one falls back to the per-recipe prompt.
+        """
+        results = {}
+        self._analyze_batch([r for r in recipes if r.get('ingredients')], results)
+        return results
+
+    def _analyze_batch(self, recipes: List[Dict], results: Dict[str, Dict]):
+        if not recipes:
+            return
+        if len(recipes) == 1:
+            recipe = recipes[0]
+            results[str(recipe['meal_id'])] = self.analyze_ingredients(recipe['ingredients'])
+            return
+
+        requested = {str(recipe['meal_id']) for recipe in recipes}
+        prompt = HEALTH_BATCH_PROMPT + "\n\n".join(
+            f"meal_id: {recipe['meal_id']}\n{format_ingredients(recipe['ingredients'])}"
+            for recipe in recipes
+        )
+
+        print(f"\n🔍 Analyzing batch of {len(recipes)} recipes...")
+        try:
+            entries = parse_json_response(self.gemini.generate(prompt, HEALTH_BATCH_PROMPT_VERSION))
+            if not isinstance(entries, list):
+                raise ValueError("Batch response is not a JSON array")
+        except CacheMiss:
+            raise
+        except Exception as e:
+            print(f"❌ Batch analysis failed: {str(e)}")
+            self.gemini.invalidate(prompt, HEALTH_BATCH_PROMPT_VERSION)
+            entries = []
+
+        for entry in entries:
+            meal_id = str(entry.get("meal_id")) if isinstance(entry, dict) else None
+            health_data = validate_health_data(entry)
+            if meal_id in requested and health_data and meal_id not in results:
+                results[meal_id] = health_data
+
+        missing = [recipe for recipe in recipes if str(recipe['meal_id']) not in results]
+        if not missing:
+            print(f"✅ Batch analysis successful ({len(recipes)} recipes)")
+            return
+
+        print(f"⚠️ {len(missing)}/{len(recipes)} entries missing or malformed, retrying")
+        if len(missing) < len(recipes):
+            self._analyze_batch(missing, results)
+        else:
+            # Nothing usable came back: split so one bad entry can't sink the whole batch
+            middle = len(missing) // 2
+            self._analyze_batch(missing[:middle], results)
+            self._analyze_batch(missing[middle:], results)
+
+    def describe(self, recipe: Dict, scored: Dict) -> str:
+        """Description for a locally scored recipe: templated, or written by Gemini if enabled"""
+        description = describe_nutrition(scored["nutrition"])
+        if not self.describe_with_gemini:
+            return description
+
+        prompt = (
+            HEALTH_DESCRIPTION_PROMPT
+            + f"Health score: {scored['health_score']}/5\nSummary: {description}\n"
+            + "Ingredients:\n" + format_ingredients(recipe.get('ingredients', []))
+        )
+        try:
+            text = self.gemini.generate(prompt, HEALTH_DESCRIPTION_PROMPT_VERSION).strip()
+            if text:
+                return text
+            self.gemini.invalidate(prompt, HEALTH_DESCRIPTION_PROMPT_VERSION)
+        except CacheMiss:
+            raise
+        except Exception as e:
+            print(f"⚠️ Gemini description failed, using template: {str(e)}")
+        return description
+
+    def local_health_fields(self, recipe: Dict, scored: Dict = None) -> Optional[Dict]:
+        """Health fields from the local nutrition engine, or None if too few ingredients are known"""
+        scored = scored or self.nutrition.score_recipe(recipe)
+        coverage = scored["nutrition"]["coverage"]
+        if coverage < self.min_coverage:
+            print(f"⚠️ Only {coverage:.0%} of ingredients recognised for {recipe.get('name', 'Unnamed')}")
+            return None
+        return {
+            "health_score": scored["health_score"],
+            "health_description": self.describe(recipe, scored),
+            "nutrition": scored["nutrition"]
+        }
+
+    def health_fields(self, recipe: Dict) -> Optional[Dict]:
+        """Return the health fields for a recipe, or None if it has no ingredients"""
+        if not recipe.get('ingredients'):
+            print("❌ No ingredients found, skipping")
+            return None
+
+        if self.scoring == "local":
+            fields = self.local_health_fields(recipe)
+            if fields is not None:
+                return fields
+            print("⚠️ Falling back to Gemini health analysis")
+
+        health_data = self.analyze_ingredients(recipe['ingredients'])
+        return {
+            "health_score": health_data.get("health_score", 0),
+            "health_description": health_data.get("health_description", 'Analysis failed')
+        }
+
+    def analyze_recipe(self, recipe: Dict) -> Optional[Dict]:
+        """Add health data to a single recipe (streaming stage)"""
+        health_fields = self.health_fields(recipe)
+        if health_fields is None:
+            return None
+        recipe.update(health_fields)
+        return recipe
+
+    def analyze_recipes(self, recipes: List[Dict], batch_size: int = None,
+                        concurrency: int = GEMINI_CONCURRENCY) -> List[Dict]:
+        """Analyze a list of recipes and add health data.
+
+        With local scoring, the whole list is scored in one vectorized pass and only the
+        recipes the food table can't cover go to Gemini. With batch_size, recipes are sent
+        to Gemini batch_size at a time instead of one call per recipe. Up to `concurrency`
+        calls are in flight at once, within the model's rate limits.
+        """
+        if self.scoring == "local":
+            return self._analyze_recipes_local(recipes, batch_size, concurrency)
+        return self._analyze_recipes_gemini(recipes, batch_size, concurrency)
+
+    def _analyze_recipes_local(self, recipes: List[Dict], batch_size: int = None,
+                               concurrency: int = GEMINI_CONCURRENCY) -> List[Dict]:
+        with_ingredients = []
+        for recipe in recipes:
+            if recipe.get('ingredients'):
+                with_ingredients.append(recipe)
+            else:
+                print(f"❌ No ingredients found for {recipe.get('name', 'Unnamed')}, skipping")
+
+        print(f"\n🍳 Scoring {len(with_ingredients)} recipes from the food composition table")
+        scores = self.nutrition.score_recipes(with_ingredients)
+        pairs = list(zip(with_ingredients, scores))
+        fields = self.gemini.map(lambda pair: self.local_health_fields(*pair), pairs,
+                                 concurrency if self.describe_with_gemini else 1)
+
+        fallback = []
+        for (recipe, scored), recipe_fields in zip(pairs, fields):
+            if recipe_fields is None:
+                recipe['nutrition'] = scored['nutrition']
+                fallback.append(recipe)
+            else:
+                recipe.update(recipe_fields)
+
+        if fallback:
+            print(f"⚠️ {len(fallback)}/{len(with_ingredients)} recipes need Gemini health analysis")
+            self._analyze_recipes_gemini(fallback, batch_size, concurrency)
+        print(f"✅ Scored {len(with_ingredients) - len(fallback)} recipes locally")
+        return with_ingredients
+
+    def _analyze_recipes_gemini(self, recipes: List[Dict], batch_size: int = None,
+                                concurrency: int = GEMINI_CONCURRENCY) -> List[Dict]:
+        if batch_size and batch_size > 1:
+            return self._analyze_recipes_batched(recipes, batch_size, concurrency)
+
+        if concurrency > 1:
+            print(f"\n🍳 Processing {len(recipes)} recipes ({concurrency} concurrent calls)")
+            results = self.gemini.map(self.analyze_recipe, recipes, concurrency)
+            return [recipe for recipe in results if recipe is not None]
+
         analyzed_recipes = []
         total = len(recipes)
         
         for i, recipe in enumerate(recipes, 1):
             print(f"\n🍳 Processing recipe {i}/{total}: {recipe.get('name', 'Unnamed')}")
             
-            if not recipe.get('ingredients'):
-                print("❌ No ingredients found, skipping")
-                continue
-                
-            health_data = self.analyze_ingredients(recipe['ingredients'])
-            recipe['health_score'] = health_data.get("health_score", 0)
-            recipe['health_description'] = health_data.get("health_description", 'Analysis failed')
-            analyzed_recipes.append(recipe)
+            if self.analyze_recipe(recipe) is not None:
+                analyzed_recipes.append(recipe)
             
+        return analyzed_recipes
+
+    def _analyze_recipes_batched(self, recipes: List[Dict], batch_size: int, concurrency: int = 1) -> List[Dict]:
+        analyzed_recipes = []
+        with_ingredients = []
+        for recipe in recipes:
+            if recipe.get('ingredients'):
+                with_ingredients.append(recipe)
+            else:
+                print(f"❌ No ingredients found for {recipe.get('name', 'Unnamed')}, skipping")
+
+        batches = [with_ingredients[start:start + batch_size]
+                   for start in range(0, len(with_ingredients), batch_size)]
+        print(f"\n🍳 Processing {len(with_ingredients)} recipes in {len(batches)} batches")
+        batch_results = self.gemini.map(self.analyze_ingredient_batch, batches, concurrency)
+        for batch, health_by_id in zip(batches, batch_results):
+            for recipe in batch:
+                health_data = health_by_id.get(str(recipe['meal_id']), {})
+                recipe['health_score'] = health_data.get("health_score", 0)
+                recipe['health_description'] = health_data.get("health_description", 'Analysis failed')
+                analyzed_recipes.append(recipe)
+
         return analyzed_recipes
\ No newline at end of file
@@ -1,26 +1,18 @@
 import json
-import re
+import threading
 from typing import Dict, List, Optional
-import google.generativeai as genai
-from config import GEMINI_API_KEY
+from config import GEMINI_CONCURRENCY, TIME_ESTIMATE_MIN_CONFIDENCE
+from pipeline.gemini_client import GeminiClient
+from pipeline.gemini_utils import parse_json_response
+from pipeline.llm_cache import CacheMiss
+from pipeline.time_estimator import LocalTimeEstimator
 
-class TimeAnalyzer:
-    def __init__(self):
-        print("\n" + "="*50)
-        print("🚀 Initializing TimeAnalyzer...")
-        
-        # Initialize Gemini client
-        genai.configure(api_key=GEMINI_API_KEY)
-        self.gemini_model = genai.GenerativeModel('gemini-1.5-flash')
-        print("✅ TimeAnalyzer initialized with Gemini client")
+# Bump when the prompt wording changes so cached responses are not reused
+TIME_PROMPT_VERSION = "time-v1"
 
-    def analyze_instructions(self, instructions: str) -> Optional[Dict]:
-        """Analyze recipe instructions for time and difficulty"""
-        if not instructions:
-            print("⚠️ No instructions provided")
-            return None
+DIFFICULTY_LEVELS = ["Very Easy", "Easy", "Medium", "Hard", "Very Hard"]
 
-        prompt = """You are an AI assistant specialized in analyzing recipe instructions to estimate cooking times and assess recipe difficulty. 
+TIME_PROMPT = """You are an AI assistant specialized in analyzing recipe instructions to estimate cooking times and assess recipe difficulty. 
 
         **Input:** Recipe instructions
         **Output Requirements:** JSON format with:
@@ -36,24 +28,41 @@ class TimeAnalyzer:
         ```
 
         Analyze these instructions:
-        """ + instructions
+        """
+
+class TimeAnalyzer:
+    def __init__(self, local_first: bool = True, min_confidence: float = TIME_ESTIMATE_MIN_CONFIDENCE):
+        print("\n" + "="*50)
+        print("🚀 Initializing TimeAnalyzer...")
+        
+        # Explicit durations in the instructions are parsed locally; only recipes the
+        # local estimate is unsure about are escalated to Gemini
+        self.local_estimator = LocalTimeEstimator() if local_first else None
+        self.min_confidence = min_confidence
+        self.local_count = 0
+        self.gemini_count = 0
+        # Recipes are estimated on several threads (GeminiClient.map, the stage scheduler)
+        self._count_lock = threading.Lock()
+        
+        # Initialize Gemini client
+        self.gemini = GeminiClient('gemini-1.5-flash')
+        print("✅ TimeAnalyzer initialized with Gemini client")
+
+    def analyze_instructions(self, instructions: str) -> Optional[Dict]:
+        """Analyze recipe instructions for time and difficulty"""
+        if not instructions:
+            print("⚠️ No instructions provided")
+            return None
+
+        prompt = TIME_PROMPT + instructions
 
         try:
             print("\n🔍 Analyzing instructions...")
-            response = self.gemini_model.generate_content(prompt)
-            
-            # Handle different response formats
-            if hasattr(response, 'text'):
-                response_text = response.text
-            elif hasattr(response, 'candidates') and response.candidates:
-                response_text = response.candidates[0].content.parts[0].text
-            else:
-                raise ValueError("Unexpected response format from Gemini")
+            response_text = self.gemini.generate(prompt, TIME_PROMPT_VERSION)
 
             # Clean and parse the JSON response
             try:
-                cleaned_text = re.sub(r'^```json|```$', '', response_text, flags=re.IGNORECASE).strip()
-                analysis = json.loads(cleaned_text)
+                analysis = parse_json_response(response_text)
                 
                 # Validate required fields
                 required_fields = [
@@ -71,29 +80,86 @@ class TimeAnalyzer:
                 
                 return analysis
                 
-            except (json.JSONDecodeError, KeyError) as e:
+            except (json.JSONDecodeError, KeyError, ValueError) as e:
                 print(f"❌ Error parsing response: {str(e)}")
+                self.gemini.invalidate(prompt, TIME_PROMPT_VERSION)
                 return None
                 
+        except CacheMiss:
+            raise
         except Exception as e:
             print(f"❌ Analysis failed: {str(e)}")
             return None
 
-    def analyze_recipes(self, recipes: List[Dict]) -> List[Dict]:
-        """Analyze a list of recipes and add time data"""
-        analyzed_recipes = []
-        total = len(recipes)
-        
-        for i, recipe in enumerate(recipes, 1):
-            print(f"\n🍳 Processing recipe {i}/{total}: {recipe.get('name', 'Unnamed')}")
+    def estimate(self, instructions: str, ingredient_count: int = 0) -> Optional[Dict]:
+        """Estimate time and difficulty locally, escalating to Gemini when confidence is low"""
+        if self.local_estimator is None:
+            return self.analyze_instructions(instructions)
+
+        local = self.local_estimator.estimate(instructions, ingredient_count)
+        local_analysis = {
+            "total_estimated_time_minutes": local["total_estimated_time_minutes"],
+            "recipe_difficulty": local["recipe_difficulty"],
+            "estimate_source": "local",
+            "estimate_confidence": local["confidence"]
+        }
+        if local["confidence"] >= self.min_confidence:
+            self._count("local")
+            print(f"✅ Local estimate: {local['total_estimated_time_minutes']} minutes, "
+                  f"{local['recipe_difficulty']} (confidence {local['confidence']})")
+            return local_analysis
+
+        print(f"⚠️ Local estimate confidence {local['confidence']} too low, asking Gemini")
+        analysis = self.analyze_instructions(instructions)
+        if analysis is None:
+            # Better a low-confidence estimate than dropping the recipe
+            self._count("local")
+            return local_analysis
+        self._count("gemini")
+        return {**analysis, "estimate_source": "gemini"}
+
+    def _count(self, source: str):
+        with self._count_lock:
+            if source == "local":
+                self.local_count += 1
+            else:
+                self.gemini_count += 1
+
+    def time_fields(self, recipe: Dict) -> Optional[Dict]:
+        """Return the time analysis fields for a recipe, or None if analysis failed"""
+        if not recipe.get('instructions'):
+            print("❌ No instructions found, skipping")
+            return None
+
+        time_data = self.estimate(recipe['instructions'], len(recipe.get('ingredients') or []))
+        if not time_data:
+            return None
+        return {"time_analysis": time_data}
+
+    def analyze_recipe(self, recipe: Dict) -> Optional[Dict]:
+        """Add time data to a single recipe (streaming stage)"""
+        time_fields = self.time_fields(recipe)
+        if time_fields is None:
+            return None
+        recipe.update(time_fields)
+        return recipe
+
+    def analyze_recipes(self, recipes: List[Dict], concurrency: int = GEMINI_CONCURRENCY) -> List[Dict]:
+        """Analyze a list of recipes and add time data, with up to `concurrency` calls in flight"""
+        if concurrency > 1:
+            print(f"\n🍳 Processing {len(recipes)} recipes ({concurrency} concurrent calls)")
+            results = self.gemini.map(self.analyze_recipe, recipes, concurrency)
+            analyzed_recipes = [recipe for recipe in results if recipe is not None]
+        else:
+            analyzed_recipes = []
+            total = len(recipes)
             
-            if not recipe.get('instructions'):
-                print("❌ No instructions found, skipping")
-                continue
+            for i, recipe in enumerate(recipes, 1):
+                print(f"\n🍳 Processing recipe {i}/{total}: {recipe.get('name', 'Unnamed')}")
                 
-            time_data = self.analyze_instructions(recipe['instructions'])
-            if time_data:
-                recipe['time_analysis'] = time_data
-                analyzed_recipes.append(recipe)
-            
+                if self.analyze_recipe(recipe) is not None:
+                    analyzed_recipes.append(recipe)
+        
+        if self.local_estimator is not None:
+            print(f"\n⏱️ Time estimates: {self.local_count} local, {self.gemini_count} escalated to Gemini")
         return analyzed_recipes
\ No newline at end of file
@@ -1,17 +1,12 @@
 import re
 from typing import List, Dict
-import google.generativeai as genai
-from config import GEMINI_API_KEY
+from pipeline.gemini_client import GeminiClient
+from pipeline.llm_cache import CacheMiss
 
-class TextProcessor:
-    def __init__(self):
-        genai.configure(api_key=GEMINI_API_KEY)
-        self.gemini_model = genai.GenerativeModel('gemini-pro')
+# Bump when the prompt wording changes so cached responses are not reused
+NARRATION_PROMPT_VERSION = "narration-v1"
 
-    def transform_instructions(self, instructions: str) -> str:
-        """Transform recipe instructions using Gemini API"""
-        try:
-            prompt = """
+NARRATION_PROMPT = """
             You are an experienced, friendly, and encouraging chef providing clear audio instructions for a home cook. 
             Your goal is to guide the user through each step of the recipe, making it sound natural, easy to follow, 
             and engaging, as if you're speaking directly to them.
@@ -24,9 +19,17 @@ class TextProcessor:
 
             Here are the recipe instructions:
             """
-            
-            response = self.gemini_model.generate_content(f"{prompt}\n{instructions}")
-            return response.text
+
+class TextProcessor:
+    def __init__(self):
+        self.gemini = GeminiClient('gemini-pro')
+
+    def transform_instructions(self, instructions: str) -> str:
+        """Transform recipe instructions using Gemini API"""
+        try:
+            return self.gemini.generate(f"{NARRATION_PROMPT}\n{instructions}", NARRATION_PROMPT_VERSION)
+        except CacheMiss:
+            raise
         except Exception:
             return instructions
 
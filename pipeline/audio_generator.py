@@ -1,6 +1,7 @@
 from typing import List, Dict, Optional
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import logging
+from .llm_cache import CacheMiss
 from .audio.text_processor import TextProcessor
 from .audio.analyzer import InstructionAnalyzer
 from .audio.speech_synthesizer import SpeechSynthesizer
@@ -11,14 +12,15 @@ class AudioGenerator:
         self.analyzer = InstructionAnalyzer()
         self.synthesizer = SpeechSynthesizer()
 
-    def process_recipe(self, recipe: Dict) -> Optional[Dict]:
-        """Process a single recipe to generate audio instructions"""
+    def audio_fields(self, recipe: Dict) -> Optional[Dict]:
+        """Generate the audio steps for a recipe, or None if no audio could be produced"""
         if not recipe.get("instructions"):
             return None
             
         try:
-            # Transform and normalize instructions
-            transformed = self.text_processor.transform_instructions(recipe["instructions"])
+            # Transform and normalize instructions (reuse narration from unified enrichment if present)
+            transformed = recipe.get("narrated_instructions") or \
+                self.text_processor.transform_instructions(recipe["instructions"])
             normalized = self.text_processor.normalize_text(transformed)
             steps = self.text_processor.split_into_steps(normalized)
             
@@ -33,12 +35,19 @@ class AudioGenerator:
                         "audio_url": audio_url  
                     })
             
-            return {**recipe, "audio_steps": audio_steps} if audio_steps else None
+            return {"audio_steps": audio_steps} if audio_steps else None
             
+        except CacheMiss:
+            raise
         except Exception as e:
             logging.error(f"Failed to process recipe {recipe.get('meal_id')}: {str(e)}")
             return None
 
+    def process_recipe(self, recipe: Dict) -> Optional[Dict]:
+        """Process a single recipe to generate audio instructions"""
+        audio_fields = self.audio_fields(recipe)
+        return {**recipe, **audio_fields} if audio_fields else None
+
     def process_recipes(self, recipes: List[Dict]) -> List[Dict]:
         """Process multiple recipes in parallel with thread pooling"""
         results = []
@@ -54,6 +63,8 @@ class AudioGenerator:
                 try:
                     if processed := future.result():
                         results.append(processed)
+                except CacheMiss:
+                    raise
                 except Exception as e:
                     logging.error(f"Thread error: {str(e)}")
         
@@ -0,0 +1,162 @@
+import threading
+from collections import Counter
+from typing import AbstractSet, Dict, Iterable, List, Optional, Tuple
+from pipeline.measures import normalize_food_name, parse_ingredient
+
+# Minimum Dice similarity over character trigrams for a fuzzy match
+FUZZY_MIN_SIMILARITY = 0.7
+
+
+def ingredient_id(normalized_name: str) -> str:
+    """Canonical id for a normalized ingredient name: "olive oil" -> "olive-oil" """
+    return normalized_name.replace(" ", "-")
+
+def _trigrams(text: str) -> List[str]:
+    padded = f"  {text} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+def _may_collapse(tokens: List[str], canonical: str) -> bool:
+    """Whether a name may map onto a shorter entry: extra words usually make a different
+    ingredient ("chicken stock" is not "chicken"), so the token sets must be Dice-similar"""
+    other = canonical.split("-")
+    if len(other) >= len(tokens):
+        return True
+    return 2 * len(set(tokens) & set(other)) / (len(set(tokens)) + len(set(other))) >= FUZZY_MIN_SIMILARITY
+
+
+class IngredientCanonicalizer:
+    """Maps free-text ingredients ("2 tbs Olive Oil") to a quantity, unit and canonical id.
+
+    The vocabulary is a trie over normalized name tokens, so the longest known name inside
+    an ingredient wins ("boneless chicken thighs" -> "chicken-thigh"). Names with no known
+    token run go through a character-trigram fuzzy match to catch typos and spelling
+    variants; anything still unknown becomes a new vocabulary entry.
+
+    While adding (the pipeline), a name only collapses onto a shorter seed entry sharing
+    most of its words ("chicken stock" stays "chicken-stock", not "chicken"), and names
+    learned from earlier recipes are only matched exactly. Ids therefore depend on the seed
+    vocabulary and the name alone, not on the order recipes arrive in.
+    """
+    def __init__(self, names: Iterable[str] = ()):
+        self.trie = {}
+        self.ids = set()
+        self.trigram_index: Dict[str, set] = {}
+        # Ids added by canonical_id() rather than seeded; never a match target while adding
+        self.learned = set()
+        self._lock = threading.RLock()
+        for name in names:
+            self.add(name)
+
+    @classmethod
+    def from_catalogue(cls) -> "IngredientCanonicalizer":
+        """Vocabulary seeded from TheMealDB ingredient list; recipe names are learned as they are canonicalized"""
+        from pipeline.extract import fetch_ingredient_list
+
+        try:
+            names = fetch_ingredient_list()
+            print(f"✅ Loaded {len(names)} ingredient names from TheMealDB")
+        except Exception as e:
+            print(f"⚠️ Could not fetch ingredient list, building vocabulary from recipes only: {str(e)}")
+            names = []
+        return cls(names)
+
+    def add(self, name: str) -> Optional[str]:
+        """Add a name to the vocabulary and return its canonical id"""
+        normalized = normalize_food_name(name or "")
+        if not normalized:
+            return None
+        canonical = ingredient_id(normalized)
+        with self._lock:
+            if canonical in self.ids:
+                return canonical
+            node = self.trie
+            for token in normalized.split():
+                node = node.setdefault(token, {})
+            node[None] = canonical
+            self.ids.add(canonical)
+            for trigram in set(_trigrams(normalized)):
+                self.trigram_index.setdefault(trigram, set()).add(canonical)
+        return canonical
+
+    def _longest_match(self, tokens: List[str], skip: AbstractSet[str] = frozenset()) -> Optional[str]:
+        best: Tuple[int, int, Optional[str]] = (0, -1, None)
+        for start in range(len(tokens)):
+            node = self.trie
+            for end in range(start, len(tokens)):
+                node = node.get(tokens[end])
+                if node is None:
+                    break
+                if None in node and node[None] not in skip:
+                    # Longer runs win; at equal length the later one, where English puts the noun
+                    candidate = (end - start + 1, start, node[None])
+                    if candidate[:2] > best[:2]:
+                        best = candidate
+        return best[2]
+
+    def _fuzzy_match(self, normalized: str, skip: AbstractSet[str] = frozenset()) -> Optional[str]:
+        trigrams = set(_trigrams(normalized))
+        shared = Counter()
+        for trigram in trigrams:
+            shared.update(self.trigram_index.get(trigram, ()))
+        for candidate in skip & shared.keys():
+            del shared[candidate]
+        best_id, best_score = None, FUZZY_MIN_SIMILARITY
+        for candidate, count in shared.most_common(20):
+            candidate_trigrams = len(set(_trigrams(candidate.replace("-", " "))))
+            score = 2 * count / (len(trigrams) + candidate_trigrams)
+            if score >= best_score:
+                best_id, best_score = candidate, score
+        return best_id
+
+    def canonical_id(self, name: str, add_missing: bool = True) -> Optional[str]:
+        """Canonical id for an ingredient name, adding it to the vocabulary if it is new.
+
+        With add_missing=False (e.g. for user queries) unknown names return None instead.
+        """
+        normalized = normalize_food_name(name or "")
+        if not normalized:
+            return None
+        # Lookups share the lock with add() so parallel stages never see a half-updated index
+        with self._lock:
+            if not add_missing:
+                return self._longest_match(normalized.split()) or self._fuzzy_match(normalized)
+
+            canonical = ingredient_id(normalized)
+            if canonical in self.ids:
+                return canonical
+            tokens = normalized.split()
+            for find in (lambda: self._longest_match(tokens, skip=self.learned),
+                         lambda: self._fuzzy_match(normalized, skip=self.learned)):
+                match = find()
+                if match is not None and _may_collapse(tokens, match):
+                    return match
+            match = self.add(normalized)
+            self.learned.add(match)
+            return match
+
+    def parse(self, ingredient: str) -> Dict:
+        """Split an ingredient string into quantity, unit and canonical ingredient id"""
+        parsed = parse_ingredient(ingredient)
+        return {
+            "quantity": parsed["quantity"],
+            "unit": parsed["unit"],
+            "ingredient_id": self.canonical_id(parsed["name"]),
+            "raw": ingredient
+        }
+
+    def canonical_fields(self, recipe: Dict) -> Dict:
+        """Return parsed_ingredients and the de-duplicated ingredient_ids for a recipe"""
+        parsed = [self.parse(ingredient) for ingredient in recipe.get('ingredients') or []]
+        ingredient_ids = list(dict.fromkeys(p["ingredient_id"] for p in parsed if p["ingredient_id"]))
+        return {"parsed_ingredients": parsed, "ingredient_ids": ingredient_ids}
+
+    def canonicalize_recipe(self, recipe: Dict) -> Dict:
+        """Add canonical ingredient fields to a single recipe (streaming stage)"""
+        recipe.update(self.canonical_fields(recipe))
+        return recipe
+
+    def canonicalize_recipes(self, recipes: List[Dict]) -> List[Dict]:
+        print(f"\n🧂 Canonicalizing ingredients for {len(recipes)} recipes")
+        recipes = [self.canonicalize_recipe(recipe) for recipe in recipes]
+        print(f"✅ {len(self.ids)} distinct ingredients")
+        return recipes
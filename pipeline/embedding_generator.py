@@ -31,41 +31,52 @@ class EmbeddingGenerator:
             print(f"⚠️ Image download failed: {url} - {str(e)}")
             return None
 
+    def embedding_fields(self, recipe: Dict) -> Optional[Dict]:
+        """Generate the image and text embeddings for a single recipe"""
+        if not recipe.get("img_url"):
+            return None
+            
+        try:
+            # Download and prepare image
+            pil_image = self._download_image(recipe["img_url"])
+            if not pil_image:
+                return None
+
+            with tempfile.NamedTemporaryFile(suffix=".jpg") as temp_img:
+                pil_image.save(temp_img.name)
+                
+                # Enhanced contextual text
+                contextual_text = (
+                    f"{recipe['name']}, a {recipe['category']} dish from {recipe.get('area', 'unknown')}. "
+                    f"Main ingredients: {', '.join(recipe['ingredients'])}. "
+                )
+                
+                # Generate embeddings
+                vertex_img = VertexImage.load_from_file(temp_img.name)
+                embeddings = self.model.get_embeddings(
+                    image=vertex_img,
+                    contextual_text=contextual_text,
+                    dimension=512
+                )
+                
+                return {
+                    "image_embedding": embeddings.image_embedding,
+                    "text_embedding": embeddings.text_embedding
+                }
+        except Exception as e:
+            print(f"⚠️ Embedding failed for {recipe['name']}: {str(e)}")
+            return None
+
+    def embed_recipe(self, recipe: Dict) -> Dict:
+        """Add embeddings to a single recipe (streaming stage); recipes are kept even if embedding fails"""
+        embedding_fields = self.embedding_fields(recipe)
+        if embedding_fields:
+            recipe.update(embedding_fields)
+        return recipe
+
     def generate_embeddings(self, recipes: List[Dict]) -> List[Dict]:
         """Generate multimodal embeddings for recipes with images"""
         for recipe in recipes:
-            if not recipe.get("img_url"):
-                continue
-                
-            try:
-                # Download and prepare image
-                pil_image = self._download_image(recipe["img_url"])
-                if not pil_image:
-                    continue
-
-                with tempfile.NamedTemporaryFile(suffix=".jpg") as temp_img:
-                    pil_image.save(temp_img.name)
-                    
-                    # Enhanced contextual text
-                    contextual_text = (
-                        f"{recipe['name']}, a {recipe['category']} dish from {recipe.get('area', 'unknown')}. "
-                        f"Main ingredients: {', '.join(recipe['ingredients'])}. "
-                    )
-                    
-                    # Generate embeddings
-                    vertex_img = VertexImage.load_from_file(temp_img.name)
-                    embeddings = self.model.get_embeddings(
-                        image=vertex_img,
-                        contextual_text=contextual_text,
-                        dimension=512
-                    )
-                    
-                    # Add to recipe
-                    recipe.update({
-                        "image_embedding": embeddings.image_embedding,
-                        "text_embedding": embeddings.text_embedding
-                    })
-            except Exception as e:
-                print(f"⚠️ Embedding failed for {recipe['name']}: {str(e)}")
+            self.embed_recipe(recipe)
         
         return recipes
\ No newline at end of file
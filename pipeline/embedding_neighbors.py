@@ -0,0 +1,91 @@
+from typing import Dict, List, Tuple
+import numpy as np
+
+# Embedding field -> field that stores its precomputed neighbours
+NEIGHBOR_FIELDS = {
+    "image_embedding": "similar_by_image",
+    "text_embedding": "similar_by_text",
+}
+
+
+def load_embedding_matrix(collection, field: str) -> Tuple[List[str], np.ndarray]:
+    """meal_ids and the L2-normalized float32 matrix of one embedding field"""
+    ids, vectors = [], []
+    for doc in collection.find({field: {"$exists": True, "$ne": None}}, {"meal_id": 1, field: 1}):
+        ids.append(str(doc["meal_id"]))
+        vectors.append(doc[field])
+    if not vectors:
+        return ids, np.zeros((0, 0), dtype=np.float32)
+
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix /= np.where(norms > 0, norms, 1.0)
+    return ids, matrix
+
+
+def blocked_top_k(matrix: np.ndarray, k: int = 10, row_block: int = 1024,
+                  col_block: int = 8192) -> Tuple[np.ndarray, np.ndarray]:
+    """Top-k cosine neighbours of every row (excluding itself) against all rows.
+
+    Works on row_block x col_block tiles of the similarity matrix, keeping a running
+    top-k per row, so memory stays at one tile however large the catalogue is.
+    Returns (indices, scores), each of shape (n, k), best first.
+    """
+    n = len(matrix)
+    k = min(k, max(n - 1, 0))
+    indices = np.zeros((n, k), dtype=np.int64)
+    scores = np.zeros((n, k), dtype=np.float32)
+    if k == 0:
+        return indices, scores
+
+    for row_start in range(0, n, row_block):
+        rows = matrix[row_start:row_start + row_block]
+        best_scores = np.full((len(rows), k), -np.inf, dtype=np.float32)
+        best_indices = np.zeros((len(rows), k), dtype=np.int64)
+
+        for col_start in range(0, n, col_block):
+            tile = rows @ matrix[col_start:col_start + col_block].T
+            # Mask each row's similarity with itself when it falls inside this tile
+            self_rows = np.arange(len(rows))
+            self_cols = self_rows + row_start - col_start
+            in_tile = (self_cols >= 0) & (self_cols < tile.shape[1])
+            tile[self_rows[in_tile], self_cols[in_tile]] = -np.inf
+
+            merged_scores = np.concatenate([best_scores, tile], axis=1)
+            merged_indices = np.concatenate(
+                [best_indices, np.broadcast_to(np.arange(col_start, col_start + tile.shape[1]), tile.shape)], axis=1
+            )
+            top = np.argpartition(-merged_scores, k - 1, axis=1)[:, :k]
+            best_scores = np.take_along_axis(merged_scores, top, axis=1)
+            best_indices = np.take_along_axis(merged_indices, top, axis=1)
+
+        order = np.argsort(-best_scores, axis=1)
+        scores[row_start:row_start + len(rows)] = np.take_along_axis(best_scores, order, axis=1)
+        indices[row_start:row_start + len(rows)] = np.take_along_axis(best_indices, order, axis=1)
+    return indices, scores
+
+
+def neighbor_lists(ids: List[str], indices: np.ndarray, scores: np.ndarray) -> Dict[str, List[Dict]]:
+    return {
+        meal_id: [
+            {"meal_id": ids[j], "score": round(float(score), 4)}
+            for j, score in zip(indices[i], scores[i]) if np.isfinite(score)
+        ]
+        for i, meal_id in enumerate(ids)
+    }
+
+
+def store_embedding_neighbors(uploader, k: int = 10, row_block: int = 1024) -> int:
+    """Compute top-k image and text neighbours for every recipe and write them back"""
+    updated = 0
+    for field, target in NEIGHBOR_FIELDS.items():
+        print(f"\n🧭 Computing top-{k} neighbours by {field}...")
+        ids, matrix = load_embedding_matrix(uploader.collection, field)
+        if len(ids) < 2:
+            print(f"⚠️ Not enough recipes with {field}, skipping")
+            continue
+        indices, scores = blocked_top_k(matrix, k=k, row_block=row_block)
+        neighbors = neighbor_lists(ids, indices, scores)
+        updated += uploader.update_fields({meal_id: {target: entries} for meal_id, entries in neighbors.items()})
+        print(f"✅ Stored {target} for {len(ids)} recipes")
+    return updated
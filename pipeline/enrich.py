@@ -0,0 +1,228 @@
+import json
+import time
+from typing import Dict, List, Optional
+from pipeline.gemini_client import GeminiClient
+from pipeline.gemini_utils import parse_json_response
+from pipeline.llm_cache import CacheMiss
+from pipeline.analyze_health import HEALTH_PROMPT, HealthAnalyzer, format_ingredients, validate_health_data
+from pipeline.analyze_time import DIFFICULTY_LEVELS, TIME_PROMPT, TimeAnalyzer
+from pipeline.audio.text_processor import NARRATION_PROMPT, TextProcessor
+
+ENRICH_PROMPT = """You are a certified nutritionist and an experienced, friendly home-cooking chef. Using the recipe below, provide:
+1. A health score (1-5) for the ingredients
+2. A professional health description (3-4 sentences)
+3. The total estimated time in minutes to make the recipe
+4. The recipe difficulty ("Very Easy"/"Easy"/"Medium"/"Hard"/"Very Hard")
+5. Clear audio instructions for a home cook: one conversational step per entry, breaking complex steps into
+   simpler actions and clearly stating temperatures and timings, with no introductory or concluding remarks
+
+Respond ONLY in this exact JSON format with no other text:
+{
+  "health_score": [1-5],
+  "health_description": "Your analysis here",
+  "total_estimated_time_minutes": 80,
+  "recipe_difficulty": "Easy",
+  "narrated_steps": ["First step", "Second step"]
+}
+"""
+
+# Bump when the prompt wording changes so cached responses are not reused
+ENRICH_PROMPT_VERSION = "enrich-v1"
+
+def build_enrich_prompt(recipe: Dict) -> str:
+    return (
+        ENRICH_PROMPT
+        + "\nIngredients:\n" + format_ingredients(recipe.get('ingredients', []))
+        + "\n\nInstructions:\n" + recipe.get('instructions', '')
+    )
+
+def _validate_time(data: Dict) -> Optional[Dict]:
+    try:
+        minutes = float(data["total_estimated_time_minutes"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if minutes <= 0 or data.get("recipe_difficulty") not in DIFFICULTY_LEVELS:
+        return None
+    return {
+        "total_estimated_time_minutes": int(minutes) if minutes.is_integer() else minutes,
+        "recipe_difficulty": data["recipe_difficulty"]
+    }
+
+def _validate_steps(data: Dict) -> Optional[str]:
+    steps = data.get("narrated_steps")
+    if not isinstance(steps, list):
+        return None
+    steps = [step.strip() for step in steps if isinstance(step, str) and step.strip()]
+    if not steps:
+        return None
+    # Same numbered-list shape TextProcessor.transform_instructions produces
+    return "\n".join(f"{i}. {step}" for i, step in enumerate(steps, 1))
+
+class RecipeEnricher:
+    """Gets health, time and narration for a recipe from a single Gemini call.
+
+    Sections that come back missing or invalid are filled in by the existing
+    HealthAnalyzer, TimeAnalyzer and TextProcessor, created on first use.
+    """
+    def __init__(self):
+        print("\n" + "="*50)
+        print("🚀 Initializing RecipeEnricher...")
+
+        # Initialize Gemini client
+        self.gemini = GeminiClient('gemini-1.5-flash')
+        self._health_analyzer = None
+        self._time_analyzer = None
+        self._text_processor = None
+        print("✅ RecipeEnricher initialized with Gemini client")
+
+    @property
+    def health_analyzer(self):
+        if self._health_analyzer is None:
+            self._health_analyzer = HealthAnalyzer()
+        return self._health_analyzer
+
+    @property
+    def time_analyzer(self):
+        if self._time_analyzer is None:
+            self._time_analyzer = TimeAnalyzer()
+        return self._time_analyzer
+
+    @property
+    def text_processor(self):
+        if self._text_processor is None:
+            self._text_processor = TextProcessor()
+        return self._text_processor
+
+    def _request(self, recipe: Dict) -> Dict:
+        """Send the unified prompt and return the parsed JSON (empty dict on failure)"""
+        prompt = build_enrich_prompt(recipe)
+        try:
+            data = parse_json_response(self.gemini.generate(prompt, ENRICH_PROMPT_VERSION))
+            if isinstance(data, dict):
+                return data
+            raise ValueError("Enrichment response is not a JSON object")
+        except CacheMiss:
+            raise
+        except Exception as e:
+            print(f"❌ Unified enrichment failed: {str(e)}")
+            self.gemini.invalidate(prompt, ENRICH_PROMPT_VERSION)
+            return {}
+
+    def enrich_fields(self, recipe: Dict) -> Optional[Dict]:
+        """Return health, time and narration fields for a recipe, or None if it can't be enriched"""
+        if not recipe.get('ingredients') or not recipe.get('instructions'):
+            print("❌ Missing ingredients or instructions, skipping")
+            return None
+
+        print(f"\n🔍 Enriching {recipe.get('name', 'Unnamed')} in one call...")
+        data = self._request(recipe)
+        fields = {}
+
+        health_data = validate_health_data(data)
+        if health_data is None:
+            print("⚠️ Falling back to HealthAnalyzer")
+            health_data = self.health_analyzer.health_fields(recipe)
+        fields.update(health_data)
+
+        time_data = _validate_time(data)
+        if time_data is None:
+            print("⚠️ Falling back to TimeAnalyzer")
+            time_data = self.time_analyzer.analyze_instructions(recipe['instructions'])
+            if time_data is None:
+                return None
+        fields["time_analysis"] = time_data
+
+        narration = _validate_steps(data)
+        if narration is None:
+            print("⚠️ Falling back to TextProcessor")
+            narration = self.text_processor.transform_instructions(recipe['instructions'])
+        fields["narrated_instructions"] = narration
+
+        print("✅ Enrichment successful")
+        return fields
+
+    def enrich_recipe(self, recipe: Dict) -> Optional[Dict]:
+        """Add unified enrichment fields to a single recipe (streaming stage)"""
+        fields = self.enrich_fields(recipe)
+        if fields is None:
+            return None
+        recipe.update(fields)
+        return recipe
+
+    def _count_tokens(self, text: str) -> int:
+        try:
+            return self.gemini.count_tokens(text)
+        except Exception:
+            return 0
+
+    def compare(self, recipes: List[Dict]) -> List[Dict]:
+        """Run the legacy three-call path and the unified call on each recipe and measure both.
+
+        Input tokens are counted on the exact prompts sent; output tokens are counted on
+        the returned content, so they are an approximation of billed output.
+        """
+        rows = []
+        for recipe in recipes:
+            if not recipe.get('ingredients') or not recipe.get('instructions'):
+                continue
+
+            legacy_prompts = [
+                HEALTH_PROMPT + format_ingredients(recipe['ingredients']),
+                TIME_PROMPT + recipe['instructions'],
+                f"{NARRATION_PROMPT}\n{recipe['instructions']}",
+            ]
+            start = time.perf_counter()
+            health = self.health_analyzer.analyze_ingredients(recipe['ingredients'])
+            timing = self.time_analyzer.analyze_instructions(recipe['instructions'])
+            narration = self.text_processor.transform_instructions(recipe['instructions'])
+            legacy_latency = time.perf_counter() - start
+            legacy_output = json.dumps(health) + json.dumps(timing) + narration
+
+            unified_prompt = build_enrich_prompt(recipe)
+            start = time.perf_counter()
+            unified = self._request(recipe)
+            unified_latency = time.perf_counter() - start
+
+            legacy_tokens = sum(self._count_tokens(p) for p in legacy_prompts) + self._count_tokens(legacy_output)
+            unified_tokens = self._count_tokens(unified_prompt) + self._count_tokens(json.dumps(unified))
+            rows.append({
+                "meal_id": recipe.get('meal_id'),
+                "name": recipe.get('name', 'Unnamed'),
+                "legacy_calls": 3,
+                "legacy_tokens": legacy_tokens,
+                "legacy_latency_s": round(legacy_latency, 2),
+                "unified_calls": 1,
+                "unified_tokens": unified_tokens,
+                "unified_latency_s": round(unified_latency, 2),
+                "unified_complete": bool(validate_health_data(unified) and _validate_time(unified)
+                                         and _validate_steps(unified)),
+            })
+        return rows
+
+def print_comparison_report(rows: List[Dict]):
+    """Print per-recipe token and latency savings of the unified call"""
+    print("\n📊 Unified enrichment vs. legacy analyzers")
+    print(f"{'Recipe':<30} {'Tokens (3 calls)':>16} {'Tokens (1 call)':>15} {'Saved':>7} "
+          f"{'Latency (3)':>12} {'Latency (1)':>12} {'Saved':>7}")
+    for row in rows:
+        token_saving = 1 - row["unified_tokens"] / row["legacy_tokens"] if row["legacy_tokens"] else 0
+        latency_saving = 1 - row["unified_latency_s"] / row["legacy_latency_s"] if row["legacy_latency_s"] else 0
+        print(f"{row['name'][:30]:<30} {row['legacy_tokens']:>16} {row['unified_tokens']:>15} {token_saving:>7.0%} "
+              f"{row['legacy_latency_s']:>11.2f}s {row['unified_latency_s']:>11.2f}s {latency_saving:>7.0%}"
+              + ("" if row["unified_complete"] else "  (fallback needed)"))
+
+    if rows:
+        legacy_tokens = sum(r["legacy_tokens"] for r in rows)
+        unified_tokens = sum(r["unified_tokens"] for r in rows)
+        legacy_latency = sum(r["legacy_latency_s"] for r in rows)
+        unified_latency = sum(r["unified_latency_s"] for r in rows)
+        print(f"\nTotal: {legacy_tokens} → {unified_tokens} tokens, "
+              f"{legacy_latency:.1f}s → {unified_latency:.1f}s over {len(rows)} recipes")
+
+if __name__ == "__main__":
+    # python -m pipeline.enrich [n_recipes]
+    import sys
+    from pipeline.extract import fetch_mealdb
+
+    sample = fetch_mealdb(limit=int(sys.argv[1]) if len(sys.argv) > 1 else 5)
+    print_comparison_report(RecipeEnricher().compare(sample))
@@ -1,7 +1,7 @@
 # pipeline/extract.py
 import requests
 import csv
-from typing import List, Dict, Optional
+from typing import Iterator, List, Dict, Optional
 
 def fetch_categories() -> List[str]:
     print("Fetching categories...")
@@ -19,6 +19,14 @@ def fetch_meals_by_category(category: str) -> List[str]:
     meals = data.get("meals", [])
     return [meal["idMeal"] for meal in meals]
 
+def fetch_ingredient_list() -> List[str]:
+    """All ingredient names TheMealDB knows about"""
+    url = "https://www.themealdb.com/api/json/v1/1/list.php?i=list"
+    response = requests.get(url)
+    response.raise_for_status()
+    data = response.json()
+    return [meal["strIngredient"] for meal in data.get("meals") or [] if meal.get("strIngredient")]
+
 def fetch_meal_details(meal_id):
     url = f"https://www.themealdb.com/api/json/v1/1/lookup.php?i={meal_id}"
     try:
@@ -70,9 +78,10 @@ def fetch_meal_details(meal_id):
     except Exception as e:
         print(f"Error fetching details for meal {meal_id}: {e}")
         return None
-def fetch_mealdb(limit: int = 2500) -> List[Dict]:
+def iter_mealdb(limit: int = 2500) -> Iterator[Dict]:
+    """Yield recipe details one at a time as they are fetched from TheMealDB"""
     print("Fetching from TheMealDB by category...")
-    results = []
+    count = 0
     seen_ids = set()
     categories = fetch_categories()
 
@@ -86,10 +95,12 @@ def fetch_mealdb(limit: int = 2500) -> List[Dict]:
 
             meal_details = fetch_meal_details(meal_id)
             if meal_details:
-                results.append(meal_details)
+                yield meal_details
+                count += 1
 
-            if len(results) >= limit:
-                return results
+            if count >= limit:
+                return
 
-    return results
+def fetch_mealdb(limit: int = 2500) -> List[Dict]:
+    return list(iter_mealdb(limit=limit))
 
@@ -0,0 +1,147 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
+import google.generativeai as genai
+from config import (GEMINI_API_KEY, GEMINI_RPM, GEMINI_TPM, GEMINI_MAX_RETRIES,
+                    GEMINI_CONCURRENCY)
+from pipeline.gemini_utils import response_text as get_response_text
+from pipeline.llm_cache import LLMCache, get_default_cache
+
+# HTTP statuses worth retrying: rate limited or a transient server-side failure
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at capacity per minute"""
+    def __init__(self, capacity_per_minute: float):
+        self.capacity = float(capacity_per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Take `amount` tokens, returning how long the caller must wait before using them"""
+        # Requests larger than the whole bucket would otherwise never be admitted
+        amount = min(amount, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= amount
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute budgets for one model"""
+    def __init__(self, rpm: Optional[float], tpm: Optional[float]):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+
+    def acquire(self, estimated_tokens: int):
+        wait = 0.0
+        if self.requests:
+            wait = max(wait, self.requests.reserve(1))
+        if self.tokens:
+            wait = max(wait, self.tokens.reserve(estimated_tokens))
+        if wait > 0:
+            time.sleep(wait)
+
+
+# Quota is per model, so every client for the same model shares one limiter
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+def get_rate_limiter(model_name: str) -> RateLimiter:
+    with _limiters_lock:
+        if model_name not in _limiters:
+            _limiters[model_name] = RateLimiter(GEMINI_RPM, GEMINI_TPM)
+        return _limiters[model_name]
+
+def estimate_tokens(prompt: str, expected_output_tokens: int = 512) -> int:
+    """Rough token estimate (~4 characters per token) plus room for the reply"""
+    return len(prompt) // 4 + expected_output_tokens
+
+def is_retryable(error: Exception) -> bool:
+    """True for 429 and 5xx errors from the Gemini API"""
+    code = getattr(error, "code", None)
+    if callable(code):
+        # gRPC errors expose code() returning a StatusCode enum
+        try:
+            code = code().name
+        except Exception:
+            code = None
+    if isinstance(code, int):
+        return code in RETRYABLE_STATUS_CODES
+    if isinstance(code, str):
+        return code in ("RESOURCE_EXHAUSTED", "UNAVAILABLE", "INTERNAL", "DEADLINE_EXCEEDED")
+    return type(error).__name__ in (
+        "ResourceExhausted", "TooManyRequests", "InternalServerError",
+        "ServiceUnavailable", "BadGateway", "GatewayTimeout", "DeadlineExceeded"
+    )
+
+
+class GeminiClient:
+    """Shared entry point for Gemini text generation.
+
+    Every call goes through the LLM cache; cache misses are admitted by the model's
+    requests/tokens-per-minute budget and 429/5xx errors are retried with jittered
+    exponential backoff.
+    """
+    def __init__(self, model_name: str, cache: LLMCache = None, max_retries: int = GEMINI_MAX_RETRIES,
+                 base_delay: float = 1.0, max_delay: float = 60.0):
+        genai.configure(api_key=GEMINI_API_KEY)
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+        self.cache = cache or get_default_cache()
+        self.limiter = get_rate_limiter(model_name)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def _call(self, prompt: str) -> str:
+        attempt = 0
+        while True:
+            self.limiter.acquire(estimate_tokens(prompt))
+            try:
+                return get_response_text(self.model.generate_content(prompt))
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                # Full jitter keeps concurrent callers from retrying in lockstep
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                print(f"⚠️ Gemini call failed ({str(e)[:80]}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+                attempt += 1
+
+    def generate(self, prompt: str, prompt_version: str) -> str:
+        """Return the response text for prompt, from the cache when it has been seen before"""
+        cache_model = self.model.model_name
+        cached = self.cache.get(cache_model, prompt_version, prompt)
+        if cached is not None:
+            return cached
+
+        text = self._call(prompt)
+        self.cache.put(cache_model, prompt_version, prompt, text)
+        return text
+
+    def invalidate(self, prompt: str, prompt_version: str):
+        """Drop a cached response that could not be used"""
+        self.cache.invalidate(self.model.model_name, prompt_version, prompt)
+
+    def count_tokens(self, text: str) -> int:
+        return self.model.count_tokens(text).total_tokens
+
+    @staticmethod
+    def map(fn: Callable, items: Iterable, concurrency: int = GEMINI_CONCURRENCY) -> List:
+        """Apply fn to items on a thread pool, preserving order; the rate limiter keeps it within quota"""
+        items = list(items)
+        if concurrency <= 1:
+            return [fn(item) for item in items]
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            return list(executor.map(fn, items))
@@ -0,0 +1,19 @@
+import json
+import re
+from typing import Any
+
+
+def response_text(response) -> str:
+    """Extract the text from a Gemini response across SDK response formats"""
+    if hasattr(response, 'text'):
+        return response.text
+    elif hasattr(response, 'candidates') and response.candidates:
+        return response.candidates[0].content.parts[0].text
+    else:
+        raise ValueError("Unexpected response format from Gemini")
+
+
+def parse_json_response(response_text: str) -> Any:
+    """Strip markdown code fences from a Gemini reply and parse it as JSON"""
+    cleaned_text = re.sub(r'^```json|```$', '', response_text.strip(), flags=re.IGNORECASE).strip()
+    return json.loads(cleaned_text)
@@ -0,0 +1,156 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+from pipeline.gemini_utils import response_text as get_response_text
+
+CACHE_MODES = ("readwrite", "replay", "off")
+
+
+class CacheMiss(Exception):
+    """Raised in replay mode when a prompt has no recorded response"""
+
+
+class LLMCache:
+    """SQLite-backed store of LLM responses keyed by (model, prompt version, input hash).
+
+    Modes:
+    - readwrite: serve hits, call the model on misses and record the response
+    - replay: read-only; a miss raises CacheMiss instead of calling the model, which makes
+      runs deterministic and lets a recorded cache serve as fixtures for offline benchmarks
+    - off: bypass the cache entirely
+    """
+    def __init__(self, path: str = ".llm_cache.sqlite", mode: str = "readwrite",
+                 ttl_seconds: Optional[float] = None, max_entries: Optional[int] = None):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown cache mode '{mode}', expected one of {CACHE_MODES}")
+        self.path = path
+        self.mode = mode
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        if mode != "off":
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_responses (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    prompt_version TEXT NOT NULL,
+                    input_hash TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_last_access ON llm_responses (last_access)")
+            self._conn.commit()
+
+    @classmethod
+    def from_env(cls) -> "LLMCache":
+        """Build a cache from LLM_CACHE_PATH / LLM_CACHE_MODE / LLM_CACHE_TTL_SECONDS / LLM_CACHE_MAX_ENTRIES"""
+        ttl = os.getenv("LLM_CACHE_TTL_SECONDS")
+        max_entries = os.getenv("LLM_CACHE_MAX_ENTRIES")
+        return cls(
+            path=os.getenv("LLM_CACHE_PATH", ".llm_cache.sqlite"),
+            mode=os.getenv("LLM_CACHE_MODE", "readwrite"),
+            ttl_seconds=float(ttl) if ttl else None,
+            max_entries=int(max_entries) if max_entries else None,
+        )
+
+    @staticmethod
+    def make_key(model: str, prompt_version: str, prompt: str):
+        input_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        key = hashlib.sha256(f"{model}\x00{prompt_version}\x00{input_hash}".encode("utf-8")).hexdigest()
+        return key, input_hash
+
+    def get(self, model: str, prompt_version: str, prompt: str) -> Optional[str]:
+        """Return the recorded response, or None on a miss (CacheMiss in replay mode)"""
+        if self.mode == "off":
+            return None
+
+        key, _ = self.make_key(model, prompt_version, prompt)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM llm_responses WHERE key = ?", (key,)
+            ).fetchone()
+            expired = row is not None and self.ttl_seconds is not None and now - row[1] > self.ttl_seconds
+            if row is not None and not expired:
+                self.hits += 1
+                if self.mode == "readwrite":
+                    self._conn.execute("UPDATE llm_responses SET last_access = ? WHERE key = ?", (now, key))
+                    self._conn.commit()
+                return row[0]
+            if expired and self.mode == "readwrite":
+                self._conn.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+                self._conn.commit()
+            self.misses += 1
+
+        if self.mode == "replay":
+            raise CacheMiss(f"No recorded response for {model} / {prompt_version}")
+        return None
+
+    def put(self, model: str, prompt_version: str, prompt: str, response: str):
+        """Record a response, evicting least recently used entries beyond max_entries"""
+        if self.mode != "readwrite":
+            return
+
+        key, input_hash = self.make_key(model, prompt_version, prompt)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model, prompt_version, input_hash, response, now, now)
+            )
+            if self.max_entries is not None:
+                self._conn.execute("""
+                    DELETE FROM llm_responses WHERE key IN (
+                        SELECT key FROM llm_responses ORDER BY last_access DESC LIMIT -1 OFFSET ?
+                    )
+                """, (self.max_entries,))
+            self._conn.commit()
+
+    def invalidate(self, model: str, prompt_version: str, prompt: str):
+        """Forget a recorded response, e.g. one that turned out to be unparseable"""
+        if self.mode != "readwrite":
+            return
+        key, _ = self.make_key(model, prompt_version, prompt)
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_default_cache() -> LLMCache:
+    """Process-wide cache shared by every Gemini caller"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = LLMCache.from_env()
+        return _default_cache
+
+def cached_generate(model, prompt: str, prompt_version: str, cache: LLMCache = None) -> str:
+    """Call model.generate_content through the cache and return the response text"""
+    cache = cache or get_default_cache()
+    model_name = getattr(model, "model_name", str(model))
+
+    cached = cache.get(model_name, prompt_version, prompt)
+    if cached is not None:
+        return cached
+
+    text = get_response_text(model.generate_content(prompt))
+    cache.put(model_name, prompt_version, prompt, text)
+    return text
@@ -1,6 +1,8 @@
 # pipeline/load.py
 import csv
-from pipeline.transform import clean_data
+import os
+from typing import Dict, Iterable, Iterator, List
+from pipeline.transform import clean_data, is_valid_row
 
 def save_to_csv(data, filename="mealdb_recipes.csv"):
     if not data:
@@ -15,4 +17,47 @@ def save_to_csv(data, filename="mealdb_recipes.csv"):
         writer.writeheader()
         writer.writerows(cleaned_data)
     print(f"Saved {len(cleaned_data)} cleaned rows to {filename}")
-    
\ No newline at end of file
+
+def stream_to_csv(rows: Iterable[Dict], filename="mealdb_recipes.csv") -> Iterator[Dict]:
+    """Write valid rows to CSV as they pass through, yielding every row downstream like save_to_csv"""
+    written = 0
+    skipped = 0
+    writer = None
+    header_size = 0
+    
+    with open(filename, "w", newline='', encoding='utf-8') as f:
+        for row in rows:
+            if not is_valid_row(row):
+                skipped += 1
+                yield row
+                continue
+                
+            if writer is None:
+                writer = csv.DictWriter(f, fieldnames=list(row.keys()))
+                writer.writeheader()
+                header_size = len(writer.fieldnames)
+            # Later rows may carry fields the first one lacked (e.g. its embedding failed);
+            # they become new columns and the header is fixed up once the stream ends
+            writer.fieldnames.extend(key for key in row.keys() if key not in writer.fieldnames)
+            writer.writerow(row)
+            f.flush()
+            written += 1
+            yield row
+            
+    if writer is not None and len(writer.fieldnames) > header_size:
+        _rewrite_header(filename, writer.fieldnames)
+    print(f"Filtered {skipped} invalid rows")
+    print(f"Saved {written} cleaned rows to {filename}")
+
+def _rewrite_header(filename: str, fieldnames: List[str]):
+    """Replace the CSV header with the full column list, padding rows written before a column appeared"""
+    temp_filename = filename + ".tmp"
+    with open(filename, newline='', encoding='utf-8') as source, \
+            open(temp_filename, "w", newline='', encoding='utf-8') as target:
+        reader = csv.reader(source)
+        writer = csv.writer(target)
+        next(reader)
+        writer.writerow(fieldnames)
+        for values in reader:
+            writer.writerow(values + [''] * (len(fieldnames) - len(values)))
+    os.replace(temp_filename, filename)
@@ -0,0 +1,175 @@
+import re
+from functools import lru_cache
+from typing import Dict, Optional
+
+# Canonical unit for each spelling seen in TheMealDB measures
+UNIT_ALIASES = {
+    "g": "g", "g.": "g", "gr": "g", "gram": "g", "grams": "g", "gms": "g",
+    "kg": "kg", "kgs": "kg", "kilo": "kg", "kilogram": "kg", "kilograms": "kg",
+    "mg": "mg",
+    "oz": "oz", "ounce": "oz", "ounces": "oz",
+    "lb": "lb", "lbs": "lb", "pound": "lb", "pounds": "lb",
+    "ml": "ml", "millilitre": "ml", "milliliter": "ml", "millilitres": "ml", "milliliters": "ml",
+    "cl": "cl", "dl": "dl",
+    "l": "l", "litre": "l", "liter": "l", "litres": "l", "liters": "l",
+    "tsp": "tsp", "tsps": "tsp", "tsp.": "tsp", "teaspoon": "tsp", "teaspoons": "tsp", "tspn": "tsp",
+    "tbsp": "tbsp", "tbsps": "tbsp", "tbs": "tbsp", "tbls": "tbsp", "tblsp": "tbsp", "tbsp.": "tbsp",
+    "tablespoon": "tbsp", "tablespoons": "tbsp", "tb": "tbsp",
+    "cup": "cup", "cups": "cup",
+    "pint": "pint", "pints": "pint", "pt": "pint",
+    "quart": "quart", "quarts": "quart", "qt": "quart",
+    "pinch": "pinch", "pinches": "pinch",
+    "dash": "dash", "dashes": "dash",
+    "handful": "handful", "handfuls": "handful",
+    "clove": "clove", "cloves": "clove",
+    "can": "can", "cans": "can", "tin": "can", "tins": "can",
+    "slice": "slice", "slices": "slice",
+    "piece": "piece", "pieces": "piece", "whole": "piece",
+    "bunch": "bunch", "bunches": "bunch",
+    "sprig": "sprig", "sprigs": "sprig",
+    "stick": "stick", "sticks": "stick",
+    "pack": "pack", "packet": "pack", "packs": "pack", "packets": "pack",
+    "knob": "knob", "drizzle": "drizzle", "splash": "splash",
+    "sprinkling": "sprinkling", "dusting": "dusting",
+}
+
+# Size words that stand in for "one piece of"
+SIZE_WORDS = {"large", "medium", "small", "big", "thumb", "heaped", "level", "heaping"}
+
+# Measures that carry no number ("to taste Salt", "For frying Oil")
+PHRASE_UNITS = [
+    ("to taste", "to taste"), ("to serve", "to serve"), ("to garnish", "to serve"),
+    ("garnish", "to serve"), ("for frying", "drizzle"), ("for greasing", "drizzle"),
+    ("for brushing", "drizzle"), ("for dusting", "dusting"),
+]
+
+# Preparation and size words that don't change which food an ingredient is
+DESCRIPTOR_WORDS = {
+    "fresh", "freshly", "dried", "chopped", "finely", "roughly", "diced", "sliced", "thinly", "minced",
+    "grated", "crushed", "large", "medium", "small", "ripe", "boneless", "skinless", "skinned", "peeled",
+    "cooked", "raw", "frozen", "tinned", "canned", "organic", "free", "range", "lean", "whole", "halved",
+    "quartered", "cubed", "shredded", "softened", "melted", "beaten", "toasted", "unsalted", "salted",
+    "the", "a", "of", "and", "or", "for", "to", "taste", "serve", "garnish", "optional", "handful",
+}
+
+FRACTIONS = {"½": 0.5, "¼": 0.25, "¾": 0.75, "⅓": 1 / 3, "⅔": 2 / 3, "⅛": 0.125, "⅜": 0.375, "⅝": 0.625, "⅞": 0.875}
+
+_QTY = r"\d+\s+\d+/\d+|\d+/\d+|\d+(?:[.,]\d+)?\s*[½¼¾⅓⅔⅛⅜⅝⅞]?|[½¼¾⅓⅔⅛⅜⅝⅞]"
+QUANTITY_PATTERN = re.compile(rf"^\s*(?P<qty>{_QTY})(?:\s*(?:-|–|to)\s*(?P<high>{_QTY}))?\s*")
+# "400g", "1kg" - unit glued to the number
+ATTACHED_UNIT_PATTERN = re.compile(r"^(?P<unit>[a-zA-Z]+\.?)(?=[\s/]|$)")
+
+
+def parse_quantity(text: str) -> Optional[float]:
+    text = text.strip().replace(",", ".")
+    total = 0.0
+    for part in re.findall(r"\d+/\d+|\d+(?:\.\d+)?|[½¼¾⅓⅔⅛⅜⅝⅞]", text):
+        if "/" in part:
+            numerator, denominator = part.split("/")
+            total += float(numerator) / float(denominator) if float(denominator) else 0.0
+        elif part in FRACTIONS:
+            total += FRACTIONS[part]
+        else:
+            total += float(part)
+    return total if total > 0 else None
+
+
+@lru_cache(maxsize=50000)
+def _parse_ingredient(text: str):
+    rest = " ".join(text.split())
+    quantity = None
+    unit = None
+
+    match = QUANTITY_PATTERN.match(rest)
+    if match:
+        quantity = parse_quantity(match.group("qty"))
+        if match.group("high"):
+            high = parse_quantity(match.group("high"))
+            if quantity and high:
+                quantity = (quantity + high) / 2
+        rest = rest[match.end():]
+        # "2 x 400g Chickpeas": multiply by the pack size that follows
+        multiple = re.match(r"^x\s*", rest, flags=re.IGNORECASE)
+        inner = QUANTITY_PATTERN.match(rest[multiple.end():]) if multiple else None
+        if inner and quantity:
+            quantity *= parse_quantity(inner.group("qty")) or 1.0
+            rest = rest[multiple.end() + inner.end():]
+    else:
+        lowered = rest.lower()
+        for phrase, phrase_unit in PHRASE_UNITS:
+            if lowered.startswith(phrase + " "):
+                unit = phrase_unit
+                rest = rest[len(phrase):].strip()
+                break
+
+    if unit is None:
+        unit_match = ATTACHED_UNIT_PATTERN.match(rest)
+        token = unit_match.group("unit").lower() if unit_match else ""
+        if token in UNIT_ALIASES:
+            unit = UNIT_ALIASES[token]
+            rest = rest[unit_match.end():]
+            # "200g/7oz Flour": keep the first unit, drop the alternative
+            rest = re.sub(r"^\s*/\s*\S+", "", rest)
+        elif token in SIZE_WORDS:
+            unit = "piece"
+            rest = rest[unit_match.end():]
+
+    rest = re.sub(r"^\s*(?:of|x)\s+", "", rest.strip(), flags=re.IGNORECASE).strip()
+    if unit is None and quantity is not None:
+        unit = "piece"
+    return quantity, unit, rest
+
+
+def parse_ingredient(text: str) -> Dict:
+    """Split a "measure + ingredient" string from fetch_meal_details into parts.
+
+    "2 tbs Olive Oil" -> {"quantity": 2.0, "unit": "tbsp", "name": "Olive Oil"}
+    "Pinch Salt"      -> {"quantity": None, "unit": "pinch", "name": "Salt"}
+    """
+    quantity, unit, name = _parse_ingredient(text or "")
+    return {"quantity": quantity, "unit": unit, "name": name, "raw": text}
+
+
+def _singular(word: str) -> str:
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 4 and word.endswith("ves"):
+        return word[:-3] + "f"
+    if len(word) > 4 and word.endswith("oes"):
+        return word[:-2]
+    # "hummus", "asparagus", "couscous"... are already singular
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+def normalize_food_name(name: str) -> str:
+    """Lowercase, drop punctuation and descriptor words, singularize: "Chopped Tomatoes" -> "tomato" """
+    words = re.findall(r"[a-zà-ÿ]+", name.lower())
+    return " ".join(_singular(word) for word in words if word not in DESCRIPTOR_WORDS)
+
+
+# Conversions to grams (mass) or millilitres (volume)
+MASS_GRAMS = {"g": 1.0, "kg": 1000.0, "mg": 0.001, "oz": 28.35, "lb": 453.6}
+VOLUME_ML = {"ml": 1.0, "cl": 10.0, "dl": 100.0, "l": 1000.0, "tsp": 5.0, "tbsp": 15.0,
+             "cup": 240.0, "pint": 568.0, "quart": 946.0, "dash": 0.6, "drizzle": 10.0, "splash": 15.0}
+# Units whose weight doesn't depend on the food
+FIXED_GRAMS = {"pinch": 0.4, "handful": 30.0, "can": 400.0, "bunch": 50.0, "sprig": 1.0,
+               "stick": 113.0, "pack": 250.0, "knob": 15.0, "sprinkling": 2.0, "dusting": 5.0,
+               "to taste": 1.0, "to serve": 5.0}
+# Units that mean "one of the thing"
+PIECE_UNITS = {"piece", "clove", "slice"}
+
+
+def to_grams(quantity: Optional[float], unit: Optional[str], density_g_ml: float = 1.0,
+             piece_g: float = 0.0, default_g: float = 15.0) -> float:
+    """Convert a parsed measure into grams using the food's density and per-piece weight"""
+    amount = quantity if quantity is not None else 1.0
+    if unit in MASS_GRAMS:
+        return amount * MASS_GRAMS[unit]
+    if unit in VOLUME_ML:
+        return amount * VOLUME_ML[unit] * (density_g_ml or 1.0)
+    if unit in FIXED_GRAMS:
+        return amount * FIXED_GRAMS[unit]
+    if unit in PIECE_UNITS or unit is None:
+        return amount * (piece_g or default_g)
+    return amount * default_g
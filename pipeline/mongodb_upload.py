@@ -1,30 +1,50 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, ReturnDocument
 from pymongo.errors import OperationFailure
-from pymongo.operations import SearchIndexModel
-from config import MONGODB_URI, DB_NAME, COLLECTION_NAME
+from pymongo.operations import UpdateOne
+from config import MONGODB_URI, DB_NAME, COLLECTION_NAME, META_COLLECTION_NAME
+from typing import Dict, Iterable
+from pipeline.search_indexes import SEARCH_INDEX_VERSION, sync_search_indexes
+from pipeline.stream import batched
+from serving.catalogue import ACTIVE_COLLECTION_FIELD, active_collection_name
+from serving.ranking import VECTOR_INDEXES, vector_search_pipeline
 import time
 
 class MongoDBUploader:
     def __init__(self):
         self.client = MongoClient(MONGODB_URI)
         self.db = self.client[DB_NAME]
-        self.collection = self.db[COLLECTION_NAME]
+        self.meta = self.db[META_COLLECTION_NAME]
+        # The live catalogue; uploads switch this to a staging collection until promote()
+        self.collection = self.db[self.active_collection_name()]
+    
+    def active_collection_name(self) -> str:
+        return active_collection_name(self.meta.find_one({"_id": COLLECTION_NAME}), COLLECTION_NAME)
+    
+    def _start_staging(self):
+        """
+        Empty whichever blue/green collection is not live and load into it, so searches keep reading the live one
+        """
+        live = self.active_collection_name()
+        name = f"{COLLECTION_NAME}_green" if live == f"{COLLECTION_NAME}_blue" else f"{COLLECTION_NAME}_blue"
+        self.collection = self.db[name]
+        self.collection.drop()
+        print(f"📦 Loading into staging collection {name} (live: {live})")
     
     def upload_recipes(self, recipes):
         """
         Upload recipes to MongoDB with proper indexing
         """
         try:
-            # Clear existing data
-            self.collection.drop()
+            self._start_staging()
             
             # Insert new data
             if isinstance(recipes, dict):
                 recipes = [recipes]  # convert single recipe to list
             result = self.collection.insert_many(recipes)
             
-            # Create standard indexes
+            # Create standard indexes, then the vector indexes searches need
             self._create_standard_indexes()
+            self.ensure_search_indexes()
             
             return {
                 "success": True,
@@ -36,6 +56,97 @@ class MongoDBUploader:
                 "error": str(e)
             }
     
+    def upload_stream(self, recipes: Iterable[Dict], batch_size: int = 20):
+        """
+        Upload a recipe stream in small batches so the first recipes land immediately
+        """
+        inserted_count = 0
+        try:
+            self._start_staging()
+            
+            for batch in batched(recipes, batch_size):
+                result = self.collection.insert_many(batch)
+                inserted_count += len(result.inserted_ids)
+                print(f"📦 Uploaded {inserted_count} recipes so far")
+            
+            # Create standard indexes, then the vector indexes searches need
+            self._create_standard_indexes()
+            self.ensure_search_indexes()
+            
+            return {
+                "success": True,
+                "inserted_count": inserted_count
+            }
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "inserted_count": inserted_count
+            }
+    
+    def update_fields(self, updates: Dict[str, Dict], batch_size: int = 500) -> int:
+        """
+        Set fields on existing recipes, keyed by meal_id, in unordered bulk writes
+        """
+        modified_count = 0
+        operations = (UpdateOne({"meal_id": meal_id}, {"$set": fields}) for meal_id, fields in updates.items())
+        for batch in batched(operations, batch_size):
+            result = self.collection.bulk_write(batch, ordered=False)
+            modified_count += result.modified_count
+        return modified_count
+    
+    def promote(self) -> int:
+        """
+        Smoke-test the staging collection, then point the catalogue alias at it and advance the
+        generation in a single write, so searches switch from one complete catalogue to the next
+        """
+        self.smoke_test()
+        doc = self.meta.find_one_and_update(
+            {"_id": COLLECTION_NAME},
+            {
+                "$inc": {"generation": 1},
+                "$set": {ACTIVE_COLLECTION_FIELD: self.collection.name, "updated_at": time.time()}
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return doc["generation"]
+    
+    def smoke_test(self):
+        """
+        Fail unless the collection answers the vector, filtered and text queries searches rely on
+        """
+        sample = self.collection.find_one(
+            {field: {"$ne": None} for field in VECTOR_INDEXES},
+            {"name": 1, "category": 1, **{field: 1 for field in VECTOR_INDEXES}}
+        )
+        if sample is None:
+            raise RuntimeError(f"Smoke test failed: no embedded recipes in {self.collection.name}")
+        
+        for field, (index, _) in VECTOR_INDEXES.items():
+            search_filter = {"category": {"$eq": sample["category"]}} if sample.get("category") else None
+            pipeline = vector_search_pipeline(field, sample[field], 5, search_filter=search_filter)
+            if not any(hit["_id"] == sample["_id"] for hit in self.collection.aggregate(pipeline)):
+                raise RuntimeError(f"Smoke test failed: {index} did not return {sample['name']}")
+        if self.collection.find_one({"$text": {"$search": sample["name"]}}) is None:
+            raise RuntimeError(f"Smoke test failed: text index did not return {sample['name']}")
+        print(f"✅ Smoke test passed on {self.collection.name}")
+    
+    def ensure_search_indexes(self) -> Dict[str, str]:
+        """
+        Bring the vector search indexes in line with pipeline/search_indexes.py and wait until they are queryable
+        """
+        print(f"🧭 Syncing search indexes (version {SEARCH_INDEX_VERSION})")
+        actions = sync_search_indexes(self.collection)
+        for name, action in actions.items():
+            print(f"✅ {name}: {action}, queryable")
+        self.meta.update_one(
+            {"_id": COLLECTION_NAME},
+            {"$set": {"search_index_version": SEARCH_INDEX_VERSION}},
+            upsert=True
+        )
+        return actions
+    
     def _create_standard_indexes(self):
         """Create standard indexes for query performance"""
         self.collection.create_index("meal_id", unique=True)
@@ -43,4 +154,5 @@ class MongoDBUploader:
         self.collection.create_index("category")
         self.collection.create_index("area")
         self.collection.create_index("ingredients")
+        self.collection.create_index("ingredient_ids")
         self.collection.create_index("health_score")
@@ -0,0 +1,211 @@
+import csv
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from config import NUTRITION_TABLE_PATH
+from pipeline.measures import normalize_food_name, parse_ingredient, to_grams
+
+# Nutrient columns of the food composition table, per 100 g
+NUTRIENTS = ["kcal", "protein_g", "fat_g", "saturated_fat_g", "carbs_g", "sugar_g", "fiber_g", "sodium_mg"]
+K_KCAL, K_PROTEIN, K_FAT, K_SAT_FAT, K_CARBS, K_SUGAR, K_FIBER, K_SODIUM = range(len(NUTRIENTS))
+
+# Categories counted as fruit, vegetables, legumes and nuts for the Nutri-Score
+FVL_CATEGORIES = {"vegetable", "fruit", "legume", "nut", "herb"}
+
+# Nutri-Score (general foods) thresholds: points = number of thresholds exceeded
+ENERGY_KJ_THRESHOLDS = np.array([335, 670, 1005, 1340, 1675, 2010, 2345, 2680, 3015, 3350], dtype=float)
+SUGAR_THRESHOLDS = np.array([4.5, 9, 13.5, 18, 22.5, 27, 31, 36, 40, 45], dtype=float)
+SAT_FAT_THRESHOLDS = np.arange(1, 11, dtype=float)
+SODIUM_THRESHOLDS = np.arange(90, 901, 90, dtype=float)
+FIBER_THRESHOLDS = np.array([0.9, 1.9, 2.8, 3.7, 4.7], dtype=float)
+PROTEIN_THRESHOLDS = np.array([1.6, 3.2, 4.8, 6.4, 8.0], dtype=float)
+FVL_POINTS = np.array([0, 1, 2, 5])
+FVL_THRESHOLDS = np.array([40, 60, 80], dtype=float)
+# Nutri-Score bands A..E mapped to the app's 1-5 health score
+GRADE_THRESHOLDS = np.array([0, 3, 11, 19], dtype=float)
+GRADE_HEALTH_SCORES = np.array([5, 4, 3, 2, 1])
+GRADE_LETTERS = ["A", "B", "C", "D", "E"]
+
+KCAL_TO_KJ = 4.184
+
+
+class FoodTable:
+    """Food composition table loaded into a nutrient matrix with a name/alias index"""
+    def __init__(self, names: List[str], categories: List[str], nutrients: np.ndarray,
+                 density_g_ml: np.ndarray, piece_g: np.ndarray, aliases: Dict[str, int]):
+        self.names = names
+        self.categories = categories
+        self.nutrients = nutrients
+        self.density_g_ml = density_g_ml
+        self.piece_g = piece_g
+        self.is_fvl = np.array([category in FVL_CATEGORIES for category in categories])
+        self.index = {}
+        for alias, row in aliases.items():
+            self.index.setdefault(alias, row)
+            self.index.setdefault(normalize_food_name(alias), row)
+        self._lookup = lru_cache(maxsize=50000)(self._find)
+
+    @classmethod
+    def load(cls, path: str = NUTRITION_TABLE_PATH) -> "FoodTable":
+        names, categories, rows, density, piece = [], [], [], [], []
+        aliases = {}
+        with open(path, newline="", encoding="utf-8") as f:
+            for i, row in enumerate(csv.DictReader(f)):
+                names.append(row["name"])
+                categories.append(row["category"])
+                rows.append([float(row[column] or 0) for column in NUTRIENTS])
+                density.append(float(row["density_g_ml"] or 0))
+                piece.append(float(row["piece_g"] or 0))
+                for alias in [row["name"]] + [a for a in (row["aliases"] or "").split("|") if a]:
+                    aliases.setdefault(alias.strip().lower(), i)
+        return cls(names, categories, np.array(rows, dtype=float), np.array(density),
+                   np.array(piece), aliases)
+
+    def _find(self, name: str) -> Optional[int]:
+        lowered = name.strip().lower()
+        if lowered in self.index:
+            return self.index[lowered]
+        words = normalize_food_name(lowered).split()
+        # Longest run of words first; at equal length prefer the end, where English puts the noun
+        for length in range(len(words), 0, -1):
+            for start in range(len(words) - length, -1, -1):
+                row = self.index.get(" ".join(words[start:start + length]))
+                if row is not None:
+                    return row
+        return None
+
+    def lookup(self, name: str) -> Optional[int]:
+        """Row index of the food matching an ingredient name, or None"""
+        return self._lookup(name)
+
+    def __len__(self):
+        return len(self.names)
+
+
+class NutritionEngine:
+    """Computes nutrient totals and a Nutri-Score based 1-5 health score without calling Gemini.
+
+    Ingredient strings are resolved to (food row, grams) once and cached; the scoring itself
+    runs over all recipes at once as array operations.
+    """
+    def __init__(self, table: FoodTable = None, path: str = NUTRITION_TABLE_PATH):
+        self.table = table or FoodTable.load(path)
+
+    @lru_cache(maxsize=50000)
+    def resolve(self, ingredient: str) -> Optional[Tuple[int, float]]:
+        """(food row, grams) for a "measure + ingredient" string, or None if the food is unknown"""
+        parsed = parse_ingredient(ingredient)
+        row = self.table.lookup(parsed["name"]) if parsed["name"] else None
+        if row is None:
+            return None
+        grams = to_grams(parsed["quantity"], parsed["unit"],
+                         density_g_ml=self.table.density_g_ml[row], piece_g=self.table.piece_g[row])
+        return row, grams
+
+    def score_recipes(self, recipes: List[Dict]) -> List[Dict]:
+        """Health score and nutrition summary for each recipe, in order"""
+        recipe_rows, food_rows, grams = [], [], []
+        counts = np.zeros(len(recipes))
+        matched = np.zeros(len(recipes))
+        unmatched = [[] for _ in recipes]
+        for i, recipe in enumerate(recipes):
+            for ingredient in recipe.get("ingredients") or []:
+                counts[i] += 1
+                resolved = self.resolve(ingredient)
+                if resolved is None:
+                    unmatched[i].append(ingredient)
+                    continue
+                matched[i] += 1
+                recipe_rows.append(i)
+                food_rows.append(resolved[0])
+                grams.append(resolved[1])
+
+        recipe_rows = np.array(recipe_rows, dtype=int)
+        food_rows = np.array(food_rows, dtype=int)
+        grams = np.array(grams, dtype=float)
+
+        totals = np.zeros((len(recipes), len(NUTRIENTS)))
+        np.add.at(totals, recipe_rows, self.table.nutrients[food_rows] * (grams / 100.0)[:, None])
+        weight = np.bincount(recipe_rows, weights=grams, minlength=len(recipes))
+        fvl_weight = np.bincount(recipe_rows, weights=grams * self.table.is_fvl[food_rows], minlength=len(recipes))
+
+        safe_weight = np.where(weight > 0, weight, 1.0)
+        per_100g = totals / safe_weight[:, None] * 100.0
+        fvl_percent = fvl_weight / safe_weight * 100.0
+
+        points, health_scores = nutri_score_points(per_100g, fvl_percent)
+        coverage = np.divide(matched, counts, out=np.zeros_like(matched), where=counts > 0)
+
+        results = []
+        for i in range(len(recipes)):
+            scored = weight[i] > 0
+            results.append({
+                "health_score": int(health_scores[i]) if scored else 0,
+                "nutrition": {
+                    "per_100g": {name: round(float(value), 2) for name, value in zip(NUTRIENTS, per_100g[i])},
+                    "totals": {name: round(float(value), 1) for name, value in zip(NUTRIENTS, totals[i])},
+                    "total_weight_g": round(float(weight[i]), 1),
+                    "fvl_percent": round(float(fvl_percent[i]), 1),
+                    "nutri_score_points": int(points[i]) if scored else None,
+                    "nutri_score_grade": grade_letter(points[i]) if scored else None,
+                    "coverage": round(float(coverage[i]), 2),
+                    "unmatched_ingredients": unmatched[i],
+                }
+            })
+        return results
+
+    def score_recipe(self, recipe: Dict) -> Dict:
+        return self.score_recipes([recipe])[0]
+
+
+def nutri_score_points(per_100g: np.ndarray, fvl_percent: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Nutri-Score points and the matching 1-5 health score for each row of per-100 g nutrients"""
+    energy = np.searchsorted(ENERGY_KJ_THRESHOLDS, per_100g[:, K_KCAL] * KCAL_TO_KJ, side="left")
+    sugar = np.searchsorted(SUGAR_THRESHOLDS, per_100g[:, K_SUGAR], side="left")
+    sat_fat = np.searchsorted(SAT_FAT_THRESHOLDS, per_100g[:, K_SAT_FAT], side="left")
+    sodium = np.searchsorted(SODIUM_THRESHOLDS, per_100g[:, K_SODIUM], side="left")
+    negative = energy + sugar + sat_fat + sodium
+
+    fiber = np.searchsorted(FIBER_THRESHOLDS, per_100g[:, K_FIBER], side="left")
+    protein = np.searchsorted(PROTEIN_THRESHOLDS, per_100g[:, K_PROTEIN], side="left")
+    fvl = FVL_POINTS[np.searchsorted(FVL_THRESHOLDS, fvl_percent, side="left")]
+    # Protein only counts when the negative points are low or the dish is mostly produce
+    protein = np.where((negative < 11) | (fvl == 5), protein, 0)
+
+    points = negative - (fiber + protein + fvl)
+    health_scores = GRADE_HEALTH_SCORES[np.searchsorted(GRADE_THRESHOLDS, points, side="right")]
+    return points, health_scores
+
+def grade_letter(points: float) -> str:
+    return GRADE_LETTERS[int(np.searchsorted(GRADE_THRESHOLDS, points, side="right"))]
+
+def describe_nutrition(nutrition: Dict) -> str:
+    """Short templated health description from the computed nutrition"""
+    per_100g = nutrition["per_100g"]
+    highs = []
+    if per_100g["sugar_g"] > 13.5:
+        highs.append("sugar")
+    if per_100g["saturated_fat_g"] > 5:
+        highs.append("saturated fat")
+    if per_100g["sodium_mg"] > 450:
+        highs.append("salt")
+    goods = []
+    if per_100g["protein_g"] > 8:
+        goods.append("protein")
+    if per_100g["fiber_g"] > 3.7:
+        goods.append("fibre")
+    if nutrition["fvl_percent"] > 40:
+        goods.append("fruit and vegetables")
+
+    description = (
+        f"Nutri-Score {nutrition['nutri_score_grade']}: about {per_100g['kcal']:.0f} kcal per 100 g, "
+        f"with {per_100g['protein_g']:.1f} g protein, {per_100g['sugar_g']:.1f} g sugar, "
+        f"{per_100g['saturated_fat_g']:.1f} g saturated fat and {per_100g['sodium_mg']:.0f} mg sodium."
+    )
+    if goods:
+        description += f" A good source of {', '.join(goods)}."
+    if highs:
+        description += f" High in {', '.join(highs)}, so best enjoyed in moderation."
+    if nutrition["coverage"] < 1:
+        description += f" Estimated from {nutrition['coverage']:.0%} of the ingredients."
+    return description
@@ -0,0 +1,87 @@
+import time
+from typing import Dict, List
+from pymongo.operations import SearchIndexModel
+from config import VECTOR_INDEX_QUANTIZATION, SEARCH_INDEX_TIMEOUT_SECONDS
+from serving.ranking import FILTER_FIELDS, VECTOR_INDEXES
+
+# Bump whenever a definition below changes; the uploader records it next to the catalogue generation
+SEARCH_INDEX_VERSION = 2
+
+# Must match the dimension EmbeddingGenerator requests from multimodalembedding@001
+EMBEDDING_DIMENSIONS = 512
+SIMILARITY = "cosine"
+
+
+def vector_index_definition(field: str) -> Dict:
+    """Atlas Vector Search definition for one embedding field, with every search filter path"""
+    return {
+        "fields": [
+            {
+                "type": "vector",
+                "path": field,
+                "numDimensions": EMBEDDING_DIMENSIONS,
+                "similarity": SIMILARITY,
+                "quantization": VECTOR_INDEX_QUANTIZATION
+            }
+        ] + [{"type": "filter", "path": path} for path in sorted(set(FILTER_FIELDS.values()))]
+    }
+
+
+def search_index_models() -> List[SearchIndexModel]:
+    return [
+        SearchIndexModel(definition=vector_index_definition(field), name=index, type="vectorSearch")
+        for field, (index, _) in VECTOR_INDEXES.items()
+    ]
+
+
+def _same_definition(current: Dict, wanted: Dict) -> bool:
+    """Atlas fills in defaults, so only the settings we declare are compared"""
+    current_fields = {(f.get("type"), f.get("path")): f for f in (current or {}).get("fields", [])}
+    wanted_fields = {(f["type"], f["path"]): f for f in wanted["fields"]}
+    if set(current_fields) != set(wanted_fields):
+        return False
+    return all(current_fields[key].get(option) == value
+               for key, field in wanted_fields.items() for option, value in field.items())
+
+
+def sync_search_indexes(collection, timeout: float = SEARCH_INDEX_TIMEOUT_SECONDS,
+                        poll_interval: float = 5.0) -> Dict[str, str]:
+    """
+    Create missing vector search indexes and update changed ones, then wait until every one
+    is queryable on its current definition. Returns {index name: "created" | "updated" | "unchanged"}.
+    """
+    existing = {index["name"]: index for index in collection.list_search_indexes()}
+    actions = {}
+    for model in search_index_models():
+        name, definition = model.document["name"], model.document["definition"]
+        current = existing.get(name)
+        if current is None:
+            collection.create_search_index(model)
+            actions[name] = "created"
+        elif not _same_definition(current.get("latestDefinition"), definition):
+            collection.update_search_index(name, definition)
+            actions[name] = "updated"
+        else:
+            actions[name] = "unchanged"
+
+    wait_until_queryable(collection, list(actions), timeout, poll_interval)
+    return actions
+
+
+def wait_until_queryable(collection, names: List[str], timeout: float = SEARCH_INDEX_TIMEOUT_SECONDS,
+                         poll_interval: float = 5.0):
+    """Poll list_search_indexes until every named index is READY and queryable"""
+    deadline = time.monotonic() + timeout
+    while True:
+        statuses = {index["name"]: index for index in collection.list_search_indexes() if index["name"] in names}
+        failed = [name for name, index in statuses.items() if index.get("status") == "FAILED"]
+        if failed:
+            raise RuntimeError(f"Search index build failed: {', '.join(failed)}")
+        pending = [name for name in names
+                   if not (statuses.get(name, {}).get("queryable") and statuses[name].get("status") == "READY")]
+        if not pending:
+            return
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f"Search indexes not queryable after {timeout:.0f}s: {', '.join(pending)}")
+        print(f"⏳ Waiting for search indexes: {', '.join(pending)}")
+        time.sleep(poll_interval)
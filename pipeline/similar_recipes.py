@@ -0,0 +1,107 @@
+import heapq
+import zlib
+from typing import Dict, Iterable, List, Set, Tuple
+import numpy as np
+from pipeline.measures import normalize_food_name, parse_ingredient
+
+# Universal hashing modulo a Mersenne prime; a * x stays below 2**63 for 32-bit x
+HASH_PRIME = np.uint64((1 << 31) - 1)
+
+# 32 bands of 4 rows: pairs above ~0.42 Jaccard share a bucket with high probability
+MINHASH_PERMUTATIONS = 128
+LSH_BANDS = 32
+# Buckets this large are dominated by ubiquitous ingredients (salt, onion...) and skipped
+MAX_BUCKET_SIZE = 200
+MIN_JACCARD = 0.2
+
+
+def ingredient_set(recipe: Dict) -> Set[str]:
+    """Canonical ingredient ids, or normalized names for recipes stored before canonicalization"""
+    if recipe.get('ingredient_ids'):
+        return set(recipe['ingredient_ids'])
+    names = (normalize_food_name(parse_ingredient(i)["name"]) for i in recipe.get('ingredients') or [])
+    return {name for name in names if name}
+
+
+class MinHashLSH:
+    """MinHash signatures over ingredient sets, bucketed by LSH bands.
+
+    Only recipes that collide in at least one band are compared, so the cost grows with
+    the number of near neighbours instead of with every pair in the catalogue.
+    """
+    def __init__(self, num_perm: int = MINHASH_PERMUTATIONS, bands: int = LSH_BANDS, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.a = rng.randint(1, int(HASH_PRIME), size=num_perm).astype(np.uint64)
+        self.b = rng.randint(0, int(HASH_PRIME), size=num_perm).astype(np.uint64)
+        # Odd multipliers that fold one band's rows into a single 64-bit bucket key
+        self.band_mix = (rng.randint(1, 1 << 62, size=self.rows).astype(np.uint64) << np.uint64(1)) | np.uint64(1)
+
+    def signature(self, items: Iterable[str]) -> np.ndarray:
+        hashes = np.array([zlib.crc32(item.encode("utf-8")) for item in items], dtype=np.uint64)
+        if not len(hashes):
+            return np.full(self.num_perm, HASH_PRIME, dtype=np.uint64)
+        return ((self.a[:, None] * hashes[None, :] + self.b[:, None]) % HASH_PRIME).min(axis=1)
+
+    def signatures(self, sets: List[Set[str]]) -> np.ndarray:
+        return np.vstack([self.signature(s) for s in sets]) if sets else np.zeros((0, self.num_perm), np.uint64)
+
+    def candidate_pairs(self, signatures: np.ndarray, max_bucket: int = MAX_BUCKET_SIZE) -> Set[Tuple[int, int]]:
+        """Row pairs that share at least one LSH bucket"""
+        pairs = set()
+        for band in range(self.bands):
+            columns = signatures[:, band * self.rows:(band + 1) * self.rows]
+            with np.errstate(over="ignore"):
+                keys = (columns * self.band_mix).sum(axis=1)
+            order = np.argsort(keys, kind="stable")
+            sorted_keys = keys[order]
+            starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+            ends = np.r_[starts[1:], len(order)]
+            for start, end in zip(starts, ends):
+                if 1 < end - start <= max_bucket:
+                    members = sorted(order[start:end].tolist())
+                    for i, left in enumerate(members):
+                        for right in members[i + 1:]:
+                            pairs.add((left, right))
+        return pairs
+
+
+def similar_recipes(recipes: List[Dict], top_n: int = 6, min_jaccard: float = MIN_JACCARD,
+                    lsh: MinHashLSH = None) -> Dict[str, List[str]]:
+    """Top-N most Jaccard-similar recipes (by meal_id) for each recipe"""
+    lsh = lsh or MinHashLSH()
+    sets = [ingredient_set(recipe) for recipe in recipes]
+    pairs = lsh.candidate_pairs(lsh.signatures(sets))
+
+    best: List[List[Tuple[float, str]]] = [[] for _ in recipes]
+    for left, right in pairs:
+        union = len(sets[left] | sets[right])
+        jaccard = len(sets[left] & sets[right]) / union if union else 0.0
+        if jaccard < min_jaccard:
+            continue
+        for row, other in ((left, right), (right, left)):
+            entry = (jaccard, str(recipes[other]['meal_id']))
+            if len(best[row]) < top_n:
+                heapq.heappush(best[row], entry)
+            else:
+                heapq.heappushpop(best[row], entry)
+
+    return {
+        str(recipe['meal_id']): [meal_id for _, meal_id in sorted(best[row], reverse=True)]
+        for row, recipe in enumerate(recipes)
+    }
+
+
+def store_similar_recipes(uploader, top_n: int = 6) -> int:
+    """Compute similar recipes for everything in the collection and write similar_recipe_ids"""
+    print("\n🔗 Finding similar recipes by ingredients...")
+    recipes = list(uploader.collection.find({}, {"meal_id": 1, "ingredient_ids": 1, "ingredients": 1}))
+    similar = similar_recipes(recipes, top_n=top_n)
+    updated = uploader.update_fields({meal_id: {"similar_recipe_ids": ids} for meal_id, ids in similar.items()})
+    with_matches = sum(1 for ids in similar.values() if ids)
+    print(f"✅ Stored similar recipes for {with_matches}/{len(recipes)} recipes ({updated} updated)")
+    return updated
@@ -0,0 +1,108 @@
+import logging
+import queue
+import threading
+from typing import Callable, Dict, Iterable, Iterator, Optional
+from pipeline.llm_cache import CacheMiss
+
+# Sentinel pushed through a stage queue once its source is exhausted
+_DONE = object()
+
+
+class _StageError:
+    """Wraps an exception raised inside a stage thread so the consumer can re-raise it"""
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def map_stage(source: Iterable[Dict], fn: Callable[[Dict], Optional[Dict]]) -> Iterator[Dict]:
+    """Lazily apply fn to each recipe, dropping recipes for which fn returns None"""
+    for recipe in source:
+        try:
+            result = fn(recipe)
+        except CacheMiss:
+            # A replay run must not quietly drop recipes it has no recording for
+            raise
+        except Exception as e:
+            logging.error(f"Stage {getattr(fn, '__name__', fn)} failed for {recipe.get('meal_id')}: {str(e)}")
+            continue
+        if result is not None:
+            yield result
+
+
+def queued_stage(source: Iterable[Dict], fn: Callable[[Dict], Optional[Dict]],
+                 maxsize: int = 8, workers: int = 1, name: str = None) -> Iterator[Dict]:
+    """Run fn over source in background threads, handing results over a bounded queue.
+
+    Producers block once `maxsize` results are waiting, so a slow downstream stage
+    throttles everything upstream of it (backpressure) and at most roughly
+    maxsize + workers recipes are held by this stage at any time.
+    """
+    name = name or getattr(fn, "__name__", "stage")
+    out_queue = queue.Queue(maxsize=maxsize)
+    source_iter = iter(source)
+    source_lock = threading.Lock()
+    stop = threading.Event()
+
+    def _put(item) -> bool:
+        # Poll so that abandoned consumers don't leave producer threads blocked forever
+        while not stop.is_set():
+            try:
+                out_queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _worker():
+        try:
+            while not stop.is_set():
+                with source_lock:
+                    recipe = next(source_iter, _DONE)
+                if recipe is _DONE:
+                    break
+                try:
+                    result = fn(recipe)
+                except CacheMiss:
+                    raise
+                except Exception as e:
+                    logging.error(f"Stage {name} failed for {recipe.get('meal_id')}: {str(e)}")
+                    continue
+                if result is not None and not _put(result):
+                    break
+        except Exception as e:
+            # Errors from the upstream iterator itself are fatal for the pipeline
+            _put(_StageError(e))
+        finally:
+            _put(_DONE)
+
+    threads = [
+        threading.Thread(target=_worker, name=f"{name}-{i}", daemon=True)
+        for i in range(max(1, workers))
+    ]
+    for thread in threads:
+        thread.start()
+
+    finished = 0
+    try:
+        while finished < len(threads):
+            item = out_queue.get()
+            if item is _DONE:
+                finished += 1
+            elif isinstance(item, _StageError):
+                raise item.error
+            else:
+                yield item
+    finally:
+        stop.set()
+
+
+def batched(source: Iterable[Dict], size: int) -> Iterator[list]:
+    """Group a recipe stream into lists of at most `size` items"""
+    batch = []
+    for recipe in source:
+        batch.append(recipe)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
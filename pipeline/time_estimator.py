@@ -0,0 +1,161 @@
+import re
+from typing import Dict, List, Optional
+
+# Minutes per unit; "overnight" is treated as an 8 hour rest
+UNIT_MINUTES = {
+    "sec": 1 / 60, "secs": 1 / 60, "second": 1 / 60, "seconds": 1 / 60,
+    "min": 1, "mins": 1, "minute": 1, "minutes": 1,
+    "hr": 60, "hrs": 60, "hour": 60, "hours": 60,
+    "day": 1440, "days": 1440,
+}
+OVERNIGHT_MINUTES = 480
+
+WORD_NUMBERS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "seven": 7, "eight": 8, "nine": 9, "ten": 10, "fifteen": 15, "twenty": 20,
+    "thirty": 30, "forty": 40, "forty-five": 45, "sixty": 60, "few": 3, "couple": 2,
+}
+
+_NUMBER = r"(?:\d+(?:\.\d+)?(?:\s*[½¼¾]|\s+\d/\d)?|[½¼¾]|\d/\d|" + "|".join(
+    sorted((re.escape(w) for w in WORD_NUMBERS), key=len, reverse=True)) + r")"
+_UNIT = r"(?:" + "|".join(sorted(UNIT_MINUTES, key=len, reverse=True)) + r")"
+
+# "20 minutes", "20-25 mins", "1 to 2 hours", "1½ hours", "a couple of minutes"
+DURATION_PATTERN = re.compile(
+    rf"\b(?P<low>{_NUMBER})(?:\s*(?:-|–|to|or)\s*(?P<high>{_NUMBER}))?\s*(?:of\s+)?(?:an?\s+)?(?P<unit>{_UNIT})\b",
+    flags=re.IGNORECASE
+)
+HALF_HOUR_PATTERN = re.compile(r"\bhalf\s+an?\s+hour\b", flags=re.IGNORECASE)
+OVERNIGHT_PATTERN = re.compile(r"\bovernight\b", flags=re.IGNORECASE)
+# Cues that a step's length is left open ("cook until golden") or overlaps another step
+UNTIMED_PATTERN = re.compile(r"\buntil\b|\bas needed\b|\bto taste\b", flags=re.IGNORECASE)
+PARALLEL_PATTERN = re.compile(r"\bmeanwhile\b|\bwhile\b|\bat the same time\b", flags=re.IGNORECASE)
+
+# Whole words only, so "temper" doesn't match "room temperature" or "proof" "ovenproof". Techniques
+# are verbs: ingredient nouns ("fish fillets", "puff pastry", "stuffing") say nothing about the method
+HARD_TECHNIQUES = [
+    r"temper(?:s|ed|ing)?", r"carameli[sz](?:e|es|ed|ing)", r"souffl[eé]s?", r"laminat(?:e|es|ed|ing)",
+    r"flamb[eé](?:e?d|ing)?", r"knead(?:s|ed|ing)?", r"prov(?:e|es|ed|ing)", r"proof(?:s|ed|ing)?",
+    r"deep[- ]fr(?:y|ies|ied|ying)", r"julienned?", r"emulsif(?:y|ies|ied|ying)", r"blind[- ]bak(?:e|ed|ing)",
+    r"pip(?:e|es|ed|ing)(?!\s+hot)", r"de-?bon(?:e|es|ed|ing)", r"clarif(?:y|ies|ied|ying)",
+    r"confit", r"sous[- ]vide", r"roux", r"choux", r"meringues?", r"stuff(?:s|ed)?", r"roll(?:s|ed|ing)? out",
+    r"thermometer",
+]
+EASY_TECHNIQUES = [
+    r"mix(?:es|ed|ing)?", r"stir(?:s|red|ring)?", r"toss(?:es|ed|ing)?", r"serv(?:e|es|ed|ing)",
+    r"combin(?:e|es|ed|ing)", r"sprinkl(?:e|es|ed|ing)", r"pour(?:s|ed|ing)?",
+]
+HARD_TECHNIQUE_PATTERNS = [re.compile(rf"\b{technique}\b", flags=re.IGNORECASE) for technique in HARD_TECHNIQUES]
+EASY_TECHNIQUE_PATTERNS = [re.compile(rf"\b{technique}\b", flags=re.IGNORECASE) for technique in EASY_TECHNIQUES]
+
+DIFFICULTY_THRESHOLDS = [(2, "Very Easy"), (3.5, "Easy"), (5.5, "Medium"), (7.5, "Hard")]
+
+# Allowance for steps with no stated duration (chopping, mixing, plating...)
+UNTIMED_STEP_MINUTES = 3
+
+
+def _parse_number(text: str) -> Optional[float]:
+    text = text.strip().lower()
+    if text in WORD_NUMBERS:
+        return float(WORD_NUMBERS[text])
+    total = 0.0
+    for part in re.findall(r"\d+/\d+|\d+(?:\.\d+)?|[½¼¾]", text):
+        if "/" in part:
+            numerator, denominator = part.split("/")
+            total += float(numerator) / float(denominator)
+        elif part in "½¼¾":
+            total += {"½": 0.5, "¼": 0.25, "¾": 0.75}[part]
+        else:
+            total += float(part)
+    return total or None
+
+
+def split_steps(instructions: str) -> List[str]:
+    """Split instructions into sentences / numbered steps"""
+    steps = re.split(r'(?<=[.!?])\s+|\r?\n+|\bSTEP\s+\d+\b', instructions, flags=re.IGNORECASE)
+    return [step.strip() for step in steps if step and len(step.strip()) > 3]
+
+
+def step_durations(step: str) -> List[float]:
+    """All durations (in minutes) stated in one step; ranges use their midpoint"""
+    durations = [30.0 for _ in HALF_HOUR_PATTERN.finditer(step)]
+    # Blank out "half an hour" so "an hour" isn't counted again below
+    step = HALF_HOUR_PATTERN.sub(" ", step)
+    for match in DURATION_PATTERN.finditer(step):
+        low = _parse_number(match.group("low"))
+        if low is None:
+            continue
+        high = _parse_number(match.group("high")) if match.group("high") else None
+        value = (low + high) / 2 if high else low
+        durations.append(value * UNIT_MINUTES[match.group("unit").lower()])
+    durations.extend(float(OVERNIGHT_MINUTES) for _ in OVERNIGHT_PATTERN.finditer(step))
+    return durations
+
+
+class LocalTimeEstimator:
+    """Deterministic time and difficulty estimate from explicit durations in the instructions.
+
+    Returns a confidence in [0, 1] that reflects how much of the recipe's time is actually
+    stated; callers escalate to Gemini when it is low.
+    """
+    def estimate(self, instructions: str, ingredient_count: int = 0) -> Dict:
+        steps = split_steps(instructions or "")
+        if not steps:
+            return {
+                "total_estimated_time_minutes": 0,
+                "recipe_difficulty": "Unknown",
+                "confidence": 0.0
+            }
+
+        total = 0.0
+        timed_steps = 0
+        untimed_cues = 0
+        parallel_steps = 0
+        for step in steps:
+            durations = step_durations(step)
+            if durations:
+                timed_steps += 1
+                if PARALLEL_PATTERN.search(step):
+                    # Overlaps another step's time, so it doesn't extend the total
+                    parallel_steps += 1
+                else:
+                    total += sum(durations)
+            else:
+                total += UNTIMED_STEP_MINUTES
+                if UNTIMED_PATTERN.search(step):
+                    untimed_cues += 1
+
+        # Prep allowance for weighing/chopping ingredients
+        total += ingredient_count * 1.0
+
+        # Untimed prep steps are short, so a couple of stated cooking times already pin
+        # down most of the total; open-ended "until ..." steps are what make it uncertain
+        if timed_steps == 0:
+            confidence = 0.15
+        else:
+            confidence = 0.5 + 0.3 * (timed_steps / len(steps))
+            if timed_steps >= 2:
+                confidence += 0.1
+            confidence -= 0.1 * min(untimed_cues, 3)
+            confidence -= 0.05 * min(parallel_steps, 2)
+        confidence = max(0.0, min(1.0, confidence))
+
+        return {
+            "total_estimated_time_minutes": int(round(total)),
+            "recipe_difficulty": self.difficulty(instructions, steps, total),
+            "confidence": round(confidence, 2)
+        }
+
+    @staticmethod
+    def difficulty(instructions: str, steps: List[str], total_minutes: float) -> str:
+        points = len(steps) / 3
+        points += 1.5 * sum(1 for pattern in HARD_TECHNIQUE_PATTERNS if pattern.search(instructions))
+        points -= 0.25 * sum(1 for pattern in EASY_TECHNIQUE_PATTERNS if pattern.search(instructions))
+        if total_minutes > 180:
+            points += 2
+        elif total_minutes > 90:
+            points += 1
+        for threshold, level in DIFFICULTY_THRESHOLDS:
+            if points < threshold:
+                return level
+        return "Very Hard"
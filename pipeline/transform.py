@@ -1,23 +1,25 @@
 from typing import List, Dict
 
+def is_valid_row(row: Dict) -> bool:
+    """Check a single recipe for empty required fields or short instructions"""
+    # Check for any empty values in required fields
+    required_fields = ['name', 'category', 'area', 'instructions']
+    if any(not row.get(field) for field in required_fields):
+        return False
+    
+    # Check if instructions are too short (less than 20 characters)
+    if len(row.get('instructions', '')) < 20:
+        return False
+        
+    # Check if ingredients list is empty
+    if not row.get('ingredients'):
+        return False
+        
+    return True
+
 def clean_data(data: List[Dict]) -> List[Dict]:
     """Filter out rows with empty elements or short instructions"""
-    cleaned_data = []
-    for row in data:
-        # Check for any empty values in required fields
-        required_fields = ['name', 'category', 'area', 'instructions']
-        if any(not row.get(field) for field in required_fields):
-            continue
-        
-        # Check if instructions are too short (less than 20 characters)
-        if len(row.get('instructions', '')) < 20:
-            continue
-            
-        # Check if ingredients list is empty
-        if not row.get('ingredients'):
-            continue
-            
-        cleaned_data.append(row)
+    cleaned_data = [row for row in data if is_valid_row(row)]
     
     print(f"Filtered {len(data) - len(cleaned_data)} invalid rows")
     return cleaned_data
@@ -0,0 +1,78 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Overloaded(Exception):
+    """Raised when a request is shed instead of admitted"""
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Request shed ({reason})")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Caps concurrent expensive requests per process, with a bounded wait queue.
+
+    Up to max_concurrent requests run at once; up to max_queue more wait at most
+    queue_timeout seconds for a slot. Anything beyond that is shed immediately with
+    Overloaded, so waiting requests can never occupy every worker thread.
+    """
+    def __init__(self, max_concurrent: int = 3, max_queue: int = 3, queue_timeout: float = 2.0,
+                 retry_after: int = 1):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.active = 0
+        self.queued = 0
+        self.admitted = 0
+        self.shed = {"queue_full": 0, "queue_timeout": 0}
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            if self.active < self.max_concurrent and self.queued == 0:
+                self.active += 1
+                self.admitted += 1
+                return
+            if self.queued >= self.max_queue:
+                self.shed["queue_full"] += 1
+                raise Overloaded("queue_full", self.retry_after)
+
+            self.queued += 1
+            deadline = time.monotonic() + self.queue_timeout
+            try:
+                while self.active >= self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.shed["queue_timeout"] += 1
+                        raise Overloaded("queue_timeout", self.retry_after)
+                    self._cond.wait(remaining)
+            finally:
+                self.queued -= 1
+            self.active += 1
+            self.admitted += 1
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def slot(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "active": self.active,
+                "queued": self.queued,
+                "admitted": self.admitted,
+                "shed_queue_full": self.shed["queue_full"],
+                "shed_queue_timeout": self.shed["queue_timeout"]
+            }
@@ -0,0 +1,126 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+from serving.admission import Overloaded
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines: concurrent awaits of the same key share one execution"""
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self.executions = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]], timeout: Optional[float] = None) -> Any:
+        call = self._calls.get(key)
+        if call is not None:
+            self.shared += 1
+            # shield: a cancelled (or timed out) waiter must not cancel the leader's work
+            return await asyncio.wait_for(asyncio.shield(call), timeout)
+
+        call = self._calls[key] = asyncio.get_running_loop().create_future()
+        self.executions += 1
+        try:
+            result = await fn()
+            call.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            call.cancel()
+            raise
+        except BaseException as e:
+            call.set_exception(e)
+            # Mark the exception retrieved when nobody else was waiting for it
+            call.exception()
+            raise
+        finally:
+            del self._calls[key]
+
+    def stats(self) -> dict:
+        return {"executions": self.executions, "shared": self.shared, "in_flight": len(self._calls)}
+
+
+class AsyncAdmissionController:
+    """AdmissionController for coroutines: a concurrency cap with a bounded, timed wait queue"""
+    def __init__(self, max_concurrent: int = 64, max_queue: int = 256, queue_timeout: float = 2.0,
+                 retry_after: int = 1):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.active = 0
+        self.queued = 0
+        self.admitted = 0
+        self.shed = {"queue_full": 0, "queue_timeout": 0}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        if self._semaphore.locked():
+            if self.queued >= self.max_queue:
+                self.shed["queue_full"] += 1
+                raise Overloaded("queue_full", self.retry_after)
+            self.queued += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.shed["queue_timeout"] += 1
+                raise Overloaded("queue_timeout", self.retry_after)
+            finally:
+                self.queued -= 1
+        else:
+            await self._semaphore.acquire()
+        self.active += 1
+        self.admitted += 1
+        return self
+
+    async def __aexit__(self, *exc):
+        self.active -= 1
+        self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "shed_queue_full": self.shed["queue_full"],
+            "shed_queue_timeout": self.shed["queue_timeout"]
+        }
+
+
+async def hedged(fn: Callable[[], Awaitable[Any]], hedge_delay: float, timeout: float,
+                 on_result: Optional[Callable[[Optional[Any], float], None]] = None) -> Any:
+    """Await fn(), starting a second identical attempt if the first is still running after
+    hedge_delay. The first attempt to succeed wins and the other is cancelled. Raises
+    asyncio.TimeoutError when neither succeeds within timeout, or the last error."""
+    start = time.monotonic()
+    deadline = start + timeout
+    attempts = {asyncio.ensure_future(fn())}
+    hedge_pending = True
+    error: Optional[BaseException] = None
+    try:
+        while attempts:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            wake_at = min(start + hedge_delay, deadline) if hedge_pending else deadline
+            done, attempts = await asyncio.wait(attempts, timeout=max(0.0, wake_at - now),
+                                                return_when=asyncio.FIRST_COMPLETED)
+            for attempt in done:
+                if attempt.exception() is None and attempt.result() is not None:
+                    if on_result:
+                        on_result(attempt.result(), time.monotonic() - start)
+                    return attempt.result()
+                error = attempt.exception() or error
+            if hedge_pending and time.monotonic() >= start + hedge_delay and attempts:
+                hedge_pending = False
+                attempts.add(asyncio.ensure_future(fn()))
+    finally:
+        for attempt in attempts:
+            attempt.cancel()
+
+    if on_result:
+        on_result(None, time.monotonic() - start)
+    if error is not None:
+        raise error
+    raise asyncio.TimeoutError("Embedding request timed out")
@@ -0,0 +1,84 @@
+import argparse
+import asyncio
+import itertools
+import random
+import time
+from typing import Dict, List
+import httpx
+
+QUERIES = [
+    "chicken curry", "vegan stew", "chocolate cake", "spicy noodles", "grilled fish", "beef tacos",
+    "mushroom risotto", "lentil soup", "apple pie", "pad thai", "greek salad", "lamb tagine",
+    "pancakes", "fried rice", "tomato pasta", "shrimp scampi", "banana bread", "ramen", "falafel", "paella",
+]
+
+
+def percentile(samples: List[float], q: float) -> float:
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+async def run_load(url: str, concurrency: int, duration: float, unique: bool, page_ratio: float) -> Dict:
+    """Closed-loop load: `concurrency` clients each send the next request as soon as the last one returns"""
+    latencies = {"search": [], "page": []}
+    statuses: Dict[int, int] = {}
+    counter = itertools.count()
+    deadline = time.monotonic() + duration
+
+    async def client_loop(client: httpx.AsyncClient):
+        while time.monotonic() < deadline:
+            n = next(counter)
+            kind = "page" if random.random() < page_ratio else "search"
+            start = time.monotonic()
+            try:
+                if kind == "page":
+                    response = await client.get("/")
+                else:
+                    query = QUERIES[n % len(QUERIES)] + (f" {n}" if unique else "")
+                    response = await client.post("/search", json={"query": query})
+                status = response.status_code
+            except httpx.HTTPError:
+                status = 0
+            statuses[status] = statuses.get(status, 0) + 1
+            if status == 200:
+                latencies[kind].append(time.monotonic() - start)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=130, limits=limits) as client:
+        started = time.monotonic()
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+        elapsed = time.monotonic() - started
+
+    report = {"url": url, "requests": sum(statuses.values()), "statuses": statuses,
+              "throughput_rps": round(sum(len(v) for v in latencies.values()) / elapsed, 1)}
+    for kind, samples in latencies.items():
+        if samples:
+            report[kind] = {f"p{int(q * 100)}_ms": round(percentile(samples, q) * 1000, 1) for q in (0.5, 0.95, 0.99)}
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare search latency and throughput of deployments, e.g. app.py under gunicorn "
+                    "threads against asgi_app.py under uvicorn workers"
+    )
+    parser.add_argument("urls", nargs="+", help="Base URLs to benchmark, one after the other")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--unique", action="store_true", help="Make every query distinct to bypass result caches")
+    parser.add_argument("--page-ratio", type=float, default=0.2, help="Share of requests that load the homepage")
+    args = parser.parse_args()
+
+    for url in args.urls:
+        print(f"\n🚀 {url}: {args.concurrency} clients for {args.duration:.0f}s")
+        report = asyncio.run(run_load(url, args.concurrency, args.duration, args.unique, args.page_ratio))
+        print(f"📊 {report['requests']} requests, {report['throughput_rps']} ok/s, statuses {report['statuses']}")
+        for kind in ("search", "page"):
+            if kind in report:
+                print(f"   {kind}: {report[kind]}")
+
+
+if __name__ == "__main__":
+    main()
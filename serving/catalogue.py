@@ -0,0 +1,35 @@
+import logging
+import time
+from typing import Dict, Optional, Tuple
+from serving.ingredient_index import IngredientIndex, PROJECTION as INGREDIENT_INDEX_PROJECTION
+from serving.local_vectors import LocalVectorStore
+
+# Field of the catalogue's meta document naming the collection searches read (set by the pipeline on promote)
+ACTIVE_COLLECTION_FIELD = "active_collection"
+
+
+def active_collection_name(meta_doc: Optional[Dict], default: str) -> str:
+    """Collection the catalogue alias points at; catalogues loaded before blue/green uploads live in `default`"""
+    return (meta_doc or {}).get(ACTIVE_COLLECTION_FIELD) or default
+
+
+def build_memory_indexes(collection, with_vectors: bool) -> Tuple[Optional[IngredientIndex],
+                                                                  Optional[LocalVectorStore]]:
+    """In-process indexes over one catalogue collection; an index that fails to build is None"""
+    ingredient_index = local_vectors = None
+    try:
+        start = time.perf_counter()
+        ingredient_index = IngredientIndex.build(collection.find({}, INGREDIENT_INDEX_PROJECTION))
+        print(f"✅ Ingredient index built: {len(ingredient_index)} recipes, "
+              f"{len(ingredient_index.ingredient_ids)} ingredients in {time.perf_counter() - start:.2f}s")
+    except Exception as e:
+        logging.error(f"❌ Ingredient index build failed: {str(e)}")
+
+    if with_vectors:
+        try:
+            start = time.perf_counter()
+            local_vectors = LocalVectorStore.load(collection)
+            print(f"✅ Local vector store loaded: {len(local_vectors)} recipes in {time.perf_counter() - start:.2f}s")
+        except Exception as e:
+            logging.error(f"❌ Local vector store load failed, using Atlas: {str(e)}")
+    return ingredient_index, local_vectors
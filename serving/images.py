@@ -0,0 +1,33 @@
+import base64
+import binascii
+from io import BytesIO
+from typing import Optional
+from PIL import Image as PILImage
+
+
+class InvalidImageError(ValueError):
+    """Raised for an uploaded query image that is not a readable base64 data:image URL"""
+
+
+def decode_data_url(image: Optional[str]) -> Optional[bytes]:
+    """Raw bytes of an uploaded data:image/...;base64 URL, or None when no image was given.
+
+    Runs before any embedding call, so a bad upload is the client's error and never
+    counts against the embedding circuit breaker.
+    """
+    if not image:
+        return None
+    if not isinstance(image, str) or not image.startswith('data:image'):
+        raise InvalidImageError("Image must be a data:image URL")
+    _, separator, encoded = image.partition(",")
+    if not separator:
+        raise InvalidImageError("Image data URL has no data")
+    try:
+        data = base64.b64decode(encoded)
+    except (binascii.Error, ValueError) as e:
+        raise InvalidImageError(f"Image data is not valid base64: {str(e)}") from e
+    try:
+        PILImage.open(BytesIO(data)).verify()
+    except Exception as e:
+        raise InvalidImageError("Image data is not a readable image") from e
+    return data
@@ -0,0 +1,156 @@
+import heapq
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+from pipeline.canonicalize import IngredientCanonicalizer, ingredient_id
+from pipeline.measures import normalize_food_name
+
+# Fields copied into the index so results need no database round trip
+SUMMARY_FIELDS = ["name", "category", "area", "img_url", "health_score"]
+PROJECTION = {field: 1 for field in SUMMARY_FIELDS + ["ingredients", "ingredient_ids"]}
+
+# Assumed to be in every kitchen unless the caller says otherwise
+PANTRY_STAPLES = ["salt", "black pepper", "pepper", "water", "olive oil", "vegetable oil"]
+# "chicken" should also match "chicken breast", but not "chicken stock"
+CUT_WORDS = {"breast", "thigh", "leg", "wing", "drumstick", "fillet", "mince", "steak", "loin", "chop", "shoulder"}
+
+
+def popcount(bits: int) -> int:
+    return bin(bits).count("1")
+
+def iter_bits(bits: int) -> Iterable[int]:
+    """Positions of the set bits, lowest first"""
+    while bits:
+        lowest = bits & -bits
+        yield lowest.bit_length() - 1
+        bits ^= lowest
+
+
+class IngredientIndex:
+    """In-memory "cook with what I have" index.
+
+    Each canonical ingredient maps to a bitset of recipe rows (Python ints), and each
+    recipe keeps a bitset of its ingredients. A query ORs the postings of the ingredients
+    on hand to find candidates, then scores each candidate with one AND and a popcount:
+    covered = |recipe & have|, missing = |recipe| - covered.
+    """
+    def __init__(self, canonicalizer: IngredientCanonicalizer = None):
+        self.canonicalizer = canonicalizer or IngredientCanonicalizer()
+        self.ingredient_bits: Dict[str, int] = {}
+        self.ingredient_ids: List[str] = []
+        self.postings: List[int] = []
+        self.recipe_masks: List[int] = []
+        self.recipe_sizes: List[int] = []
+        self.recipes: List[Dict] = []
+        self.by_last_token: Dict[str, List[int]] = {}
+        self.by_first_token: Dict[str, List[int]] = {}
+        self.staples_mask = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, docs: Iterable[Dict]) -> "IngredientIndex":
+        """Build from recipe documents, using ingredient_ids when the pipeline stored them"""
+        index = cls()
+        for doc in docs:
+            index.add_recipe(doc)
+        index.staples_mask = index.query_mask(PANTRY_STAPLES)[0]
+        return index
+
+    def _ingredient_bit(self, canonical: str) -> int:
+        bit = self.ingredient_bits.get(canonical)
+        if bit is None:
+            bit = len(self.ingredient_ids)
+            self.ingredient_bits[canonical] = bit
+            self.ingredient_ids.append(canonical)
+            self.postings.append(0)
+            tokens = canonical.split("-")
+            self.by_last_token.setdefault(tokens[-1], []).append(bit)
+            self.by_first_token.setdefault(tokens[0], []).append(bit)
+        return bit
+
+    def add_recipe(self, doc: Dict):
+        ids = doc.get("ingredient_ids")
+        if ids:
+            for canonical in ids:
+                self.canonicalizer.add(canonical.replace("-", " "))
+        else:
+            ids = [self.canonicalizer.parse(ingredient)["ingredient_id"] for ingredient in doc.get("ingredients") or []]
+        ids = [canonical for canonical in dict.fromkeys(ids) if canonical]
+        if not ids:
+            return
+
+        with self._lock:
+            row = len(self.recipes)
+            mask = 0
+            for canonical in ids:
+                bit = self._ingredient_bit(canonical)
+                mask |= 1 << bit
+                self.postings[bit] |= 1 << row
+            self.recipe_masks.append(mask)
+            self.recipe_sizes.append(len(ids))
+            summary = {field: doc.get(field) for field in SUMMARY_FIELDS}
+            summary["_id"] = str(doc.get("_id"))
+            self.recipes.append(summary)
+
+    def _expand(self, canonical: str) -> List[int]:
+        """Bits of the ingredient and its more specific variants ("rice" -> "basmati-rice")"""
+        tokens = canonical.split("-")
+        bits = []
+        for bit in self.by_last_token.get(tokens[-1], []):
+            if self.ingredient_ids[bit].split("-")[-len(tokens):] == tokens:
+                bits.append(bit)
+        for bit in self.by_first_token.get(tokens[0], []):
+            other = self.ingredient_ids[bit].split("-")
+            if other[:len(tokens)] == tokens and len(other) == len(tokens) + 1 and other[-1] in CUT_WORDS:
+                bits.append(bit)
+        return bits
+
+    def query_mask(self, ingredients: List[str]) -> Tuple[int, List[str]]:
+        """Ingredient bitset for the names given, plus the names that matched nothing"""
+        mask = 0
+        unknown = []
+        for name in ingredients:
+            normalized = normalize_food_name(name)
+            bits = self._expand(ingredient_id(normalized)) if normalized else []
+            if not bits:
+                # Typos and names with extra words go through the canonicalizer's trie/fuzzy match
+                canonical = self.canonicalizer.canonical_id(name, add_missing=False)
+                bits = self._expand(canonical) if canonical else []
+            if not bits:
+                unknown.append(name)
+            for bit in bits:
+                mask |= 1 << bit
+        return mask, unknown
+
+    def search(self, ingredients: List[str], k: int = 10, max_missing: Optional[int] = None,
+               assume_staples: bool = True) -> Dict:
+        """Recipes ranked by the share of their ingredients on hand, then by fewest missing"""
+        have, unknown = self.query_mask(ingredients)
+        candidates = 0
+        for bit in iter_bits(have):
+            candidates |= self.postings[bit]
+        if assume_staples:
+            have |= self.staples_mask
+
+        scored = []
+        for row in iter_bits(candidates):
+            covered = popcount(self.recipe_masks[row] & have)
+            missing = self.recipe_sizes[row] - covered
+            if max_missing is not None and missing > max_missing:
+                continue
+            scored.append((-covered / self.recipe_sizes[row], missing, row))
+
+        results = []
+        for neg_coverage, missing, row in heapq.nsmallest(k, scored):
+            missing_ids = [self.ingredient_ids[bit] for bit in iter_bits(self.recipe_masks[row] & ~have)]
+            results.append({
+                **self.recipes[row],
+                "coverage": round(-neg_coverage, 3),
+                "matched": self.recipe_sizes[row] - missing,
+                "missing": missing,
+                "missing_ingredients": [canonical.replace("-", " ") for canonical in missing_ids],
+            })
+        return {"results": results, "unknown_ingredients": unknown}
+
+    def __len__(self):
+        return len(self.recipes)
+
@@ -0,0 +1,102 @@
+from typing import Dict, List, Optional
+import numpy as np
+from serving.ranking import FILTER_FIELDS, RESULT_PROJECTION, VECTOR_INDEXES, matches_filter
+
+
+def _get_path(doc: Dict, path: str):
+    for part in path.split("."):
+        if not isinstance(doc, dict):
+            return None
+        doc = doc.get(part)
+    return doc
+
+
+class LocalVectorStore:
+    """Recipe embeddings held in memory as normalized matrices, for exact cosine search.
+
+    Scores are mapped to (1 + cosine) / 2, the same scale Atlas reports for cosine
+    vector indexes, so results fuse and filter exactly like $vectorSearch ones.
+    """
+    def __init__(self):
+        self.docs: List[Dict] = []
+        self.filter_values: List[Dict] = []
+        self.rows: Dict[str, int] = {}
+        self.matrices: Dict[str, np.ndarray] = {}
+        self.present: Dict[str, np.ndarray] = {}
+
+    @classmethod
+    def load(cls, collection) -> "LocalVectorStore":
+        store = cls()
+        fields = list(VECTOR_INDEXES)
+        vectors = {field: [] for field in fields}
+        filter_paths = sorted(set(FILTER_FIELDS.values()))
+        projection = {**RESULT_PROJECTION, **{field: 1 for field in fields}, **{path: 1 for path in filter_paths}}
+        for doc in collection.find({}, projection):
+            store.rows[str(doc["_id"])] = len(store.docs)
+            for field in fields:
+                vectors[field].append(doc.pop(field, None))
+            store.filter_values.append({path: _get_path(doc, path) for path in filter_paths})
+            store.docs.append({key: doc[key] for key in RESULT_PROJECTION if key in doc})
+
+        for field in fields:
+            dimension = next((len(v) for v in vectors[field] if v), 0)
+            matrix = np.zeros((len(store.docs), dimension), dtype=np.float32)
+            present = np.zeros(len(store.docs), dtype=bool)
+            for row, vector in enumerate(vectors[field]):
+                if vector and len(vector) == dimension:
+                    matrix[row] = vector
+                    present[row] = True
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            store.matrices[field] = matrix / np.where(norms > 0, norms, 1.0)
+            store.present[field] = present
+        return store
+
+    def vectors(self, recipe_id: str) -> Optional[Dict]:
+        """Stored (normalized) embeddings of one recipe, or None if it isn't loaded"""
+        row = self.rows.get(str(recipe_id))
+        if row is None:
+            return None
+        return {
+            field: self.matrices[field][row] if self.present[field][row] else None
+            for field in VECTOR_INDEXES
+        }
+
+    def _normalize(self, vectors) -> np.ndarray:
+        queries = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        return queries / np.where(norms > 0, norms, 1.0)
+
+    def filter_mask(self, search_filter: Optional[Dict]) -> np.ndarray:
+        """Rows matching a build_search_filter() filter"""
+        return np.fromiter((matches_filter(values, search_filter) for values in self.filter_values),
+                           dtype=bool, count=len(self.filter_values))
+
+    def search_many(self, field: str, query_vectors, limit: int,
+                    search_filter: Optional[Dict] = None) -> List[List[Dict]]:
+        """Top `limit` results for each query vector, from one matrix-matrix product"""
+        matrix = self.matrices.get(field)
+        if matrix is None or not len(matrix) or not len(query_vectors):
+            return [[] for _ in range(len(query_vectors))]
+
+        cosine = self._normalize(query_vectors) @ matrix.T
+        cosine[:, ~self.present[field]] = -np.inf
+        if search_filter:
+            cosine[:, ~self.filter_mask(search_filter)] = -np.inf
+        limit = min(limit, len(matrix))
+        top = np.argpartition(-cosine, limit - 1, axis=1)[:, :limit]
+        _, score_field = VECTOR_INDEXES[field]
+
+        results = []
+        for query_row, candidates in enumerate(top):
+            candidates = candidates[np.argsort(-cosine[query_row, candidates])]
+            results.append([
+                {**self.docs[row], score_field: float((1 + cosine[query_row, row]) / 2)}
+                for row in candidates if np.isfinite(cosine[query_row, row])
+            ])
+        return results
+
+    def search(self, field: str, query_vector, limit: int, search_filter: Optional[Dict] = None) -> List[Dict]:
+        return self.search_many(field, [query_vector], limit, search_filter)[0]
+
+    def __len__(self):
+        return len(self.docs)
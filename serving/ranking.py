@@ -0,0 +1,298 @@
+import hashlib
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional, Tuple
+
+RESULT_PROJECTION = {"_id": 1, "name": 1, "category": 1, "area": 1, "img_url": 1, "health_score": 1}
+
+# Embedding field -> (Atlas vector index, score field in results)
+VECTOR_INDEXES = {
+    "image_embedding": ("recipe_img_vector_index", "img_score"),
+    "text_embedding": ("recipe_text_vector_index", "text_score"),
+}
+
+# Filter name -> document path; every path must be declared as a filter field in both vector indexes
+FILTER_FIELDS = {
+    "category": "category",
+    "area": "area",
+    "difficulty": "time_analysis.recipe_difficulty",
+    "min_health_score": "health_score",
+    "max_total_time": "time_analysis.total_estimated_time_minutes",
+}
+
+class PartialResults(list):
+    """Results missing a vector leg that failed or timed out: fine to show once, never to cache"""
+
+MIN_COMBINED_SCORE = 0.25
+MIN_COMPONENT_SCORE = 0.15
+
+# Shared by every request so the image and text legs of a search run side by side
+search_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="vector-search")
+
+
+def normalize_weights(image_weight: float, text_weight: float) -> Tuple[float, float]:
+    total_weight = image_weight + text_weight
+    if total_weight <= 0:
+        raise ValueError("Weights must sum to a positive value")
+    return image_weight / total_weight, text_weight / total_weight
+
+def is_valid_result(result, image_weight, text_weight):
+    """Determine if a search result meets quality thresholds"""
+    if result.get('combined_score', 0) < MIN_COMBINED_SCORE:
+        return False
+
+    if image_weight > 0 and 'img_score' in result and result['img_score'] < MIN_COMPONENT_SCORE:
+        return False
+
+    if text_weight > 0 and 'text_score' in result and result['text_score'] < MIN_COMPONENT_SCORE:
+        return False
+
+    return True
+
+def build_search_filter(filters: Optional[Dict]) -> Optional[Dict]:
+    """$vectorSearch pre-filter for structured search filters, or None when there are none.
+
+    category, area and difficulty take a value or a list of values; min_health_score and
+    max_total_time take numbers. Raises ValueError for unknown filters or bad values.
+    """
+    if not filters:
+        return None
+    if not isinstance(filters, dict):
+        raise ValueError("filters must be an object")
+    unknown = set(filters) - set(FILTER_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown filters: {', '.join(sorted(unknown))}")
+
+    clauses = []
+    for name in ("category", "area", "difficulty"):
+        values = filters.get(name)
+        values = [values] if isinstance(values, str) else (values or [])
+        values = sorted({v.strip() for v in values if isinstance(v, str) and v.strip()})
+        if len(values) == 1:
+            clauses.append({FILTER_FIELDS[name]: {"$eq": values[0]}})
+        elif values:
+            clauses.append({FILTER_FIELDS[name]: {"$in": values}})
+    for name, operator in (("min_health_score", "$gte"), ("max_total_time", "$lte")):
+        if filters.get(name) not in (None, ""):
+            clauses.append({FILTER_FIELDS[name]: {operator: float(filters[name])}})
+
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+def filters_from_params(params) -> Dict:
+    """Filters from URL query parameters (Flask or Starlette); repeat a parameter for several values"""
+    filters = {name: params.getlist(name) for name in ("category", "area", "difficulty") if params.getlist(name)}
+    filters.update({name: params.get(name) for name in ("min_health_score", "max_total_time") if params.get(name)})
+    return filters
+
+def matches_filter(values: Dict, search_filter: Optional[Dict]) -> bool:
+    """Evaluate a build_search_filter() filter against a {path: value} dict, for in-process search"""
+    if not search_filter:
+        return True
+    if "$and" in search_filter:
+        return all(matches_filter(values, clause) for clause in search_filter["$and"])
+    for path, condition in search_filter.items():
+        value = values.get(path)
+        for operator, operand in condition.items():
+            if operator == "$eq" and value != operand:
+                return False
+            if operator == "$in" and value not in operand:
+                return False
+            if operator in ("$gte", "$lte"):
+                if not isinstance(value, (int, float)):
+                    return False
+                if (value < operand) if operator == "$gte" else (value > operand):
+                    return False
+    return True
+
+def vector_search_pipeline(field: str, query_vector: List[float], limit: int, num_candidates: int = 100,
+                           search_filter: Optional[Dict] = None) -> List[Dict]:
+    index, score_field = VECTOR_INDEXES[field]
+    stage = {
+        "index": index,
+        "path": field,
+        "queryVector": query_vector,
+        "numCandidates": max(num_candidates, limit),
+        "limit": limit
+    }
+    if search_filter:
+        stage["filter"] = search_filter
+    return [
+        {
+            "$vectorSearch": stage
+        },
+        {
+            "$project": {
+                **RESULT_PROJECTION,
+                score_field: {"$meta": "vectorSearchScore"}
+            }
+        }
+    ]
+
+def atlas_vector_search(collection, field: str, query_vector: List[float], limit: int,
+                        max_time_ms: Optional[int] = None, search_filter: Optional[Dict] = None) -> List[Dict]:
+    """One $vectorSearch leg; failures (and timeouts) are logged and return an empty PartialResults"""
+    try:
+        options = {"maxTimeMS": max_time_ms} if max_time_ms else {}
+        pipeline = vector_search_pipeline(field, query_vector, limit, search_filter=search_filter)
+        return list(collection.aggregate(pipeline, **options))
+    except Exception as e:
+        logging.error(f"{field} vector search failed: {str(e)}")
+        return PartialResults()
+
+def fuse_results(result_lists: List[List[Dict]], image_weight: float, text_weight: float, k: int,
+                 exclude_id: Optional[str] = None) -> List[Dict]:
+    """Merge per-leg results by _id, combine the weighted scores and keep the top k valid ones.
+
+    The fused list is a PartialResults when any leg was.
+    """
+    merged = {}
+    for results in result_lists:
+        for doc in results:
+            doc_id = str(doc["_id"])
+            if doc_id == exclude_id:
+                continue
+            if doc_id in merged:
+                # Merge scores for documents found in both searches
+                for score_field in ("img_score", "text_score"):
+                    if score_field in doc:
+                        merged[doc_id][score_field] = doc[score_field]
+            else:
+                merged[doc_id] = dict(doc)
+
+    ranked_results = list(merged.values())
+    for doc in ranked_results:
+        doc["combined_score"] = (image_weight * doc.get("img_score", 0)) + (text_weight * doc.get("text_score", 0))
+    ranked_results.sort(key=lambda x: x["combined_score"], reverse=True)
+
+    valid_results = [r for r in ranked_results if is_valid_result(r, image_weight, text_weight)]
+    if any(isinstance(results, PartialResults) for results in result_lists):
+        return PartialResults(valid_results[:k])
+    return valid_results[:k]
+
+def vector_search(collection, embeddings: Dict, k: int = 5, image_weight: float = 0.5, text_weight: float = 0.5,
+                  exclude_id: Optional[str] = None, local_store=None, max_time_ms: Optional[int] = None,
+                  search_filter: Optional[Dict] = None) -> List[Dict]:
+    """Hybrid ranking over the image and text vector indexes for already computed query vectors.
+
+    Uses the in-process LocalVectorStore when one is given, otherwise runs the
+    $vectorSearch legs against Atlas concurrently. search_filter (from build_search_filter)
+    is applied before ranking, so every candidate already satisfies it.
+    """
+    image_weight, text_weight = normalize_weights(image_weight, text_weight)
+    # Extra candidates for filtering (and for dropping the query recipe itself)
+    limit = k * 3 + (1 if exclude_id else 0)
+
+    legs = [(field, embeddings[field]) for field in VECTOR_INDEXES
+            if embeddings.get(field) is not None and len(embeddings[field])]
+    if local_store is not None:
+        result_lists = [local_store.search(field, vector, limit, search_filter) for field, vector in legs]
+    else:
+        futures = [search_pool.submit(atlas_vector_search, collection, field, vector, limit, max_time_ms,
+                                      search_filter)
+                   for field, vector in legs]
+        result_lists = [future.result() for future in futures]
+
+    return fuse_results(result_lists, image_weight, text_weight, k, exclude_id=exclude_id)
+
+def leg_weights(field: str) -> Tuple[float, float]:
+    """(image_weight, text_weight) that rank results by one leg's score alone"""
+    return (1.0, 0.0) if field == "image_embedding" else (0.0, 1.0)
+
+def vector_search_stream(collection, embeddings: Dict, k: int = 5, image_weight: float = 0.5,
+                         text_weight: float = 0.5, local_store=None, max_time_ms: Optional[int] = None,
+                         search_filter: Optional[Dict] = None) -> Iterator[Tuple[str, List[Dict]]]:
+    """vector_search that doesn't wait for the slower leg before showing something.
+
+    With both legs, yields ("provisional", results) ranked by whichever leg finishes first,
+    then always ("final", results) fused exactly as vector_search does.
+    """
+    image_weight, text_weight = normalize_weights(image_weight, text_weight)
+    limit = k * 3
+    legs = [(field, embeddings[field]) for field in VECTOR_INDEXES
+            if embeddings.get(field) is not None and len(embeddings[field])]
+    if local_store is not None:
+        futures = {search_pool.submit(local_store.search, field, vector, limit, search_filter): field
+                   for field, vector in legs}
+    else:
+        futures = {search_pool.submit(atlas_vector_search, collection, field, vector, limit, max_time_ms,
+                                      search_filter): field
+                   for field, vector in legs}
+
+    result_lists = []
+    for future in as_completed(futures):
+        result_lists.append(future.result())
+        if len(result_lists) == 1 and len(futures) > 1:
+            yield "provisional", fuse_results(result_lists, *leg_weights(futures[future]), k)
+    yield "final", fuse_results(result_lists, image_weight, text_weight, k)
+
+def batch_vector_search(collection, queries: List[Dict], k: int = 5, local_store=None) -> List[List[Dict]]:
+    """vector_search for many queries at once.
+
+    Each query is a dict with the embeddings and its image_weight / text_weight. All legs
+    of all queries run concurrently against Atlas, or as one matrix-matrix product per
+    embedding field with a LocalVectorStore.
+    """
+    limit = k * 3
+    legs = [
+        (position, field, query[field])
+        for position, query in enumerate(queries)
+        for field in VECTOR_INDEXES
+        if query.get(field) is not None and len(query[field])
+    ]
+
+    result_lists: List[List[List[Dict]]] = [[] for _ in queries]
+    if local_store is not None:
+        for field in VECTOR_INDEXES:
+            field_legs = [(position, vector) for position, leg_field, vector in legs if leg_field == field]
+            if not field_legs:
+                continue
+            matches = local_store.search_many(field, [vector for _, vector in field_legs], limit)
+            for (position, _), results in zip(field_legs, matches):
+                result_lists[position].append(results)
+    else:
+        futures = [(position, search_pool.submit(atlas_vector_search, collection, field, vector, limit))
+                   for position, field, vector in legs]
+        for position, future in futures:
+            result_lists[position].append(future.result())
+
+    fused = []
+    for query, results in zip(queries, result_lists):
+        image_weight, text_weight = normalize_weights(query["image_weight"], query["text_weight"])
+        fused.append(fuse_results(results, image_weight, text_weight, k))
+    return fused
+
+def more_like_this(recipe: Dict, k: int = 6, image_weight: float = 0.5, text_weight: float = 0.5) -> List[str]:
+    """Fuse the precomputed image and text neighbours of a recipe into one ranked meal_id list"""
+    scores = {}
+    for field, weight in (("similar_by_image", image_weight), ("similar_by_text", text_weight)):
+        for neighbor in recipe.get(field) or []:
+            scores[neighbor["meal_id"]] = scores.get(neighbor["meal_id"], 0) + weight * neighbor["score"]
+    return sorted(scores, key=scores.get, reverse=True)[:k]
+
+def lexical_search(collection, text: str, k: int = 5, max_time_ms: Optional[int] = None,
+                   search_filter: Optional[Dict] = None) -> List[Dict]:
+    """$text search on recipe names, the fallback while query embeddings are unavailable"""
+    cursor = collection.find(
+        {"$text": {"$search": text}, **(search_filter or {})},
+        {**RESULT_PROJECTION, "lexical_score": {"$meta": "textScore"}}
+    ).sort([("lexical_score", {"$meta": "textScore"})]).limit(k)
+    if max_time_ms:
+        cursor = cursor.max_time_ms(max_time_ms)
+    return list(cursor)
+
+def normalize_query(text: Optional[str]) -> str:
+    """Case- and whitespace-insensitive form of a text query"""
+    return " ".join((text or "").lower().split())
+
+def search_signature(text: Optional[str], image: Optional[str], image_weight: float, text_weight: float,
+                     k: int, search_filter: Optional[Dict] = None) -> str:
+    """Stable key for a search: normalized query, image digest, weights, k and filter"""
+    image_digest = hashlib.sha256(image.encode("utf-8")).hexdigest() if image else ""
+    filter_key = json.dumps(search_filter, sort_keys=True) if search_filter else ""
+    return hashlib.sha256(
+        f"{normalize_query(text)}\x00{image_digest}\x00{image_weight:.4f}\x00{text_weight:.4f}\x00{k}"
+        f"\x00{filter_key}".encode("utf-8")
+    ).hexdigest()
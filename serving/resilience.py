@@ -0,0 +1,134 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+from typing import Callable, List, Optional
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit breaker is open"""
+
+
+class EmbeddingUnavailableError(Exception):
+    """Raised when the embedding call failed or returned no usable embedding"""
+
+
+class LatencyTracker:
+    """Recent call latencies (seconds) in a fixed-size window, for percentile estimates"""
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float, default: Optional[float] = None, min_samples: int = 20) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < min_samples:
+            return default
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker.
+
+    Opens after failure_threshold failures in a row (slow calls count as failures),
+    rejects calls for reset_seconds, then lets a single trial call through; its outcome
+    closes the breaker again or re-opens it.
+    """
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, slow_call_seconds: float = 5.0, reset_seconds: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = self.HALF_OPEN
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record(self, success: bool, seconds: float = 0.0):
+        success = success and seconds <= self.slow_call_seconds
+        with self._lock:
+            self._trial_in_flight = False
+            if success:
+                self.consecutive_failures = 0
+                self.state = self.CLOSED
+                return
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self.consecutive_failures, "rejected": self.rejected}
+
+
+def hedged_map(pool, fn: Callable, args_list: List[tuple], hedge_delay: float, timeout: float,
+               on_result: Optional[Callable[[Optional[object], float], None]] = None) -> List:
+    """fn(*args) for every args tuple on pool, with one hedged retry for slow calls.
+
+    Calls still running after hedge_delay get a second, identical attempt and whichever
+    finishes first with a non-None result wins. Calls without a result by the timeout
+    (or whose attempts all returned None) yield None. on_result(result, seconds) is
+    called once per item with its final outcome.
+    """
+    start = time.monotonic()
+    deadline = start + timeout
+    hedge_at = start + hedge_delay
+    results = [None] * len(args_list)
+    attempts = {pool.submit(fn, *args): position for position, args in enumerate(args_list)}
+    running = {position: 1 for position in range(len(args_list))}
+    hedged = set()
+
+    while running:
+        now = time.monotonic()
+        if now >= deadline:
+            break
+        if now >= hedge_at:
+            for position in list(running):
+                if position not in hedged:
+                    hedged.add(position)
+                    running[position] += 1
+                    attempts[pool.submit(fn, *args_list[position])] = position
+        wake_at = hedge_at if now < hedge_at else deadline
+        pending = [future for future, position in attempts.items() if position in running]
+        done, _ = wait(pending, timeout=max(0.0, wake_at - now), return_when=FIRST_COMPLETED)
+
+        for future in done:
+            position = attempts.pop(future)
+            if position not in running:
+                continue
+            result = future.result() if future.exception() is None else None
+            if result is not None:
+                results[position] = result
+                del running[position]
+                if on_result:
+                    on_result(result, time.monotonic() - start)
+            else:
+                running[position] -= 1
+                if running[position] == 0:
+                    del running[position]
+                    if on_result:
+                        on_result(None, time.monotonic() - start)
+
+    for position in running:
+        if on_result:
+            on_result(None, time.monotonic() - start)
+    return results
@@ -0,0 +1,119 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+from bson import json_util
+
+try:
+    import redis
+except ImportError:  # the shared tier is optional
+    redis = None
+
+
+class LRUCache:
+    """Thread-safe in-process LRU with a per-entry TTL"""
+    def __init__(self, max_entries: int = 2048, ttl_seconds: float = 300):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class ResultCache:
+    """Two-level cache for search results: a per-process LRU in front of an optional shared
+    Redis-protocol tier that every worker and instance reads and writes.
+
+    Values go to the shared tier as extended JSON so ObjectIds survive the round trip.
+    Shared-tier errors are logged and treated as misses; after one, the tier is skipped
+    for retry_after seconds so an unreachable server does not add latency to every search.
+    Callers must treat cached values as read-only, since local hits return the same object.
+    """
+    def __init__(self, max_entries: int = 2048, ttl_seconds: float = 300, shared=None,
+                 prefix: str = "recipe-search", retry_after: float = 30.0):
+        self.local = LRUCache(max_entries, ttl_seconds)
+        self.shared = shared
+        self.ttl = ttl_seconds
+        self.prefix = prefix
+        self.retry_after = retry_after
+        self._shared_down_until = 0.0
+        self.hits = {"local": 0, "shared": 0}
+        self.misses = 0
+
+    @classmethod
+    def from_url(cls, redis_url: Optional[str], **kwargs) -> "ResultCache":
+        """Local-only cache unless redis_url is set (any Redis-protocol server works)"""
+        shared = None
+        if redis_url:
+            if redis is None:
+                logging.warning("REDIS_URL is set but the redis package is not installed; using the local cache only")
+            else:
+                shared = redis.Redis.from_url(redis_url, socket_timeout=0.1, socket_connect_timeout=0.1)
+        return cls(shared=shared, **kwargs)
+
+    def _shared_available(self) -> bool:
+        return self.shared is not None and time.monotonic() >= self._shared_down_until
+
+    def _shared_failed(self, e: Exception):
+        logging.warning(f"Shared result cache unavailable: {str(e)}")
+        self._shared_down_until = time.monotonic() + self.retry_after
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.local.get(key)
+        if value is not None:
+            self.hits["local"] += 1
+            return value
+
+        if self._shared_available():
+            try:
+                raw = self.shared.get(f"{self.prefix}:{key}")
+            except Exception as e:
+                self._shared_failed(e)
+                raw = None
+            if raw is not None:
+                value = json_util.loads(raw)
+                self.local.set(key, value)
+                self.hits["shared"] += 1
+                return value
+
+        self.misses += 1
+        return None
+
+    def set(self, key: str, value: Any):
+        self.local.set(key, value)
+        if self._shared_available():
+            try:
+                self.shared.set(f"{self.prefix}:{key}", json_util.dumps(value), ex=max(1, int(self.ttl)))
+            except Exception as e:
+                self._shared_failed(e)
+
+    def stats(self) -> dict:
+        return {
+            "local_entries": len(self.local),
+            "local_hits": self.hits["local"],
+            "shared_hits": self.hits["shared"],
+            "misses": self.misses,
+            "shared_enabled": self.shared is not None
+        }
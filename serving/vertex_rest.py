@@ -0,0 +1,62 @@
+import asyncio
+import base64
+import datetime
+from typing import Dict, Optional
+import google.auth
+import google.auth.transport.requests
+import httpx
+
+MODEL = "multimodalembedding@001"
+
+
+class AsyncMultimodalEmbedder:
+    """Non-blocking client for the Vertex AI multimodal embedding model.
+
+    The SDK's MultiModalEmbeddingModel only has a blocking call, so this posts to the
+    model's REST :predict endpoint over a shared httpx.AsyncClient instead. Credentials
+    come from Application Default Credentials and are refreshed off the event loop.
+    """
+    def __init__(self, project: str, region: str, dimension: int = 512, timeout: float = 30.0,
+                 max_connections: int = 100):
+        self.dimension = dimension
+        self.url = (f"https://{region}-aiplatform.googleapis.com/v1/projects/{project}/locations/{region}"
+                    f"/publishers/google/models/{MODEL}:predict")
+        self.credentials, _ = google.auth.default(scopes=["https://www.googleapis.com/auth/cloud-platform"])
+        self.client = httpx.AsyncClient(timeout=timeout, limits=httpx.Limits(max_connections=max_connections))
+        self._refresh_lock = asyncio.Lock()
+
+    def _expiring(self) -> bool:
+        expiry = self.credentials.expiry  # naive UTC
+        return not self.credentials.valid or (
+            expiry is not None and (expiry - datetime.datetime.utcnow()).total_seconds() < 60
+        )
+
+    async def _token(self) -> str:
+        if self._expiring():
+            async with self._refresh_lock:
+                if self._expiring():
+                    await asyncio.to_thread(self.credentials.refresh, google.auth.transport.requests.Request())
+        return self.credentials.token
+
+    async def embed(self, image: Optional[bytes] = None, text: Optional[str] = None) -> Dict:
+        """Embeddings for decoded image bytes and/or text, in the shape app.embed_query returns"""
+        instance = {}
+        if image:
+            instance["image"] = {"bytesBase64Encoded": base64.b64encode(image).decode("ascii")}
+        if text:
+            instance["text"] = text
+
+        response = await self.client.post(
+            self.url,
+            headers={"Authorization": f"Bearer {await self._token()}"},
+            json={"instances": [instance], "parameters": {"dimension": self.dimension}}
+        )
+        response.raise_for_status()
+        prediction = response.json()["predictions"][0]
+        return {
+            "image_embedding": prediction.get("imageEmbedding") if image else None,
+            "text_embedding": prediction.get("textEmbedding") if text else None
+        }
+
+    async def close(self):
+        await self.client.aclose()
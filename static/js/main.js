@@ -177,7 +177,7 @@ document.addEventListener('DOMContentLoaded', function() {
         updateSearchButtonState();
     };
 
-    const displaySearchResults = (results) => {
+    const displaySearchResults = (results, provisional = false) => {
         const searchResults = document.getElementById('search-results');
         if (!searchResults) return;
         
@@ -187,6 +187,12 @@ document.addEventListener('DOMContentLoaded', function() {
                     No recipes found. Try a different search term or image.
                 </div>
             </div>`;
+        if (provisional && results.length) {
+            searchResults.innerHTML = `
+                <div class="col-12 mb-2 text-muted small">
+                    <span class="spinner-border spinner-border-sm" role="status"></span> Refining results...
+                </div>`;
+        }
 
         results.forEach(recipe => {
             const col = document.createElement('div');
@@ -200,13 +206,50 @@ document.addEventListener('DOMContentLoaded', function() {
                             <span class="badge bg-primary">${recipe.category}</span>
                             <span class="badge bg-secondary">${recipe.area}</span>
                             ${recipe.score ? `<span class="badge bg-success">Score: ${recipe.score.toFixed(2)}</span>` : ''}
+                            ${recipe.coverage !== undefined ? `<span class="badge bg-success">You have ${Math.round(recipe.coverage * 100)}%</span>` : ''}
                         </p>
+                        ${recipe.missing_ingredients && recipe.missing_ingredients.length ? `
+                        <p class="card-text small text-muted">Missing: ${recipe.missing_ingredients.join(', ')}</p>` : ''}
                         <a href="/recipe/${recipe._id}" class="btn btn-primary">View Recipe</a>
+                        <button type="button" class="btn btn-outline-secondary find-similar" data-recipe-id="${recipe._id}">
+                            Find similar
+                        </button>
                     </div>
                 </div>
             `;
             searchResults.appendChild(col);
         });
+
+        searchResults.querySelectorAll('.find-similar').forEach(button => {
+            button.addEventListener('click', () => findSimilar(button.dataset.recipeId));
+        });
+    };
+
+    // Search by example: reuses the recipe's stored embeddings, no new embedding call
+    const findSimilar = async (recipeId) => {
+        const searchResults = document.getElementById('search-results');
+        if (!searchResults || isSearching) return;
+
+        isSearching = true;
+        searchResults.innerHTML = '<div class="col-12 text-center"><div class="spinner-border text-primary" role="status"></div></div>';
+        try {
+            const response = await fetch(`/search/similar/${encodeURIComponent(recipeId)}`);
+            if (!response.ok) {
+                const error = await response.json().catch(() => ({ error: 'Search failed' }));
+                throw new Error(error.error || 'Search failed');
+            }
+            displaySearchResults(await response.json());
+        } catch (error) {
+            console.error('Similar Search Error:', error);
+            searchResults.innerHTML = `
+                <div class="col-12">
+                    <div class="alert alert-danger">
+                        ${error.message || 'Search failed. Please try again.'}
+                    </div>
+                </div>`;
+        } finally {
+            isSearching = false;
+        }
     };
 
     const updateSearchButtonState = () => {
@@ -225,6 +268,38 @@ document.addEventListener('DOMContentLoaded', function() {
             (hasQuery ? "Search with text" : "Enter text or upload image to search");
     };
 
+    // Same normalization as the server, so equivalent queries share one cacheable URL
+    const textSearchUrl = (query) => {
+        const q = query.toLowerCase().split(/\s+/).filter(Boolean).join(' ');
+        return `/api/search?${new URLSearchParams({ q, k: 10 })}`;
+    };
+
+    // Image searches stream NDJSON: provisional results from the faster vector leg, then the final ranking
+    const streamSearch = async (body, onStage) => {
+        const response = await fetch('/search/stream', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(body)
+        });
+        if (!response.ok) {
+            const error = await response.json().catch(() => ({ error: 'Search failed' }));
+            throw new Error(error.error || 'Search failed');
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffered = '';
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffered += decoder.decode(value, { stream: true });
+            const lines = buffered.split('\n');
+            buffered = lines.pop();
+            lines.filter(line => line.trim()).forEach(line => onStage(JSON.parse(line)));
+        }
+        if (buffered.trim()) onStage(JSON.parse(buffered));
+    };
+
     // Main search handler
     const handleSearch = async (e) => {
         if (e) e.preventDefault();
@@ -237,6 +312,11 @@ document.addEventListener('DOMContentLoaded', function() {
         if (!searchButton || !searchResults || !searchInput || isSearching) return;
 
         const query = searchInput.value.trim();
+        const pantryMode = document.getElementById('pantry-mode')?.checked;
+        if (pantryMode && !query) {
+            alert('List the ingredients you have, separated by commas');
+            return;
+        }
         if (!query && !currentImage) {
             alert('Please enter a search term or upload an image');
             return;
@@ -249,11 +329,22 @@ document.addEventListener('DOMContentLoaded', function() {
         searchResults.innerHTML = '<div class="col-12 text-center"><div class="spinner-border text-primary" role="status"></div></div>';
 
         try {
-            const response = await fetch('/search', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ query, image: currentImage })
-            });
+            if (!pantryMode && currentImage) {
+                await streamSearch({ query, image: currentImage }, (event) => {
+                    if (event.stage === 'error') throw new Error(event.error || 'Search failed');
+                    displaySearchResults(event.results, event.stage === 'provisional');
+                });
+                return;
+            }
+
+            const response = pantryMode ?
+                await fetch('/search/ingredients', {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({ ingredients: query.split(',') })
+                }) :
+                // Text-only searches go over GET so browser and CDN caches can answer repeats
+                await fetch(textSearchUrl(query));
 
             if (!response.ok) {
                 const error = await response.json().catch(() => ({ error: 'Search failed' }));
@@ -261,7 +352,7 @@ document.addEventListener('DOMContentLoaded', function() {
             }
 
             const data = await response.json();
-            displaySearchResults(data);
+            displaySearchResults(pantryMode ? data.results : data);
         } catch (error) {
             console.error('Search Error:', error);
             searchResults.innerHTML = `
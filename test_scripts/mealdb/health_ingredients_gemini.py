@@ -9,6 +9,12 @@ import pymongo
 from pymongo.collection import Collection
 from pymongo.errors import PyMongoError
 import google.generativeai as genai
+import sys
+from pathlib import Path
+
+# Route Gemini calls through the pipeline's shared response cache
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from pipeline.llm_cache import cached_generate
 
 # ---------- 1. Load environment variables ----------
 load_dotenv()
@@ -77,15 +83,7 @@ Respond ONLY in this exact JSON format with no other text:
 Ingredients:\n""" + "\n".join([f"- {ingredient}" for ingredient in ingredients])
             
             print("  Sending to Gemini for analysis...")
-            response = self.gemini_model.generate_content(prompt)
-            
-            # Handle different response formats
-            if hasattr(response, 'text'):
-                response_text = response.text
-            elif hasattr(response, 'candidates') and response.candidates:
-                response_text = response.candidates[0].content.parts[0].text
-            else:
-                raise ValueError("Unexpected response format from Gemini")
+            response_text = cached_generate(self.gemini_model, prompt, "scripts-health-v1")
             
             print("  Raw response:", response_text[:200] + ("..." if len(response_text) > 200 else ""))
             
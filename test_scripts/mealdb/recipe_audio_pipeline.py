@@ -11,6 +11,12 @@ from pymongo.collection import Collection
 from pymongo.errors import PyMongoError
 import vertexai
 import google.generativeai as genai
+import sys
+from pathlib import Path
+
+# Route Gemini calls through the pipeline's shared response cache
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from pipeline.llm_cache import cached_generate
 
 # ---------- 1. Load environment variables ----------
 load_dotenv()
@@ -117,9 +123,7 @@ class RecipeAudioGenerator:
             Here are the recipe instructions:
             """
             
-            response = self.gemini_model.generate_content(f"{prompt}\n{instructions}")
-            
-            transformed = response.text
+            transformed = cached_generate(self.gemini_model, f"{prompt}\n{instructions}", "scripts-narration-v1")
             print("✅ Gemini transformation successful")
             print(f"Transformed instructions sample:\n{transformed[:200]}...")
             return transformed